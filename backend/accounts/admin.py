@@ -76,7 +76,7 @@ class PartnerProfileAdmin(admin.ModelAdmin):
             'fields': ('primary_location', 'service_areas')
         }),
         (_('Business Details'), {
-            'fields': ('website_url', 'business_hours', 'payout_frequency')
+            'fields': ('website_url', 'business_hours', 'time_zone', 'payout_frequency')
         }),
         (_('Verification'), {
             'fields': ('verification_status', 'verification_documents', 'verification_notes', 'verified_by', 'verified_at')
@@ -0,0 +1,357 @@
+"""
+Notification fan-out to large audiences
+
+A ``NotificationDispatch`` names an audience (``AUDIENCES``) and channels.
+``plan_dispatch`` splits the audience into primary-key ranges; each range is
+delivered by ``deliver_chunk``, inline or as a Celery task per range, so a
+dispatch to every user runs on the whole worker pool. Within a range users
+and their ``UserPreference`` flags are streamed with one joined query
+(``.iterator()``), grouped into batches and handed to each channel in bulk,
+so memory stays bounded by the batch size whatever the audience size.
+
+Each channel is throttled per provider (``NOTIFICATION_RATE_LIMITS``) with
+counters in the default cache, which must be a shared backend for the limit
+to hold across workers. Results are stored as ``NotificationDelivery`` rows;
+re-running a range skips users that already have a delivery, so retried
+tasks never notify anyone twice, and only add the deliveries they created to
+the dispatch totals. A range counts towards ``chunks_done`` once, and the
+totals are recounted from the deliveries when the last range completes.
+"""
+
+import logging
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000  # users per worker task
+BATCH_SIZE = 500  # users per channel hand-off
+# Messages per second per provider; EMAIL goes through the outbox, which paces SMTP itself
+DEFAULT_RATE_LIMITS = {'SMS': 50, 'PUSH': 500}
+
+RECIPIENT_FIELDS = (
+    'id', 'email', 'phone_number', 'first_name', 'preferred_language',
+    'preferences__notification_email', 'preferences__notification_sms',
+    'preferences__notification_push', 'preferences__marketing_emails',
+)
+Recipient = namedtuple('Recipient', [
+    'id', 'email', 'phone_number', 'first_name', 'language',
+    'notification_email', 'notification_sms', 'notification_push', 'marketing_emails',
+])
+
+
+def _active_users():
+    from .models import User
+
+    return User.objects.filter(is_active=True, status=User.UserStatus.ACTIVE)
+
+
+AUDIENCES = {
+    'all': _active_users,
+    'clients': lambda: _active_users().filter(role='CLIENT'),
+    'partners': lambda: _active_users().filter(role='PARTNER'),
+    'staff': lambda: _active_users().filter(role__in=['ADMIN', 'STAFF']),
+}
+
+
+def audience_queryset(dispatch):
+    return AUDIENCES[dispatch.audience]()
+
+
+def _preference_defaults():
+    from .models import UserPreference
+
+    return [
+        UserPreference._meta.get_field(name).default
+        for name in ('notification_email', 'notification_sms', 'notification_push', 'marketing_emails')
+    ]
+
+
+def iter_recipients(queryset, chunk_size=BATCH_SIZE):
+    """Stream users with their preferences (one LEFT JOIN); users without preferences get the defaults"""
+    defaults = _preference_defaults()
+    rows = queryset.order_by('pk').values_list(*RECIPIENT_FIELDS).iterator(chunk_size=chunk_size)
+    for row in rows:
+        flags = [default if value is None else value for value, default in zip(row[5:], defaults)]
+        yield Recipient(*row[:5], *flags)
+
+
+def channels_for(recipient, dispatch):
+    channels = []
+    for channel in dispatch.channels:
+        if channel == 'EMAIL':
+            wanted = recipient.notification_email and (recipient.marketing_emails or not dispatch.is_marketing)
+            wanted = wanted and bool(recipient.email)
+        elif channel == 'SMS':
+            wanted = recipient.notification_sms and bool(recipient.phone_number)
+        elif channel == 'PUSH':
+            wanted = recipient.notification_push
+        else:
+            wanted = False
+        if wanted:
+            channels.append(channel)
+    return channels
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def render_message(dispatch, recipient):
+    """``(recipient, title, body)`` in the recipient's language"""
+    if recipient.language == 'pt':
+        title, body = dispatch.title_pt, dispatch.body_pt
+    else:
+        title, body = dispatch.title_en, dispatch.body_en
+    return recipient, title, body.format_map(_Fields(first_name=recipient.first_name))
+
+
+class Throttle:
+    """
+    At most ``rate`` messages per second for one provider. The counters live
+    in the default cache, so the limit is shared by every worker only when
+    that cache is shared (Redis in production); with the development LocMem
+    cache each process is limited on its own.
+    """
+
+    def __init__(self, provider, rate):
+        self.provider = provider
+        self.rate = rate
+
+    def acquire(self, count):
+        while True:
+            window = int(time.time())
+            key = f'notifications:rate:{self.provider}:{window}'
+            cache.add(key, 0, 5)
+            try:
+                used = cache.incr(key, count)
+            except ValueError:
+                continue
+            if used <= self.rate:
+                return
+            time.sleep(max(window + 1 - time.time(), 0.01))
+
+
+class Channel:
+    """Sends batches of ``(recipient, title, body)``; returns ``[(user_id, status, error)]``"""
+
+    name = None
+
+    def rate_limit(self):
+        limits = {**DEFAULT_RATE_LIMITS, **getattr(settings, 'NOTIFICATION_RATE_LIMITS', {})}
+        return limits.get(self.name)
+
+    def deliver(self, dispatch, messages):
+        rate = self.rate_limit()
+        if not rate:
+            return self.send(dispatch, messages)
+        throttle = Throttle(self.name, rate)
+        results = []
+        for start in range(0, len(messages), rate):
+            window = messages[start:start + rate]
+            throttle.acquire(len(window))
+            results.extend(self.send(dispatch, window))
+        return results
+
+    def send(self, dispatch, messages):
+        raise NotImplementedError
+
+
+class EmailChannel(Channel):
+    """Queues on the email outbox; the outbox worker does the SMTP sending"""
+
+    name = 'EMAIL'
+
+    def send(self, dispatch, messages):
+        from .models import EmailOutbox
+
+        from_email = settings.DEFAULT_FROM_EMAIL
+        EmailOutbox.objects.bulk_create([
+            EmailOutbox(
+                to_email=recipient.email, from_email=from_email, subject=title, text_body=body,
+                category=f'dispatch:{dispatch.audience}',
+                dedupe_key=f'dispatch:{dispatch.pk}:{recipient.id}',
+            )
+            for recipient, title, body in messages
+        ], ignore_conflicts=True)
+        return [(recipient.id, 'QUEUED', '') for recipient, _, _ in messages]
+
+
+class SMSChannel(Channel):
+    """Placeholder until an SMS provider is integrated; logs instead of sending"""
+
+    name = 'SMS'
+
+    def send(self, dispatch, messages):
+        logger.info(f"SMS stub: dispatch {dispatch.pk} would text {len(messages)} users")
+        return [(recipient.id, 'SENT', '') for recipient, _, _ in messages]
+
+
+class PushChannel(Channel):
+    """Placeholder until push notifications are integrated; logs instead of sending"""
+
+    name = 'PUSH'
+
+    def send(self, dispatch, messages):
+        logger.info(f"Push stub: dispatch {dispatch.pk} would notify {len(messages)} users")
+        return [(recipient.id, 'SENT', '') for recipient, _, _ in messages]
+
+
+CHANNELS = {channel.name: channel for channel in (EmailChannel(), SMSChannel(), PushChannel())}
+
+
+def chunk_bounds(queryset, chunk_size=CHUNK_SIZE):
+    """``[(first_pk, last_pk)]`` ranges of ``chunk_size`` users, streamed in pk order"""
+    bounds = []
+    first = last = None
+    count = 0
+    for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+        if first is None:
+            first = pk
+        last = pk
+        count += 1
+        if count == chunk_size:
+            bounds.append((first, last))
+            first, count = None, 0
+    if first is not None:
+        bounds.append((first, last))
+    return bounds
+
+
+def plan_dispatch(dispatch, chunk_size=CHUNK_SIZE):
+    """Split the audience into pk ranges and mark the dispatch running"""
+    from .models import NotificationDispatch, NotificationDispatchChunk
+
+    bounds = chunk_bounds(audience_queryset(dispatch), chunk_size)
+    NotificationDispatchChunk.objects.bulk_create([
+        NotificationDispatchChunk(dispatch=dispatch, first_pk=first_pk, last_pk=last_pk)
+        for first_pk, last_pk in bounds
+    ])
+    now = timezone.now()
+    dispatch.chunks_total = len(bounds)
+    dispatch.chunks_done = 0
+    dispatch.started_at = now
+    if bounds:
+        dispatch.status = NotificationDispatch.Status.RUNNING
+    else:
+        dispatch.status = NotificationDispatch.Status.COMPLETED
+        dispatch.completed_at = now
+    dispatch.save(update_fields=['chunks_total', 'chunks_done', 'started_at', 'status', 'completed_at'])
+    return bounds
+
+
+def deliver_batch(dispatch, recipients):
+    """Fan one batch out to every channel; returns ``(recipients, sent, failed)``"""
+    from .models import NotificationDelivery
+
+    done = set(NotificationDelivery.objects.filter(
+        dispatch=dispatch, user_id__in=[recipient.id for recipient in recipients]
+    ).values_list('user_id', 'channel'))
+
+    by_channel = defaultdict(list)
+    reached = set()
+    for recipient in recipients:
+        message = None
+        for channel in channels_for(recipient, dispatch):
+            if (recipient.id, channel) in done:
+                continue
+            message = message or render_message(dispatch, recipient)
+            by_channel[channel].append(message)
+            reached.add(recipient.id)
+
+    deliveries = []
+    sent = failed = 0
+    for channel, messages in by_channel.items():
+        try:
+            results = CHANNELS[channel].deliver(dispatch, messages)
+        except Exception as exc:
+            logger.error(f"Dispatch {dispatch.pk} failed on {channel}: {exc}")
+            results = [(recipient.id, 'FAILED', str(exc)[:255]) for recipient, _, _ in messages]
+        for user_id, status, error in results:
+            deliveries.append(NotificationDelivery(
+                dispatch=dispatch, user_id=user_id, channel=channel, status=status, error=error
+            ))
+            if status == 'FAILED':
+                failed += 1
+            else:
+                sent += 1
+    NotificationDelivery.objects.bulk_create(deliveries, ignore_conflicts=True)
+    return len(reached), sent, failed
+
+
+def deliver_chunk(dispatch_id, first_pk, last_pk, batch_size=BATCH_SIZE):
+    """Deliver one pk range of a dispatch (one worker task); returns the counts added by this run"""
+    from .models import NotificationDispatch, NotificationDispatchChunk
+
+    dispatch = NotificationDispatch.objects.get(pk=dispatch_id)
+    queryset = audience_queryset(dispatch).filter(pk__gte=first_pk, pk__lte=last_pk)
+
+    totals = [0, 0, 0]
+    batch = []
+
+    def flush():
+        recipients, sent, failed = deliver_batch(dispatch, batch)
+        batch.clear()
+        if recipients:
+            # Progress as we go, so a range interrupted mid-way keeps what it counted
+            NotificationDispatch.objects.filter(pk=dispatch_id).update(
+                recipients=F('recipients') + recipients, sent=F('sent') + sent, failed=F('failed') + failed
+            )
+        for index, value in enumerate((recipients, sent, failed)):
+            totals[index] += value
+
+    for recipient in iter_recipients(queryset, batch_size):
+        batch.append(recipient)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    now = timezone.now()
+    first_completion = NotificationDispatchChunk.objects.filter(
+        dispatch_id=dispatch_id, first_pk=first_pk, completed_at__isnull=True
+    ).update(completed_at=now)
+    if first_completion:
+        NotificationDispatch.objects.filter(pk=dispatch_id).update(chunks_done=F('chunks_done') + 1)
+        completed = NotificationDispatch.objects.filter(
+            pk=dispatch_id, status=NotificationDispatch.Status.RUNNING, chunks_done__gte=F('chunks_total')
+        ).update(status=NotificationDispatch.Status.COMPLETED, completed_at=now)
+        if completed:
+            recount_dispatch(dispatch_id)
+    return tuple(totals)
+
+
+def recount_dispatch(dispatch_id):
+    """Set the dispatch totals from its delivery rows (exact even if concurrent retries overlapped)"""
+    from .models import NotificationDelivery, NotificationDispatch
+
+    counts = NotificationDelivery.objects.filter(dispatch_id=dispatch_id).aggregate(
+        recipients=Count('user', distinct=True),
+        deliveries=Count('pk'),
+        failed=Count('pk', filter=Q(status=NotificationDelivery.Status.FAILED)),
+    )
+    NotificationDispatch.objects.filter(pk=dispatch_id).update(
+        recipients=counts['recipients'],
+        sent=counts['deliveries'] - counts['failed'],
+        failed=counts['failed'],
+    )
+
+
+def run_dispatch(dispatch, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, use_workers=False):
+    """Deliver a dispatch inline, or queue one Celery task per pk range; returns the range count"""
+    bounds = plan_dispatch(dispatch, chunk_size)
+    if use_workers:
+        from .tasks import deliver_notification_chunk
+
+        for first_pk, last_pk in bounds:
+            deliver_notification_chunk.delay(dispatch.pk, first_pk, last_pk, batch_size)
+    else:
+        for first_pk, last_pk in bounds:
+            deliver_chunk(dispatch.pk, first_pk, last_pk, batch_size)
+    return len(bounds)
@@ -1,386 +1,385 @@
 """
 Email templates for user notifications
+
+Each (template, language) pair is compiled once per process: the HTML source
+is whitespace-minified, the plain-text body is derived from it, and both are
+kept as ``str.format`` strings. Rendering a message is then one small context
+dict and three ``format_map`` calls, which keeps campaign-sized batches
+(``render_batch``) cheap. ``benchmark_email_templates`` measures the cost.
 """
 
-def get_welcome_email_template(user, language='en'):
-    """Generate welcome email template"""
-    if language == 'pt':
-        return {
-            'subject': 'Bem-vindo ao E-B Global!',
-            'html_content': f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
-                        <p style="color: #666; margin: 5px 0;">Conectando África através da excelência profissional</p>
-                    </div>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px; margin-bottom: 20px;">
-                        <h2 style="color: #1e40af; margin-top: 0;">Bem-vindo, {user.first_name}!</h2>
-                        <p>Obrigado por se juntar ao E-B Global, a plataforma líder para serviços profissionais em África.</p>
-                        
-                        <p><strong>Os seus dados de conta:</strong></p>
-                        <ul>
-                            <li><strong>Email:</strong> {user.email}</li>
-                            <li><strong>Tipo de conta:</strong> {user.get_role_display()}</li>
-                            <li><strong>Data de registo:</strong> {user.date_joined.strftime('%d/%m/%Y')}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="margin: 20px 0;">
-                        <h3 style="color: #1e40af;">Próximos passos:</h3>
-                        <ul>
-                            <li>Complete o seu perfil</li>
-                            <li>Explore os nossos serviços</li>
-                            <li>Conecte-se com parceiros verificados</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="http://localhost:3000/dashboard" 
-                           style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            Aceder ao Painel
-                        </a>
-                    </div>
-                    
-                    <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; margin-top: 30px; font-size: 14px; color: #666;">
-                        <p>Se tiver alguma questão, não hesite em contactar-nos:</p>
-                        <p>📧 info@ebglobal.com | 📞 +244 912 345 678</p>
-                        <p style="margin-top: 20px;">© 2025 E-B Global. Todos os direitos reservados.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
+import functools
+import html
+import re
+
+from django.utils import translation
+
+DEFAULT_LANGUAGE = 'en'
+LANGUAGES = ('en', 'pt')
+DASHBOARD_URL = 'http://localhost:3000/dashboard'
+
+DATE_FORMATS = {
+    'en': {'date': '%m/%d/%Y', 'datetime': '%m/%d/%Y at %H:%M', 'now': 'Now'},
+    'pt': {'date': '%d/%m/%Y', 'datetime': '%d/%m/%Y às %H:%M', 'now': 'Agora'},
+}
+
+FOOTER = {
+    'en': '© 2025 E-B Global. All rights reserved.',
+    'pt': '© 2025 E-B Global. Todos os direitos reservados.',
+}
+
+
+def _page(language, heading, content, button, tagline='', contact=''):
+    """HTML source shared by every notification; ``{field}`` placeholders are filled at render time"""
+    tagline = f'<p style="color: #666; margin: 5px 0;">{tagline}</p>' if tagline else ''
+    return f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="text-align: center; margin-bottom: 30px;">
+                <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
+                {tagline}
+            </div>
+            <div style="background: #f8fafc; padding: 20px; border-radius: 8px; margin-bottom: 20px;">
+                <h2 style="color: #1e40af; margin-top: 0;">{heading}</h2>
+                {content}
+            </div>
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{DASHBOARD_URL}"
+                   style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">{button}</a>
+            </div>
+            <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; margin-top: 30px; font-size: 14px; color: #666;">
+                {contact}
+                <p style="margin-top: 20px;">{FOOTER[language]}</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+
+SOURCES = {
+    ('welcome', 'pt'): {
+        'subject': 'Bem-vindo ao E-B Global!',
+        'html': _page(
+            'pt', 'Bem-vindo, {first_name}!',
+            """
+            <p>Obrigado por se juntar ao E-B Global, a plataforma líder para serviços profissionais em África.</p>
+            <p><strong>Os seus dados de conta:</strong></p>
+            <ul>
+                <li><strong>Email:</strong> {email}</li>
+                <li><strong>Tipo de conta:</strong> {role}</li>
+                <li><strong>Data de registo:</strong> {date_joined}</li>
+            </ul>
+            <h3 style="color: #1e40af;">Próximos passos:</h3>
+            <ul>
+                <li>Complete o seu perfil</li>
+                <li>Explore os nossos serviços</li>
+                <li>Conecte-se com parceiros verificados</li>
+            </ul>
             """,
-            'text_content': f"""
-            Bem-vindo ao E-B Global, {user.first_name}!
-            
-            Obrigado por se juntar à nossa plataforma.
-            
-            Os seus dados de conta:
-            - Email: {user.email}
-            - Tipo de conta: {user.get_role_display()}
-            - Data de registo: {user.date_joined.strftime('%d/%m/%Y')}
-            
-            Próximos passos:
-            - Complete o seu perfil
-            - Explore os nossos serviços
-            - Conecte-se com parceiros verificados
-            
-            Aceda ao seu painel: http://localhost:3000/dashboard
-            
-            Se tiver alguma questão, contacte-nos:
-            Email: info@ebglobal.com
-            Telefone: +244 912 345 678
-            
-            © 2025 E-B Global. Todos os direitos reservados.
+            'Aceder ao Painel',
+            tagline='Conectando África através da excelência profissional',
+            contact="""
+            <p>Se tiver alguma questão, não hesite em contactar-nos:</p>
+            <p>📧 info@ebglobal.com | 📞 +244 912 345 678</p>
+            """,
+        ),
+    },
+    ('welcome', 'en'): {
+        'subject': 'Welcome to E-B Global!',
+        'html': _page(
+            'en', 'Welcome, {first_name}!',
             """
-        }
-    else:
-        return {
-            'subject': 'Welcome to E-B Global!',
-            'html_content': f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
-                        <p style="color: #666; margin: 5px 0;">Connecting Africa through professional excellence</p>
-                    </div>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px; margin-bottom: 20px;">
-                        <h2 style="color: #1e40af; margin-top: 0;">Welcome, {user.first_name}!</h2>
-                        <p>Thank you for joining E-B Global, the leading platform for professional services in Africa.</p>
-                        
-                        <p><strong>Your account details:</strong></p>
-                        <ul>
-                            <li><strong>Email:</strong> {user.email}</li>
-                            <li><strong>Account Type:</strong> {user.get_role_display()}</li>
-                            <li><strong>Registration Date:</strong> {user.date_joined.strftime('%m/%d/%Y')}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="margin: 20px 0;">
-                        <h3 style="color: #1e40af;">Next Steps:</h3>
-                        <ul>
-                            <li>Complete your profile</li>
-                            <li>Explore our services</li>
-                            <li>Connect with verified partners</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="http://localhost:3000/dashboard" 
-                           style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            Access Dashboard
-                        </a>
-                    </div>
-                    
-                    <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; margin-top: 30px; font-size: 14px; color: #666;">
-                        <p>If you have any questions, please don't hesitate to contact us:</p>
-                        <p>📧 info@ebglobal.com | 📞 +244 912 345 678</p>
-                        <p style="margin-top: 20px;">© 2025 E-B Global. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
+            <p>Thank you for joining E-B Global, the leading platform for professional services in Africa.</p>
+            <p><strong>Your account details:</strong></p>
+            <ul>
+                <li><strong>Email:</strong> {email}</li>
+                <li><strong>Account Type:</strong> {role}</li>
+                <li><strong>Registration Date:</strong> {date_joined}</li>
+            </ul>
+            <h3 style="color: #1e40af;">Next Steps:</h3>
+            <ul>
+                <li>Complete your profile</li>
+                <li>Explore our services</li>
+                <li>Connect with verified partners</li>
+            </ul>
+            """,
+            'Access Dashboard',
+            tagline='Connecting Africa through professional excellence',
+            contact="""
+            <p>If you have any questions, please don't hesitate to contact us:</p>
+            <p>📧 info@ebglobal.com | 📞 +244 912 345 678</p>
             """,
-            'text_content': f"""
-            Welcome to E-B Global, {user.first_name}!
-            
-            Thank you for joining our platform.
-            
-            Your account details:
-            - Email: {user.email}
-            - Account Type: {user.get_role_display()}
-            - Registration Date: {user.date_joined.strftime('%m/%d/%Y')}
-            
-            Next Steps:
-            - Complete your profile
-            - Explore our services
-            - Connect with verified partners
-            
-            Access your dashboard: http://localhost:3000/dashboard
-            
-            If you have any questions, contact us:
-            Email: info@ebglobal.com
-            Phone: +244 912 345 678
-            
-            © 2025 E-B Global. All rights reserved.
+        ),
+    },
+    ('login', 'pt'): {
+        'subject': 'Início de sessão no E-B Global',
+        'html': _page(
+            'pt', 'Início de sessão detectado',
             """
-        }
-
-def get_login_notification_template(user, language='en'):
-    """Generate login notification email template"""
-    if language == 'pt':
-        return {
-            'subject': 'Início de sessão no E-B Global',
-            'html_content': f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
-                    </div>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px;">
-                        <h2 style="color: #1e40af; margin-top: 0;">Início de sessão detectado</h2>
-                        <p>Olá {user.first_name},</p>
-                        <p>Detectámos um novo início de sessão na sua conta E-B Global.</p>
-                        
-                        <p><strong>Detalhes do início de sessão:</strong></p>
-                        <ul>
-                            <li><strong>Email:</strong> {user.email}</li>
-                            <li><strong>Data e hora:</strong> {user.last_login.strftime('%d/%m/%Y às %H:%M') if user.last_login else 'Agora'}</li>
-                        </ul>
-                        
-                        <p>Se não foi você, por favor altere a sua palavra-passe imediatamente.</p>
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="http://localhost:3000/dashboard" 
-                           style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            Aceder ao Painel
-                        </a>
-                    </div>
-                    
-                    <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; font-size: 14px; color: #666;">
-                        <p>© 2025 E-B Global. Todos os direitos reservados.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
+            <p>Olá {first_name},</p>
+            <p>Detectámos um novo início de sessão na sua conta E-B Global.</p>
+            <p><strong>Detalhes do início de sessão:</strong></p>
+            <ul>
+                <li><strong>Email:</strong> {email}</li>
+                <li><strong>Data e hora:</strong> {login_time}</li>
+            </ul>
+            <p>Se não foi você, por favor altere a sua palavra-passe imediatamente.</p>
             """,
-            'text_content': f"""
-            Início de sessão no E-B Global
-            
-            Olá {user.first_name},
-            
-            Detectámos um novo início de sessão na sua conta.
-            
-            Detalhes:
-            - Email: {user.email}
-            - Data e hora: {user.last_login.strftime('%d/%m/%Y às %H:%M') if user.last_login else 'Agora'}
-            
-            Se não foi você, altere a sua palavra-passe imediatamente.
-            
-            © 2025 E-B Global. Todos os direitos reservados.
+            'Aceder ao Painel',
+        ),
+    },
+    ('login', 'en'): {
+        'subject': 'E-B Global Login Notification',
+        'html': _page(
+            'en', 'Login Detected',
             """
-        }
-    else:
-        return {
-            'subject': 'E-B Global Login Notification',
-            'html_content': f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
-                    </div>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px;">
-                        <h2 style="color: #1e40af; margin-top: 0;">Login Detected</h2>
-                        <p>Hello {user.first_name},</p>
-                        <p>We detected a new login to your E-B Global account.</p>
-                        
-                        <p><strong>Login Details:</strong></p>
-                        <ul>
-                            <li><strong>Email:</strong> {user.email}</li>
-                            <li><strong>Date & Time:</strong> {user.last_login.strftime('%m/%d/%Y at %H:%M') if user.last_login else 'Now'}</li>
-                        </ul>
-                        
-                        <p>If this wasn't you, please change your password immediately.</p>
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="http://localhost:3000/dashboard" 
-                           style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            Access Dashboard
-                        </a>
-                    </div>
-                    
-                    <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; font-size: 14px; color: #666;">
-                        <p>© 2025 E-B Global. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
+            <p>Hello {first_name},</p>
+            <p>We detected a new login to your E-B Global account.</p>
+            <p><strong>Login Details:</strong></p>
+            <ul>
+                <li><strong>Email:</strong> {email}</li>
+                <li><strong>Date &amp; Time:</strong> {login_time}</li>
+            </ul>
+            <p>If this wasn't you, please change your password immediately.</p>
             """,
-            'text_content': f"""
-            E-B Global Login Notification
-            
-            Hello {user.first_name},
-            
-            We detected a new login to your account.
-            
-            Details:
-            - Email: {user.email}
-            - Date & Time: {user.last_login.strftime('%m/%d/%Y at %H:%M') if user.last_login else 'Now'}
-            
-            If this wasn't you, please change your password immediately.
-            
-            © 2025 E-B Global. All rights reserved.
+            'Access Dashboard',
+        ),
+    },
+    ('booking_confirmation', 'pt'): {
+        'subject': 'Confirmação de Reserva - {booking_number}',
+        'html': _page(
+            'pt', 'Reserva Confirmada!',
             """
-        }
-
-def get_booking_confirmation_template(booking, language='en'):
-    """Generate booking confirmation email template"""
-    if language == 'pt':
-        return {
-            'subject': f'Confirmação de Reserva - {booking.booking_number}',
-            'html_content': f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
-                    </div>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px;">
-                        <h2 style="color: #1e40af; margin-top: 0;">Reserva Confirmada!</h2>
-                        <p>Olá {booking.client.first_name},</p>
-                        <p>A sua reserva foi confirmada com sucesso.</p>
-                        
-                        <p><strong>Detalhes da Reserva:</strong></p>
-                        <ul>
-                            <li><strong>Número da Reserva:</strong> {booking.booking_number}</li>
-                            <li><strong>Serviço:</strong> {booking.service.name}</li>
-                            <li><strong>Parceiro:</strong> {booking.partner.get_full_name()}</li>
-                            <li><strong>Data:</strong> {booking.scheduled_start.strftime('%d/%m/%Y')}</li>
-                            <li><strong>Hora:</strong> {booking.scheduled_start.strftime('%H:%M')} - {booking.scheduled_end.strftime('%H:%M')}</li>
-                            <li><strong>Total:</strong> {booking.total_amount} {booking.service.currency}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="http://localhost:3000/dashboard" 
-                           style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            Ver Reserva
-                        </a>
-                    </div>
-                    
-                    <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; font-size: 14px; color: #666;">
-                        <p>© 2025 E-B Global. Todos os direitos reservados.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
+            <p>Olá {first_name},</p>
+            <p>A sua reserva foi confirmada com sucesso.</p>
+            <p><strong>Detalhes da Reserva:</strong></p>
+            <ul>
+                <li><strong>Número da Reserva:</strong> {booking_number}</li>
+                <li><strong>Serviço:</strong> {service}</li>
+                <li><strong>Parceiro:</strong> {partner}</li>
+                <li><strong>Data:</strong> {date}</li>
+                <li><strong>Hora:</strong> {start_time} - {end_time}</li>
+                <li><strong>Total:</strong> {total}</li>
+            </ul>
             """,
-            'text_content': f"""
-            Confirmação de Reserva - {booking.booking_number}
-            
-            Olá {booking.client.first_name},
-            
-            A sua reserva foi confirmada com sucesso.
-            
-            Detalhes:
-            - Número: {booking.booking_number}
-            - Serviço: {booking.service.name}
-            - Parceiro: {booking.partner.get_full_name()}
-            - Data: {booking.scheduled_start.strftime('%d/%m/%Y')}
-            - Hora: {booking.scheduled_start.strftime('%H:%M')} - {booking.scheduled_end.strftime('%H:%M')}
-            - Total: {booking.total_amount} {booking.service.currency}
-            
-            © 2025 E-B Global. Todos os direitos reservados.
+            'Ver Reserva',
+        ),
+    },
+    ('booking_confirmation', 'en'): {
+        'subject': 'Booking Confirmation - {booking_number}',
+        'html': _page(
+            'en', 'Booking Confirmed!',
             """
-        }
-    else:
-        return {
-            'subject': f'Booking Confirmation - {booking.booking_number}',
-            'html_content': f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <h1 style="color: #2563eb; margin: 0;">E-B Global</h1>
-                    </div>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px;">
-                        <h2 style="color: #1e40af; margin-top: 0;">Booking Confirmed!</h2>
-                        <p>Hello {booking.client.first_name},</p>
-                        <p>Your booking has been successfully confirmed.</p>
-                        
-                        <p><strong>Booking Details:</strong></p>
-                        <ul>
-                            <li><strong>Booking Number:</strong> {booking.booking_number}</li>
-                            <li><strong>Service:</strong> {booking.service.name}</li>
-                            <li><strong>Partner:</strong> {booking.partner.get_full_name()}</li>
-                            <li><strong>Date:</strong> {booking.scheduled_start.strftime('%m/%d/%Y')}</li>
-                            <li><strong>Time:</strong> {booking.scheduled_start.strftime('%H:%M')} - {booking.scheduled_end.strftime('%H:%M')}</li>
-                            <li><strong>Total:</strong> {booking.total_amount} {booking.service.currency}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="http://localhost:3000/dashboard" 
-                           style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            View Booking
-                        </a>
-                    </div>
-                    
-                    <div style="border-top: 1px solid #e5e7eb; padding-top: 20px; font-size: 14px; color: #666;">
-                        <p>© 2025 E-B Global. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
+            <p>Hello {first_name},</p>
+            <p>Your booking has been successfully confirmed.</p>
+            <p><strong>Booking Details:</strong></p>
+            <ul>
+                <li><strong>Booking Number:</strong> {booking_number}</li>
+                <li><strong>Service:</strong> {service}</li>
+                <li><strong>Partner:</strong> {partner}</li>
+                <li><strong>Date:</strong> {date}</li>
+                <li><strong>Time:</strong> {start_time} - {end_time}</li>
+                <li><strong>Total:</strong> {total}</li>
+            </ul>
+            """,
+            'View Booking',
+        ),
+    },
+    ('booking_reminder', 'pt'): {
+        'subject': 'Lembrete: reserva {booking_number} em {lead_time}',
+        'html': _page(
+            'pt', 'A sua reserva está a chegar',
+            """
+            <p>Olá {first_name},</p>
+            <p>A reserva {booking_number} começa em {lead_time}.</p>
+            <ul>
+                <li><strong>Serviço:</strong> {service}</li>
+                <li><strong>Com:</strong> {other_party}</li>
+                <li><strong>Data:</strong> {date}</li>
+                <li><strong>Hora:</strong> {start_time} - {end_time}</li>
+            </ul>
             """,
-            'text_content': f"""
-            Booking Confirmation - {booking.booking_number}
-            
-            Hello {booking.client.first_name},
-            
-            Your booking has been successfully confirmed.
-            
-            Details:
-            - Number: {booking.booking_number}
-            - Service: {booking.service.name}
-            - Partner: {booking.partner.get_full_name()}
-            - Date: {booking.scheduled_start.strftime('%m/%d/%Y')}
-            - Time: {booking.scheduled_start.strftime('%H:%M')} - {booking.scheduled_end.strftime('%H:%M')}
-            - Total: {booking.total_amount} {booking.service.currency}
-            
-            © 2025 E-B Global. All rights reserved.
+            'Ver Reserva',
+        ),
+    },
+    ('booking_reminder', 'en'): {
+        'subject': 'Reminder: booking {booking_number} in {lead_time}',
+        'html': _page(
+            'en', 'Your booking is coming up',
             """
+            <p>Hello {first_name},</p>
+            <p>Booking {booking_number} starts in {lead_time}.</p>
+            <ul>
+                <li><strong>Service:</strong> {service}</li>
+                <li><strong>With:</strong> {other_party}</li>
+                <li><strong>Date:</strong> {date}</li>
+                <li><strong>Time:</strong> {start_time} - {end_time}</li>
+            </ul>
+            """,
+            'View Booking',
+        ),
+    },
+}
+
+
+@functools.lru_cache(maxsize=64)
+def role_label(role, active_language):
+    """``get_role_display()`` without a choices lookup and translation per message"""
+    from .models import User
+
+    return str(dict(User._meta.get_field('role').flatchoices).get(role, role))
+
+
+def welcome_context(user, language):
+    return {
+        'first_name': user.first_name,
+        'email': user.email,
+        'role': role_label(user.role, translation.get_language()),
+        'date_joined': user.date_joined.strftime(DATE_FORMATS[language]['date']),
+    }
+
+
+def login_context(user, language):
+    formats = DATE_FORMATS[language]
+    return {
+        'first_name': user.first_name,
+        'email': user.email,
+        'login_time': user.last_login.strftime(formats['datetime']) if user.last_login else formats['now'],
+    }
+
+
+def booking_confirmation_context(booking, language):
+    return {
+        'first_name': booking.client.first_name,
+        'booking_number': booking.booking_number,
+        'service': booking.service.name,
+        'partner': booking.partner.get_full_name(),
+        'date': booking.scheduled_start.strftime(DATE_FORMATS[language]['date']),
+        'start_time': booking.scheduled_start.strftime('%H:%M'),
+        'end_time': booking.scheduled_end.strftime('%H:%M'),
+        'total': f'{booking.total_amount} {booking.service.currency}',
+    }
+
+
+LEAD_TIMES = {
+    'en': {1: '1 hour', 'hours': '{} hours'},
+    'pt': {1: '1 hora', 'hours': '{} horas'},
+}
+
+
+def booking_reminder_context(reminder, language):
+    """``reminder`` is a ``bookings.reminders.Reminder`` (booking, recipient, hours before start)"""
+    booking, recipient = reminder.booking, reminder.recipient
+    other = booking.partner if recipient.pk == booking.client_id else booking.client
+    lead_times = LEAD_TIMES[language]
+    return {
+        'first_name': recipient.first_name,
+        'booking_number': booking.booking_number,
+        'lead_time': lead_times.get(reminder.hours) or lead_times['hours'].format(reminder.hours),
+        'service': booking.service.name,
+        'other_party': other.get_full_name(),
+        'date': booking.scheduled_start.strftime(DATE_FORMATS[language]['date']),
+        'start_time': booking.scheduled_start.strftime('%H:%M'),
+        'end_time': booking.scheduled_end.strftime('%H:%M'),
+    }
+
+
+# name: (context builder, recipient of the message)
+TEMPLATES = {
+    'welcome': (welcome_context, lambda user: user),
+    'login': (login_context, lambda user: user),
+    'booking_confirmation': (booking_confirmation_context, lambda booking: booking.client),
+    'booking_reminder': (booking_reminder_context, lambda reminder: reminder.recipient),
+}
+
+_BLOCK_END = re.compile(r'</(p|div|h[1-6]|ul|ol|table|tr)\s*>', re.I)
+_LINK = re.compile(r'<a\s[^>]*href="([^"]*)"[^>]*>(.*?)</a\s*>', re.I | re.S)
+_TAG = re.compile(r'<[^>]+>')
+
+
+def minify_html(source):
+    source = re.sub(r'\s+', ' ', source)
+    return re.sub(r'>\s+<', '><', source).strip()
+
+
+def html_to_text(source):
+    """Plain-text rendition of an HTML body: paragraphs, ``- `` list items, ``label: url`` links"""
+    text = minify_html(source)
+    text = _LINK.sub(lambda match: f'{match.group(2)}: {match.group(1)}', text)
+    text = re.sub(r'<li[^>]*>', '\n- ', text, flags=re.I)
+    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.I)
+    text = _BLOCK_END.sub('\n\n', text)
+    text = html.unescape(_TAG.sub('', text))
+    lines = [line.strip() for line in text.splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+
+class CompiledTemplate:
+    """``str.format`` strings for one (template, language) pair"""
+
+    __slots__ = ('name', 'language', 'subject', 'html', 'text')
+
+    def __init__(self, name, language, subject, html_source):
+        self.name = name
+        self.language = language
+        self.subject = subject
+        self.html = minify_html(html_source)
+        self.text = html_to_text(html_source)
+
+    def render(self, context):
+        escaped = {key: html.escape(value) for key, value in context.items()}
+        return {
+            'subject': self.subject.format_map(context),
+            'html_content': self.html.format_map(escaped),
+            'text_content': self.text.format_map(context),
         }
+
+
+def resolve_language(language):
+    return language if language in LANGUAGES else DEFAULT_LANGUAGE
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(name, language):
+    source = SOURCES[(name, resolve_language(language))]
+    return CompiledTemplate(name, resolve_language(language), source['subject'], source['html'])
+
+
+def render_email(name, obj, language=None):
+    """Render ``name`` for one user/booking; ``language`` defaults to the recipient's"""
+    build_context, recipient = TEMPLATES[name]
+    language = resolve_language(language or recipient(obj).preferred_language)
+    return compile_template(name, language).render(build_context(obj, language))
+
+
+def render_batch(name, objects, language=None):
+    """
+    Render ``name`` for many users/bookings (campaigns); yields one message
+    dict per object, in order, each in its recipient's language unless
+    ``language`` is given.
+    """
+    build_context, recipient = TEMPLATES[name]
+    compiled = {}
+    for obj in objects:
+        lang = resolve_language(language or recipient(obj).preferred_language)
+        template = compiled.get(lang)
+        if template is None:
+            template = compiled[lang] = compile_template(name, lang)
+        yield template.render(build_context(obj, lang))
+
+
+def get_welcome_email_template(user, language='en'):
+    """Generate welcome email template"""
+    return render_email('welcome', user, language)
+
+
+def get_login_notification_template(user, language='en'):
+    """Generate login notification email template"""
+    return render_email('login', user, language)
+
+
+def get_booking_confirmation_template(booking, language='en'):
+    """Generate booking confirmation email template"""
+    return render_email('booking_confirmation', booking, language)
@@ -0,0 +1,107 @@
+"""
+Geohash helpers for proximity lookups on ``Location``
+
+Each located ``Location`` stores the geohash of its coordinates. A radius
+query is answered by covering the circle with the 3x3 block of geohash cells
+around the centre, at the finest precision whose cells are still at least as
+large as the radius, and filtering ``geohash__startswith`` for each cell
+(nine index range scans). Candidates are then checked with the haversine
+distance. Works the same on SQLite and PostgreSQL; no PostGIS required.
+"""
+
+import math
+
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5 m cells
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size_km(precision, latitude):
+    """``(height, width)`` of a geohash cell at ``latitude``"""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    height = 180.0 / 2 ** lat_bits * KM_PER_DEGREE
+    width = 360.0 / 2 ** lon_bits * KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+    return height, width
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes whose union contains every point within ``radius_km``,
+    or None when the radius is too large for prefixes to narrow anything.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    precision = None
+    # Cells narrow towards the poles; size them at the circle's poleward edge
+    edge_latitude = min(abs(latitude) + radius_km / KM_PER_DEGREE, 90.0)
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size_km(candidate, edge_latitude)
+        if min(height, width) >= radius_km:
+            precision = candidate
+            break
+    if precision is None:
+        return None
+
+    lat_step = 180.0 / 2 ** (5 * precision // 2)
+    lon_step = 360.0 / 2 ** (5 * precision - 5 * precision // 2)
+    cells = set()
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            lat = min(max(latitude + dy * lat_step, -90.0), 89.999999)
+            lon = (longitude + dx * lon_step + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def prefix_filter(cells, field='geohash'):
+    condition = Q()
+    for cell in cells:
+        condition |= Q(**{f'{field}__startswith': cell})
+    return condition
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def locations_within(latitude, longitude, radius_km):
+    """``{location_id: distance_km}`` for active locations within ``radius_km``"""
+    from .models import Location
+
+    queryset = Location.objects.filter(is_active=True).exclude(geohash='')
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        queryset = queryset.filter(prefix_filter(cells))
+
+    found = {}
+    for location_id, lat, lon in queryset.values_list('id', 'latitude', 'longitude'):
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if distance <= radius_km:
+            found[location_id] = distance
+    return found
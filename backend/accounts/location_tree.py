@@ -0,0 +1,70 @@
+"""
+In-process snapshot of the location hierarchy (country > province > city)
+
+The whole table is small and read on almost every page (dropdowns, service
+filters, breadcrumbs), so each process keeps an immutable ``LocationTree``
+and reloads it with one query when the shared version key changes. Location
+saves and deletes bump the version (see ``accounts.signals``).
+"""
+
+from ebglobal.snapshots import Tree, VersionedSnapshot
+
+LOCATION_TREE_VERSION_KEY = 'accounts:location_tree_version'
+
+NODE_FIELDS = ('id', 'name', 'name_pt', 'name_en', 'location_type', 'parent_id', 'is_active')
+
+
+class LocationTree(Tree):
+    """Immutable snapshot of every location"""
+
+    def __init__(self, rows, version=None):
+        nodes = []
+        for row in rows:
+            node = dict(zip(NODE_FIELDS, row))
+            node['parent'] = node.pop('parent_id')
+            nodes.append(node)
+        super().__init__(nodes, version=version)
+
+    def full_name(self, location_id):
+        """``City, Province, Country`` as built by ``Location.full_name``"""
+        return ', '.join(node['name'] for node in reversed(self.ancestors(location_id)))
+
+    def filter(self, location_type=None, parent=None, within=None, active=True):
+        """Nodes matching the dropdown filters, in name order"""
+        if within is not None:
+            candidates = (self.nodes[node_id] for node_id in self.descendant_ids(within))
+        elif parent is not None:
+            candidates = (self.nodes[node_id] for node_id in self.children.get(parent, ()))
+        else:
+            candidates = self.nodes.values()
+        nodes = [
+            node for node in candidates
+            if (location_type is None or node['location_type'] == location_type)
+            and (not active or node['is_active'])
+        ]
+        return sorted(nodes, key=lambda node: (node['name'], node['id']))
+
+
+def _load_tree(version):
+    from .models import Location
+
+    return LocationTree(Location.objects.values_list(*NODE_FIELDS), version=version)
+
+
+_snapshot = VersionedSnapshot(LOCATION_TREE_VERSION_KEY, _load_tree)
+
+
+def get_location_tree():
+    """
+    Return this process's location tree, reloading it (one query) when
+    another process or request bumped the shared version.
+    """
+    return _snapshot.get()
+
+
+def invalidate_location_tree():
+    _snapshot.invalidate()
+
+
+def get_descendant_ids(location_id, include_self=True):
+    return get_location_tree().descendant_ids(location_id, include_self=include_self)
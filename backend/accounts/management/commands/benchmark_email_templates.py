@@ -0,0 +1,76 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import email_templates
+from accounts.models import User
+from bookings.models import Booking
+from bookings.reminders import Reminder
+from services.models import Service
+
+
+class Command(BaseCommand):
+    help = 'Measure per-message render cost of the compiled email templates (no database or mail access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Messages rendered per template')
+        parser.add_argument(
+            '--template', choices=sorted(email_templates.TEMPLATES), action='append',
+            help='Template to measure (repeatable; default all)'
+        )
+
+    def sample_objects(self, name, count):
+        now = timezone.now()
+        users = [
+            User(
+                email=f'user{number}@example.com', first_name=f'User{number}', last_name='Sample',
+                role='CLIENT', preferred_language='pt' if number % 2 else 'en',
+                date_joined=now, last_login=now
+            )
+            for number in range(count)
+        ]
+        if name not in ('booking_confirmation', 'booking_reminder'):
+            return users
+        partner = User(email='partner@example.com', first_name='Par', last_name='Tner', role='PARTNER')
+        service = Service(name='Home cleaning', currency='AOA')
+        bookings = [
+            Booking(
+                booking_number=f'EB{number:08d}', client=user, partner=partner, service=service,
+                scheduled_start=now, scheduled_end=now + datetime.timedelta(hours=1),
+                total_amount=Decimal('150.00')
+            )
+            for number, user in enumerate(users)
+        ]
+        if name == 'booking_reminder':
+            return [Reminder(booking, booking.client, 24) for booking in bookings]
+        return bookings
+
+    def handle(self, *args, **options):
+        count = max(options['count'], 1)
+        for name in options['template'] or sorted(email_templates.TEMPLATES):
+            objects = self.sample_objects(name, count)
+            email_templates.compile_template.cache_clear()
+
+            started = time.perf_counter()
+            for language in email_templates.LANGUAGES:
+                email_templates.compile_template(name, language)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            for obj in objects:
+                email_templates.render_email(name, obj)
+            single_us = (time.perf_counter() - started) / count * 1e6
+
+            started = time.perf_counter()
+            for _ in email_templates.render_batch(name, objects):
+                pass
+            batch_us = (time.perf_counter() - started) / count * 1e6
+
+            self.stdout.write(
+                f'{name}: compile {compile_ms:.2f} ms, '
+                f'render_email {single_us:.1f} us/msg, render_batch {batch_us:.1f} us/msg '
+                f'({count} messages)'
+            )
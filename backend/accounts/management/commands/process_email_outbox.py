@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from accounts.outbox import BATCH_SIZE, deliver_pending, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox over a reused mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Emails sent per connection')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls when idle (with --loop)')
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self.stdout.write('Processing email outbox (Ctrl+C to stop)...')
+            try:
+                run_worker(batch_size=options['batch_size'], interval=options['interval'])
+            except KeyboardInterrupt:
+                pass
+            return
+
+        sent, failed = deliver_pending(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sent {sent} emails, gave up on {failed}')
+        )
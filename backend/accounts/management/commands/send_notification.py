@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.dispatch import AUDIENCES, BATCH_SIZE, CHANNELS, CHUNK_SIZE, run_dispatch
+from accounts.models import NotificationDispatch
+
+
+class Command(BaseCommand):
+    help = 'Send a notification to an audience over email, SMS and push, honouring user preferences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--audience', choices=sorted(AUDIENCES), required=True)
+        parser.add_argument('--title-en', required=True)
+        parser.add_argument('--body-en', required=True, help='May use {first_name}')
+        parser.add_argument('--title-pt', help='Defaults to the English title')
+        parser.add_argument('--body-pt', help='Defaults to the English body')
+        parser.add_argument(
+            '--channel', dest='channels', action='append', choices=sorted(CHANNELS),
+            help='Channel to use (repeatable; default all)'
+        )
+        parser.add_argument('--marketing', action='store_true', help='Only email users who accept marketing emails')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Users per worker task')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Users per channel hand-off')
+        parser.add_argument('--workers', action='store_true', help='Queue the ranges on Celery instead of running inline')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--chunk-size and --batch-size must be positive')
+
+        dispatch = NotificationDispatch.objects.create(
+            audience=options['audience'],
+            channels=options['channels'] or sorted(CHANNELS),
+            is_marketing=options['marketing'],
+            title_en=options['title_en'],
+            body_en=options['body_en'],
+            title_pt=options['title_pt'] or options['title_en'],
+            body_pt=options['body_pt'] or options['body_en'],
+        )
+        self.stdout.write(f'Dispatching notification {dispatch.pk} to {dispatch.audience}...')
+
+        chunks = run_dispatch(
+            dispatch, chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+            use_workers=options['workers']
+        )
+
+        if options['workers']:
+            self.stdout.write(self.style.SUCCESS(f'Queued {chunks} delivery tasks'))
+            return
+        dispatch.refresh_from_db()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Reached {dispatch.recipients} users: {dispatch.sent} delivered or queued, {dispatch.failed} failed'
+            )
+        )
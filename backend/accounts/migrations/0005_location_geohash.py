@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:37
+
+from django.db import migrations, models
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=9):
+    """accounts.geo.encode as of this migration"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    Location = apps.get_model('accounts', 'Location')
+    located = Location.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    locations = []
+    for location in located.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        location.geohash = encode(location.latitude, location.longitude)
+        locations.append(location)
+    Location.objects.bulk_update(locations, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_partnerprofile_average_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of the coordinates, maintained on save (see accounts.geo)', max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
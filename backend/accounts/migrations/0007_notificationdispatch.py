@@ -0,0 +1,64 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDispatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(help_text='Named audience from accounts.dispatch.AUDIENCES', max_length=30)),
+                ('channels', models.JSONField(default=list, help_text='Channels to use, e.g. ["EMAIL", "SMS", "PUSH"]')),
+                ('is_marketing', models.BooleanField(default=False, help_text='Email only users who accept marketing emails')),
+                ('title_pt', models.CharField(max_length=200)),
+                ('title_en', models.CharField(max_length=200)),
+                ('body_pt', models.TextField(help_text='May use {first_name}')),
+                ('body_en', models.TextField(help_text='May use {first_name}')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed')], default='PENDING', max_length=10)),
+                ('chunks_total', models.PositiveIntegerField(default=0)),
+                ('chunks_done', models.PositiveIntegerField(default=0)),
+                ('recipients', models.PositiveIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification Dispatch',
+                'verbose_name_plural': 'Notification Dispatches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('EMAIL', 'Email'), ('SMS', 'SMS'), ('PUSH', 'Push')], max_length=5)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('SENT', 'Sent'), ('FAILED', 'Failed')], max_length=6)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_deliveries', to=settings.AUTH_USER_MODEL)),
+                ('dispatch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='accounts.notificationdispatch')),
+            ],
+            options={
+                'verbose_name': 'Notification Delivery',
+                'verbose_name_plural': 'Notification Deliveries',
+                'indexes': [models.Index(fields=['dispatch', 'status'], name='accounts_no_dispatc_331489_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationdelivery',
+            constraint=models.UniqueConstraint(fields=('dispatch', 'user', 'channel'), name='unique_notification_delivery'),
+        ),
+    ]
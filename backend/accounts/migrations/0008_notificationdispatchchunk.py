@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_notificationdispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDispatchChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_pk', models.BigIntegerField()),
+                ('last_pk', models.BigIntegerField()),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('dispatch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='accounts.notificationdispatch')),
+            ],
+            options={
+                'verbose_name': 'Notification Dispatch Chunk',
+                'verbose_name_plural': 'Notification Dispatch Chunks',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationdispatchchunk',
+            constraint=models.UniqueConstraint(fields=('dispatch', 'first_pk'), name='unique_notification_dispatch_chunk'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_notificationdispatchchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partnerprofile',
+            name='time_zone',
+            field=models.CharField(blank=True, help_text='IANA time zone of the business hours, e.g. Africa/Luanda; blank uses the platform time zone', max_length=63),
+        ),
+    ]
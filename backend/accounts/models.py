@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from django.utils import timezone
 from django.core.validators import RegexValidator
 
 
@@ -137,6 +138,10 @@ class Location(models.Model):
     is_active = models.BooleanField(default=True)
     latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
     longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    geohash = models.CharField(
+        max_length=12, blank=True, db_index=True, editable=False,
+        help_text=_('Geohash of the coordinates, maintained on save (see accounts.geo)')
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -152,9 +157,26 @@ class Location(models.Model):
             return f"{self.name}, {self.parent.name}"
         return self.name
     
+    def save(self, *args, **kwargs):
+        from .geo import encode
+        
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         """Return the full location name with hierarchy"""
+        if self.pk:
+            from .location_tree import get_location_tree
+            tree = get_location_tree()
+            if self.pk in tree:
+                return tree.full_name(self.pk)
         if self.parent:
             return f"{self.name}, {self.parent.full_name}"
         return self.name
@@ -182,6 +204,11 @@ class PartnerProfile(models.Model):
     # Business details
     website_url = models.URLField(blank=True)
     business_hours = models.JSONField(default=dict, help_text=_('Business hours by day of week'))
+    time_zone = models.CharField(
+        max_length=63,
+        blank=True,
+        help_text=_('IANA time zone of the business hours, e.g. Africa/Luanda; blank uses the platform time zone')
+    )
     
     # Verification and ratings
     verification_status = models.CharField(
@@ -266,3 +293,140 @@ class UserPreference(models.Model):
     
     def __str__(self):
         return f"Preferences for {self.user.get_full_name()}"
+
+
+class EmailOutbox(models.Model):
+    """Queued outgoing email, delivered in batches by accounts.outbox"""
+    
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        SENDING = 'SENDING', _('Sending')
+        SENT = 'SENT', _('Sent')
+        FAILED = 'FAILED', _('Failed')
+    
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    category = models.CharField(max_length=50, blank=True, help_text=_('Kind of message, e.g. welcome or login'))
+    dedupe_key = models.CharField(
+        max_length=128, blank=True,
+        help_text=_('Messages sharing a non-empty key are only queued once')
+    )
+    
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('Email Outbox')
+        verbose_name_plural = _('Email Outbox')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=~models.Q(dedupe_key=''),
+                name='unique_email_outbox_dedupe_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.category or 'email'} to {self.to_email} ({self.status})"
+
+
+class NotificationDispatch(models.Model):
+    """One notification fanned out to an audience (see accounts.dispatch)"""
+    
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        COMPLETED = 'COMPLETED', _('Completed')
+    
+    audience = models.CharField(max_length=30, help_text=_('Named audience from accounts.dispatch.AUDIENCES'))
+    channels = models.JSONField(default=list, help_text=_('Channels to use, e.g. ["EMAIL", "SMS", "PUSH"]'))
+    is_marketing = models.BooleanField(default=False, help_text=_('Email only users who accept marketing emails'))
+    title_pt = models.CharField(max_length=200)
+    title_en = models.CharField(max_length=200)
+    body_pt = models.TextField(help_text=_('May use {first_name}'))
+    body_en = models.TextField(help_text=_('May use {first_name}'))
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    recipients = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('Notification Dispatch')
+        verbose_name_plural = _('Notification Dispatches')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.title_en} to {self.audience} ({self.status})"
+
+
+class NotificationDispatchChunk(models.Model):
+    """One primary-key range of a dispatch; ``completed_at`` is set by the first run that finishes it"""
+    
+    dispatch = models.ForeignKey(NotificationDispatch, on_delete=models.CASCADE, related_name='chunks')
+    first_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('Notification Dispatch Chunk')
+        verbose_name_plural = _('Notification Dispatch Chunks')
+        constraints = [
+            models.UniqueConstraint(fields=['dispatch', 'first_pk'], name='unique_notification_dispatch_chunk'),
+        ]
+    
+    def __str__(self):
+        return f"Users {self.first_pk}-{self.last_pk} of dispatch {self.dispatch_id}"
+
+
+class NotificationDelivery(models.Model):
+    """Delivery state of a dispatch for one user on one channel"""
+    
+    class Channel(models.TextChoices):
+        EMAIL = 'EMAIL', _('Email')
+        SMS = 'SMS', _('SMS')
+        PUSH = 'PUSH', _('Push')
+    
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', _('Queued')
+        SENT = 'SENT', _('Sent')
+        FAILED = 'FAILED', _('Failed')
+    
+    dispatch = models.ForeignKey(NotificationDispatch, on_delete=models.CASCADE, related_name='deliveries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_deliveries')
+    channel = models.CharField(max_length=5, choices=Channel.choices)
+    status = models.CharField(max_length=6, choices=Status.choices)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Notification Delivery')
+        verbose_name_plural = _('Notification Deliveries')
+        constraints = [
+            models.UniqueConstraint(fields=['dispatch', 'user', 'channel'], name='unique_notification_delivery'),
+        ]
+        indexes = [
+            models.Index(fields=['dispatch', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel} to {self.user_id} ({self.status})"
@@ -3,16 +3,30 @@ Notification service for sending emails and push notifications
 """
 
 import logging
-from django.core.mail import send_mail
-from django.conf import settings
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 from .email_templates import get_welcome_email_template, get_login_notification_template, get_booking_confirmation_template
 
 logger = logging.getLogger(__name__)
 
+# Repeated logins inside one window produce a single notification
+LOGIN_NOTIFICATION_WINDOW_SECONDS = 15 * 60
+
+
+def queue_email(to_email, subject, text_body, html_body='', category='', dedupe_key=''):
+    """Put a message on the outbox; the outbox worker does the actual sending"""
+    from .outbox import enqueue_email
+
+    _, created = enqueue_email(
+        to_email, subject, text_body, html_body=html_body,
+        category=category, dedupe_key=dedupe_key
+    )
+    return created
+
+
 class NotificationService:
-    """Service for handling all types of notifications"""
+    """Service for handling all types of notifications (queued via the email outbox)"""
     
     @staticmethod
     def send_welcome_email(user):
@@ -21,20 +35,20 @@ class NotificationService:
             language = user.preferred_language or 'en'
             template = get_welcome_email_template(user, language)
             
-            send_mail(
-                subject=template['subject'],
-                message=template['text_content'],
-                html_message=template['html_content'],
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
+            queue_email(
+                user.email,
+                template['subject'],
+                template['text_content'],
+                html_body=template['html_content'],
+                category='welcome',
+                dedupe_key=f'welcome:{user.pk}',
             )
             
-            logger.info(f"Welcome email sent to {user.email}")
+            logger.info(f"Welcome email queued for {user.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send welcome email to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue welcome email to {user.email}: {str(e)}")
             return False
     
     @staticmethod
@@ -44,20 +58,21 @@ class NotificationService:
             language = user.preferred_language or 'en'
             template = get_login_notification_template(user, language)
             
-            send_mail(
-                subject=template['subject'],
-                message=template['text_content'],
-                html_message=template['html_content'],
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
+            window = int(timezone.now().timestamp()) // LOGIN_NOTIFICATION_WINDOW_SECONDS
+            queue_email(
+                user.email,
+                template['subject'],
+                template['text_content'],
+                html_body=template['html_content'],
+                category='login',
+                dedupe_key=f'login:{user.pk}:{window}',
             )
             
-            logger.info(f"Login notification sent to {user.email}")
+            logger.info(f"Login notification queued for {user.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send login notification to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue login notification to {user.email}: {str(e)}")
             return False
     
     @staticmethod
@@ -67,20 +82,20 @@ class NotificationService:
             language = booking.client.preferred_language or 'en'
             template = get_booking_confirmation_template(booking, language)
             
-            send_mail(
-                subject=template['subject'],
-                message=template['text_content'],
-                html_message=template['html_content'],
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[booking.client.email],
-                fail_silently=False,
+            queue_email(
+                booking.client.email,
+                template['subject'],
+                template['text_content'],
+                html_body=template['html_content'],
+                category='booking_confirmation',
+                dedupe_key=f'booking-confirmation:{booking.pk}',
             )
             
-            logger.info(f"Booking confirmation sent to {booking.client.email}")
+            logger.info(f"Booking confirmation queued for {booking.client.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send booking confirmation to {booking.client.email}: {str(e)}")
+            logger.error(f"Failed to queue booking confirmation to {booking.client.email}: {str(e)}")
             return False
     
     @staticmethod
@@ -124,19 +139,19 @@ class NotificationService:
                 Access your dashboard for more details.
                 """
             
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[booking.partner.email],
-                fail_silently=False,
+            queue_email(
+                booking.partner.email,
+                subject,
+                message,
+                category='booking_partner',
+                dedupe_key=f'booking-partner:{booking.pk}',
             )
             
-            logger.info(f"Partner notification sent to {booking.partner.email}")
+            logger.info(f"Partner notification queued for {booking.partner.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send partner notification to {booking.partner.email}: {str(e)}")
+            logger.error(f"Failed to queue partner notification to {booking.partner.email}: {str(e)}")
             return False
     
     @staticmethod
@@ -174,17 +189,17 @@ class NotificationService:
                 If you didn't request this reset, please ignore this email.
                 """
             
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
+            queue_email(
+                user.email,
+                subject,
+                message,
+                category='password_reset',
+                dedupe_key=f'password-reset:{user.pk}:{reset_token}',
             )
             
-            logger.info(f"Password reset email sent to {user.email}")
+            logger.info(f"Password reset email queued for {user.email}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send password reset email to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue password reset email to {user.email}: {str(e)}")
             return False
@@ -0,0 +1,170 @@
+"""
+Durable email outbox
+
+Requests only insert an ``EmailOutbox`` row (``enqueue_email``); a worker
+(``process_email_outbox`` command or the ``deliver_email_outbox`` Celery task)
+drains due rows in batches over one reused mail connection. Failed sends are
+retried with exponential backoff and given up after ``MAX_ATTEMPTS``.
+
+Rows are claimed by switching them to SENDING with a lease, so several workers
+can run side by side; a worker that dies mid-batch only delays its rows until
+the lease expires.
+"""
+
+import datetime
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 60 * 60 * 6
+CLAIM_LEASE = datetime.timedelta(minutes=10)
+
+# ``connected`` is false when the mail server could not be reached at all
+BatchResult = namedtuple('BatchResult', ['claimed', 'sent', 'failed', 'connected'])
+
+
+def enqueue_email(to_email, subject, text_body, html_body='', category='', dedupe_key='', from_email=None):
+    """
+    Queue one message; returns ``(row, created)``. A message whose
+    ``dedupe_key`` was already queued is not queued again.
+    """
+    from .models import EmailOutbox
+
+    fields = {
+        'to_email': to_email,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+        'subject': subject,
+        'text_body': text_body,
+        'html_body': html_body or '',
+        'category': category,
+    }
+    if not dedupe_key:
+        return EmailOutbox.objects.create(**fields), True
+    try:
+        with transaction.atomic():
+            return EmailOutbox.objects.create(dedupe_key=dedupe_key, **fields), True
+    except IntegrityError:
+        return EmailOutbox.objects.get(dedupe_key=dedupe_key), False
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``"""
+    return datetime.timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(batch_size=BATCH_SIZE, now=None):
+    """Lock and lease up to ``batch_size`` due messages for this worker"""
+    from .models import EmailOutbox
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        # A SENDING row whose lease ran out belongs to a worker that died
+        due = EmailOutbox.objects.filter(
+            status__in=(EmailOutbox.Status.PENDING, EmailOutbox.Status.SENDING),
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'pk').select_for_update(skip_locked=True)
+        messages = list(due[:batch_size])
+        if messages:
+            EmailOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(
+                status=EmailOutbox.Status.SENDING, next_attempt_at=now + CLAIM_LEASE
+            )
+    return messages
+
+
+def _build(message, connection):
+    email = EmailMultiAlternatives(
+        subject=message.subject,
+        body=message.text_body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[message.to_email],
+        connection=connection,
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, 'text/html')
+    return email
+
+
+def deliver_batch(batch_size=BATCH_SIZE, connection=None):
+    """Send one batch over a single connection; returns a ``BatchResult``"""
+    from .models import EmailOutbox
+
+    messages = claim_batch(batch_size)
+    if not messages:
+        return BatchResult(0, 0, 0, True)
+
+    connection = connection or get_connection(fail_silently=False)
+    sent, retry, failed = [], [], []
+    try:
+        connection.open()
+    except Exception as exc:
+        # Mail server unreachable: push the whole batch back without spending attempts
+        logger.warning(f"Email outbox could not connect: {exc}")
+        EmailOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(
+            status=EmailOutbox.Status.PENDING,
+            next_attempt_at=timezone.now() + backoff(1),
+            last_error=str(exc)[:1000],
+        )
+        return BatchResult(len(messages), 0, 0, False)
+
+    try:
+        for message in messages:
+            try:
+                _build(message, connection).send()
+                sent.append(message.pk)
+            except Exception as exc:
+                message.attempts += 1
+                message.last_error = str(exc)[:1000]
+                if message.attempts >= MAX_ATTEMPTS:
+                    message.status = EmailOutbox.Status.FAILED
+                    failed.append(message)
+                else:
+                    message.status = EmailOutbox.Status.PENDING
+                    message.next_attempt_at = timezone.now() + backoff(message.attempts)
+                    retry.append(message)
+                logger.error(f"Failed to send {message.category or 'email'} to {message.to_email}: {exc}")
+    finally:
+        connection.close()
+
+    if sent:
+        EmailOutbox.objects.filter(pk__in=sent).update(
+            status=EmailOutbox.Status.SENT, sent_at=timezone.now(), last_error=''
+        )
+    if retry or failed:
+        EmailOutbox.objects.bulk_update(
+            retry + failed, ['status', 'attempts', 'next_attempt_at', 'last_error']
+        )
+    return BatchResult(len(messages), len(sent), len(failed), True)
+
+
+def deliver_pending(batch_size=BATCH_SIZE, max_batches=None):
+    """Drain every due message, one connection per batch; returns ``(sent, failed)``"""
+    total_sent = total_failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        result = deliver_batch(batch_size)
+        total_sent += result.sent
+        total_failed += result.failed
+        batches += 1
+        # Messages put back for a retry are not due again yet, so a full claim means more may be waiting
+        if not result.connected or result.claimed < batch_size:
+            break
+    return total_sent, total_failed
+
+
+def run_worker(batch_size=BATCH_SIZE, interval=5, stop=None):
+    """Poll the outbox until ``stop()`` returns true (forever by default)"""
+    while not (stop and stop()):
+        sent, failed = deliver_pending(batch_size)
+        if sent or failed:
+            logger.info(f"Email outbox delivered {sent}, gave up on {failed}")
+        else:
+            time.sleep(interval)
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ebglobal.cache import invalidate_tags
+from .location_tree import invalidate_location_tree
+from .models import Location
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_cached_location_responses(sender, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_tags('locations')
+    invalidate_location_tree()
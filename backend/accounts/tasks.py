@@ -0,0 +1,24 @@
+from celery import shared_task
+
+from . import dispatch, outbox
+
+
+@shared_task
+def deliver_email_outbox(batch_size=outbox.BATCH_SIZE):
+    """Send due outbox emails; schedule every few seconds with Celery beat"""
+    return outbox.deliver_pending(batch_size=batch_size)
+
+
+@shared_task
+def run_notification_dispatch(dispatch_id, chunk_size=dispatch.CHUNK_SIZE, batch_size=dispatch.BATCH_SIZE):
+    """Split a dispatch into pk ranges and queue one delivery task per range"""
+    from .models import NotificationDispatch
+
+    notification = NotificationDispatch.objects.get(pk=dispatch_id)
+    return dispatch.run_dispatch(notification, chunk_size=chunk_size, batch_size=batch_size, use_workers=True)
+
+
+@shared_task
+def deliver_notification_chunk(dispatch_id, first_pk, last_pk, batch_size=dispatch.BATCH_SIZE):
+    """Deliver one pk range of a dispatch"""
+    return dispatch.deliver_chunk(dispatch_id, first_pk, last_pk, batch_size=batch_size)
@@ -1,3 +1,283 @@
-from django.test import TestCase
+import gzip
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .dispatch import deliver_chunk, plan_dispatch, run_dispatch
+from .email_templates import TEMPLATES, compile_template, get_welcome_email_template, render_batch
+from .location_tree import get_location_tree
+from .models import EmailOutbox, Location, NotificationDelivery, NotificationDispatch, User, UserPreference
+from .notifications import NotificationService
+from .outbox import MAX_ATTEMPTS, deliver_pending, enqueue_email
+
+
+class EmailOutboxTests(TestCase):
+    """Queued notifications are sent by the outbox worker, not the request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='client@example.com', password='x', first_name='Cli', last_name='Ent', role='CLIENT'
+        )
+
+    def test_notifications_are_queued_not_sent(self):
+        self.assertTrue(NotificationService.send_welcome_email(self.user))
+        self.assertTrue(NotificationService.send_login_notification(self.user))
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.PENDING).count(), 2)
+
+    def test_dedupe_key_queues_once(self):
+        # Both logins fall in the same notification window
+        window_middle = timezone.now().replace(minute=7, second=30)
+        with mock.patch('accounts.notifications.timezone.now', return_value=window_middle):
+            NotificationService.send_welcome_email(self.user)
+            NotificationService.send_welcome_email(self.user)
+            NotificationService.send_login_notification(self.user)
+            NotificationService.send_login_notification(self.user)
+
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_failed_send_does_not_stop_the_drain(self):
+        for number in range(4):
+            enqueue_email(f'user{number}@example.com', 'Hello', 'Text')
+        real_send = mail.backends.locmem.EmailBackend.send_messages
+
+        def refuse_first(backend, messages):
+            if messages[0].to == ['user0@example.com']:
+                raise OSError('refused')
+            return real_send(backend, messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', refuse_first):
+            self.assertEqual(deliver_pending(batch_size=2), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for number in range(5):
+            enqueue_email(f'user{number}@example.com', 'Hello', 'Text', html_body='<p>Text</p>')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open') as opened:
+            sent, failed = deliver_pending(batch_size=10)
+
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.Status.SENT).exists())
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        message, _ = enqueue_email('client@example.com', 'Hello', 'Text')
+
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')
+        ):
+            self.assertEqual(deliver_pending(), (0, 0))
+            message.refresh_from_db()
+            self.assertEqual(message.status, EmailOutbox.Status.PENDING)
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.next_attempt_at, timezone.now())
+
+            # Not due yet
+            self.assertEqual(deliver_pending(), (0, 0))
+
+            EmailOutbox.objects.filter(pk=message.pk).update(
+                attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now()
+            )
+            self.assertEqual(deliver_pending(), (0, 1))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutbox.Status.FAILED)
+        self.assertEqual(message.last_error, 'refused')
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class EmailTemplateTests(TestCase):
+    """Compiled notification templates"""
+
+    def make_user(self, **fields):
+        defaults = {'email': 'ana@example.com', 'first_name': 'Ana', 'last_name': 'Silva', 'role': 'CLIENT'}
+        return User(date_joined=timezone.now(), **{**defaults, **fields})
+
+    def test_values_are_escaped_in_html_only(self):
+        message = get_welcome_email_template(self.make_user(first_name='<b>Ana</b>'), 'en')
+
+        self.assertIn('Welcome, &lt;b&gt;Ana&lt;/b&gt;!', message['html_content'])
+        self.assertIn('Welcome, <b>Ana</b>!', message['text_content'])
+
+    def test_text_is_derived_from_html(self):
+        text = compile_template('welcome', 'pt').text
+
+        self.assertIn('- Tipo de conta: {role}', text)
+        self.assertIn('Aceder ao Painel: http://localhost:3000/dashboard', text)
+        self.assertNotIn('<', text)
+
+    def test_batch_uses_each_recipient_language(self):
+        users = [self.make_user(preferred_language='pt'), self.make_user(preferred_language='en')]
+
+        subjects = [message['subject'] for message in render_batch('welcome', users)]
+
+        self.assertEqual(subjects, ['Bem-vindo ao E-B Global!', 'Welcome to E-B Global!'])
+
+    def test_benchmark_covers_every_template(self):
+        out = StringIO()
+
+        call_command('benchmark_email_templates', count=2, stdout=out)
+
+        self.assertEqual(
+            sorted(line.split(':')[0] for line in out.getvalue().splitlines()), sorted(TEMPLATES)
+        )
+
+
+@override_settings(NOTIFICATION_RATE_LIMITS={'SMS': None, 'PUSH': None})
+class NotificationDispatchTests(TestCase):
+    """Fan-out of a dispatch honours each user's preferences"""
+
+    @classmethod
+    def setUpTestData(cls):
+        def user(number, **fields):
+            return User.objects.create_user(
+                email=f'user{number}@example.com', password='x', first_name=f'User{number}',
+                last_name='Test', role='CLIENT', **fields
+            )
+
+        cls.defaults = user(1)
+        cls.sms = user(2, phone_number='+244912345678')
+        UserPreference.objects.create(user=cls.sms, notification_sms=True, notification_push=False)
+        cls.muted = user(3)
+        UserPreference.objects.create(user=cls.muted, notification_email=False, notification_push=False)
+        cls.marketing = user(4, preferred_language='pt')
+        UserPreference.objects.create(user=cls.marketing, marketing_emails=True)
+        User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+
+    def dispatch(self, **fields):
+        return NotificationDispatch.objects.create(
+            audience='clients', channels=['EMAIL', 'SMS', 'PUSH'], title_en='Reminder', title_pt='Lembrete',
+            body_en='Hello {first_name}', body_pt='Olá {first_name}', **fields
+        )
+
+    def deliveries(self, dispatch):
+        return set(NotificationDelivery.objects.filter(dispatch=dispatch).values_list('user__email', 'channel'))
+
+    def test_channels_follow_preferences(self):
+        dispatch = self.dispatch()
+
+        run_dispatch(dispatch, chunk_size=2, batch_size=1)
+
+        self.assertEqual(self.deliveries(dispatch), {
+            ('user1@example.com', 'EMAIL'), ('user1@example.com', 'PUSH'),
+            ('user2@example.com', 'EMAIL'), ('user2@example.com', 'SMS'),
+            ('user4@example.com', 'EMAIL'), ('user4@example.com', 'PUSH'),
+        })
+        dispatch.refresh_from_db()
+        self.assertEqual(dispatch.status, NotificationDispatch.Status.COMPLETED)
+        self.assertEqual((dispatch.chunks_total, dispatch.chunks_done), (2, 2))
+        self.assertEqual((dispatch.recipients, dispatch.sent, dispatch.failed), (3, 6, 0))
+        self.assertEqual(
+            EmailOutbox.objects.get(to_email='user4@example.com').text_body, 'Olá User4'
+        )
+
+    def test_marketing_email_needs_opt_in(self):
+        dispatch = self.dispatch(is_marketing=True)
+
+        run_dispatch(dispatch)
+
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list('to_email', flat=True)), ['user4@example.com']
+        )
+
+    def test_rerunning_a_chunk_sends_nothing_twice(self):
+        dispatch = self.dispatch()
+        run_dispatch(dispatch)
+
+        self.assertEqual(deliver_chunk(dispatch.pk, self.defaults.pk, self.marketing.pk), (0, 0, 0))
+        self.assertEqual(NotificationDelivery.objects.filter(dispatch=dispatch).count(), 6)
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+        dispatch.refresh_from_db()
+        self.assertEqual((dispatch.chunks_total, dispatch.chunks_done), (1, 1))
+        self.assertEqual((dispatch.recipients, dispatch.sent, dispatch.failed), (3, 6, 0))
+
+    def test_interrupted_chunk_is_counted_once_on_retry(self):
+        dispatch = self.dispatch()
+        plan_dispatch(dispatch)
+        # First attempt delivered user1 and user2, then died before finishing the range
+        deliver_chunk(dispatch.pk, self.defaults.pk, self.sms.pk)
+        dispatch.chunks_done = 0
+        dispatch.status = NotificationDispatch.Status.RUNNING
+        dispatch.save(update_fields=['chunks_done', 'status'])
+        dispatch.chunks.update(completed_at=None)
+
+        self.assertEqual(deliver_chunk(dispatch.pk, self.defaults.pk, self.marketing.pk), (1, 2, 0))
+        self.assertEqual(deliver_chunk(dispatch.pk, self.defaults.pk, self.marketing.pk), (0, 0, 0))
+
+        dispatch.refresh_from_db()
+        self.assertEqual(dispatch.status, NotificationDispatch.Status.COMPLETED)
+        self.assertEqual(dispatch.chunks_done, 1)
+        self.assertEqual((dispatch.recipients, dispatch.sent, dispatch.failed), (3, 6, 0))
+
+
+class LocationTreeTests(TestCase):
+    """Location dropdowns are served from the per-process snapshot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.angola = Location.objects.create(name='Angola', location_type='COUNTRY')
+        cls.luanda_province = Location.objects.create(name='Luanda', location_type='PROVINCE', parent=cls.angola)
+        cls.luanda = Location.objects.create(
+            name='Luanda', name_en='Luanda', location_type='CITY', parent=cls.luanda_province
+        )
+        cls.viana = Location.objects.create(
+            name='Viana', name_en='Viana', location_type='CITY', parent=cls.luanda_province
+        )
+
+    def setUp(self):
+        # Snapshots built by other tests describe rolled-back rows
+        cache.clear()
+
+    def test_list_is_served_without_queries(self):
+        self.client.get('/api/v1/auth/locations/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/auth/locations/', {'type': 'CITY', 'within': self.angola.pk})
+        self.assertEqual([row['name_en'] for row in response.json()], ['Luanda', 'Viana'])
+
+    def test_edit_reloads_the_snapshot_and_changes_the_etag(self):
+        tree = get_location_tree()
+        etag = self.client.get('/api/v1/auth/locations/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viana.is_active = False
+            self.viana.save()
+
+        self.assertIsNot(get_location_tree(), tree)
+        self.assertEqual(self.luanda.full_name, 'Luanda, Luanda, Angola')
+        response = self.client.get('/api/v1/auth/locations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.viana.pk, [row['id'] for row in response.json()])
+
+
+class I18nBundleTests(TestCase):
+    """Pre-serialized translation bundles with conditional and gzip responses"""
+
+    def test_regional_code_falls_back_and_revalidates(self):
+        response = self.client.get('/api/v1/i18n/pt-BR/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['common']['cancel'], 'Cancelar')
+
+        cached = self.client.get('/api/v1/i18n/pt/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_gzip_and_namespace_subsets(self):
+        response = self.client.get('/api/v1/i18n/en/?namespaces=common', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(list(json.loads(gzip.decompress(response.content))), ['common'])
+        self.assertNotEqual(response['ETag'], self.client.get('/api/v1/i18n/en/?namespaces=common')['ETag'])
+
+        self.assertEqual(self.client.get('/api/v1/i18n/en/?namespaces=nope').status_code, 400)
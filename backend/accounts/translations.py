@@ -0,0 +1,238 @@
+"""
+Translation bundles served by ``I18nView``
+
+The catalogue is compiled once per process into immutable, pre-serialized
+and pre-gzipped JSON bundles, one per language and requested namespace set,
+each with a content-hash ETag. Serving a bundle is a dictionary lookup; no
+per-request serialization or compression.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+DEFAULT_LANGUAGE = 'en'
+
+TRANSLATIONS = {
+    'en': {
+        "common": {
+            "loading": "Loading...",
+            "error": "Error",
+            "success": "Success",
+            "cancel": "Cancel",
+            "save": "Save",
+            "edit": "Edit",
+            "delete": "Delete",
+            "confirm": "Confirm",
+            "back": "Back",
+            "next": "Next",
+            "previous": "Previous",
+            "search": "Search",
+            "filter": "Filter",
+            "sort": "Sort",
+            "view": "View",
+            "close": "Close",
+            "yes": "Yes",
+            "no": "No"
+        },
+        "navigation": {
+            "home": "Home",
+            "services": "Services",
+            "bookings": "Bookings",
+            "profile": "Profile",
+            "settings": "Settings",
+            "help": "Help",
+            "contact": "Contact",
+            "about": "About"
+        },
+        "auth": {
+            "login": "Login",
+            "logout": "Logout",
+            "register": "Register",
+            "email": "Email",
+            "password": "Password",
+            "confirm_password": "Confirm Password",
+            "forgot_password": "Forgot Password?",
+            "remember_me": "Remember Me",
+            "sign_in": "Sign In",
+            "sign_up": "Sign Up",
+            "create_account": "Create Account"
+        },
+        "services": {
+            "categories": "Service Categories",
+            "imobiliaria": "Real Estate Consulting",
+            "transportes": "Transportation Services",
+            "negocios": "Business Consulting",
+            "juridica": "Legal Services",
+            "linguistica": "Language Services",
+            "documentos": "Document Recognition",
+            "catering": "Corporate Catering",
+            "protocolo": "Protocol Services",
+            "book_now": "Book Now",
+            "view_details": "View Details",
+            "price": "Price",
+            "duration": "Duration",
+            "location": "Location",
+            "rating": "Rating",
+            "reviews": "Reviews"
+        },
+        "booking": {
+            "select_date": "Select Date",
+            "select_time": "Select Time",
+            "special_requirements": "Special Requirements",
+            "book_service": "Book Service",
+            "booking_summary": "Booking Summary",
+            "total_amount": "Total Amount",
+            "payment_method": "Payment Method",
+            "confirm_booking": "Confirm Booking",
+            "booking_confirmed": "Booking Confirmed"
+        },
+        "profile": {
+            "personal_info": "Personal Information",
+            "business_info": "Business Information",
+            "contact_info": "Contact Information",
+            "preferences": "Preferences",
+            "notifications": "Notifications",
+            "security": "Security",
+            "privacy": "Privacy"
+        }
+    },
+    'pt': {
+        "common": {
+            "loading": "A carregar...",
+            "error": "Erro",
+            "success": "Sucesso",
+            "cancel": "Cancelar",
+            "save": "Guardar",
+            "edit": "Editar",
+            "delete": "Eliminar",
+            "confirm": "Confirmar",
+            "back": "Voltar",
+            "next": "Seguinte",
+            "previous": "Anterior",
+            "search": "Pesquisar",
+            "filter": "Filtrar",
+            "sort": "Ordenar",
+            "view": "Ver",
+            "close": "Fechar",
+            "yes": "Sim",
+            "no": "Não"
+        },
+        "navigation": {
+            "home": "Início",
+            "services": "Serviços",
+            "bookings": "Reservas",
+            "profile": "Perfil",
+            "settings": "Configurações",
+            "help": "Ajuda",
+            "contact": "Contacto",
+            "about": "Sobre"
+        },
+        "auth": {
+            "login": "Entrar",
+            "logout": "Sair",
+            "register": "Registar",
+            "email": "Email",
+            "password": "Palavra-passe",
+            "confirm_password": "Confirmar Palavra-passe",
+            "forgot_password": "Esqueceu-se da palavra-passe?",
+            "remember_me": "Lembrar-me",
+            "sign_in": "Entrar",
+            "sign_up": "Registar",
+            "create_account": "Criar Conta"
+        },
+        "services": {
+            "categories": "Categorias de Serviços",
+            "imobiliaria": "Consultoria Imobiliária",
+            "transportes": "Serviços de Transporte",
+            "negocios": "Consultoria de Negócios",
+            "juridica": "Serviços Jurídicos",
+            "linguistica": "Serviços Linguísticos",
+            "documentos": "Reconhecimento de Documentos",
+            "catering": "Catering Corporativo",
+            "protocolo": "Serviços de Protocolo",
+            "book_now": "Reservar Agora",
+            "view_details": "Ver Detalhes",
+            "price": "Preço",
+            "duration": "Duração",
+            "location": "Localização",
+            "rating": "Avaliação",
+            "reviews": "Avaliações"
+        },
+        "booking": {
+            "select_date": "Selecionar Data",
+            "select_time": "Selecionar Hora",
+            "special_requirements": "Requisitos Especiais",
+            "book_service": "Reservar Serviço",
+            "booking_summary": "Resumo da Reserva",
+            "total_amount": "Valor Total",
+            "payment_method": "Método de Pagamento",
+            "confirm_booking": "Confirmar Reserva",
+            "booking_confirmed": "Reserva Confirmada"
+        },
+        "profile": {
+            "personal_info": "Informações Pessoais",
+            "business_info": "Informações do Negócio",
+            "contact_info": "Informações de Contacto",
+            "preferences": "Preferências",
+            "notifications": "Notificações",
+            "security": "Segurança",
+            "privacy": "Privacidade"
+        }
+    },
+}
+
+
+class Bundle:
+    """Serialized translations: ``body`` and ``gzipped`` body, each with its own strong ETag"""
+
+    __slots__ = ('body', 'gzipped', 'etag', 'gzip_etag')
+
+    def __init__(self, messages):
+        self.body = json.dumps(messages, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode()
+        # mtime=0 keeps the compressed bytes identical across processes
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+class TranslationBundles:
+    """Bundles per ``(language, namespaces)``; full catalogues are built up front, subsets on first use"""
+
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.namespaces = {language: frozenset(messages) for language, messages in catalogue.items()}
+        self._bundles = {}
+        self._lock = threading.Lock()
+        for language, namespaces in self.namespaces.items():
+            self._bundles[(language, namespaces)] = Bundle(catalogue[language])
+
+    def resolve_language(self, language):
+        """Supported language for a requested code (``pt-BR`` -> ``pt``), else the default"""
+        language = (language or '').lower()
+        if language in self.catalogue:
+            return language
+        base = language.split('-')[0].split('_')[0]
+        return base if base in self.catalogue else DEFAULT_LANGUAGE
+
+    def get(self, language, namespaces=None):
+        """Bundle for ``language`` limited to ``namespaces`` (all when None); raises KeyError for unknown ones"""
+        available = self.namespaces[language]
+        wanted = available if namespaces is None else frozenset(namespaces)
+        unknown = wanted - available
+        if unknown:
+            raise KeyError(', '.join(sorted(unknown)))
+        key = (language, wanted)
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            with self._lock:
+                bundle = self._bundles.get(key)
+                if bundle is None:
+                    messages = self.catalogue[language]
+                    bundle = self._bundles[key] = Bundle({name: messages[name] for name in wanted})
+        return bundle
+
+
+bundles = TranslationBundles(TRANSLATIONS)
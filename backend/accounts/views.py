@@ -4,196 +4,53 @@ from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from .models import User, Location, PartnerProfile, UserPreference
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from .models import User, PartnerProfile, UserPreference
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     UserUpdateSerializer, PartnerProfileSerializer, PartnerProfileUpdateSerializer,
-    UserPreferenceSerializer, PasswordChangeSerializer, LocationSerializer
+    UserPreferenceSerializer, PasswordChangeSerializer
 )
 from .notifications import NotificationService
+from .location_tree import get_location_tree
+from .translations import bundles as translation_bundles
 
 
 class I18nView(APIView):
     """API-driven internationalization endpoint"""
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
     
     def get(self, request, language):
-        """Return translations for the specified language"""
-        
-        # Default translations for English
-        en_translations = {
-            "common": {
-                "loading": "Loading...",
-                "error": "Error",
-                "success": "Success",
-                "cancel": "Cancel",
-                "save": "Save",
-                "edit": "Edit",
-                "delete": "Delete",
-                "confirm": "Confirm",
-                "back": "Back",
-                "next": "Next",
-                "previous": "Previous",
-                "search": "Search",
-                "filter": "Filter",
-                "sort": "Sort",
-                "view": "View",
-                "close": "Close",
-                "yes": "Yes",
-                "no": "No"
-            },
-            "navigation": {
-                "home": "Home",
-                "services": "Services",
-                "bookings": "Bookings",
-                "profile": "Profile",
-                "settings": "Settings",
-                "help": "Help",
-                "contact": "Contact",
-                "about": "About"
-            },
-            "auth": {
-                "login": "Login",
-                "logout": "Logout",
-                "register": "Register",
-                "email": "Email",
-                "password": "Password",
-                "confirm_password": "Confirm Password",
-                "forgot_password": "Forgot Password?",
-                "remember_me": "Remember Me",
-                "sign_in": "Sign In",
-                "sign_up": "Sign Up",
-                "create_account": "Create Account"
-            },
-            "services": {
-                "categories": "Service Categories",
-                "imobiliaria": "Real Estate Consulting",
-                "transportes": "Transportation Services",
-                "negocios": "Business Consulting",
-                "juridica": "Legal Services",
-                "linguistica": "Language Services",
-                "documentos": "Document Recognition",
-                "catering": "Corporate Catering",
-                "protocolo": "Protocol Services",
-                "book_now": "Book Now",
-                "view_details": "View Details",
-                "price": "Price",
-                "duration": "Duration",
-                "location": "Location",
-                "rating": "Rating",
-                "reviews": "Reviews"
-            },
-            "booking": {
-                "select_date": "Select Date",
-                "select_time": "Select Time",
-                "special_requirements": "Special Requirements",
-                "book_service": "Book Service",
-                "booking_summary": "Booking Summary",
-                "total_amount": "Total Amount",
-                "payment_method": "Payment Method",
-                "confirm_booking": "Confirm Booking",
-                "booking_confirmed": "Booking Confirmed"
-            },
-            "profile": {
-                "personal_info": "Personal Information",
-                "business_info": "Business Information",
-                "contact_info": "Contact Information",
-                "preferences": "Preferences",
-                "notifications": "Notifications",
-                "security": "Security",
-                "privacy": "Privacy"
-            }
-        }
+        """Return translations for the specified language (``?namespaces=common,auth`` for a subset)"""
+        language = translation_bundles.resolve_language(language)
+        namespaces = request.GET.get('namespaces')
+        if namespaces:
+            namespaces = [name.strip() for name in namespaces.split(',') if name.strip()]
         
-        # Portuguese translations
-        pt_translations = {
-            "common": {
-                "loading": "A carregar...",
-                "error": "Erro",
-                "success": "Sucesso",
-                "cancel": "Cancelar",
-                "save": "Guardar",
-                "edit": "Editar",
-                "delete": "Eliminar",
-                "confirm": "Confirmar",
-                "back": "Voltar",
-                "next": "Seguinte",
-                "previous": "Anterior",
-                "search": "Pesquisar",
-                "filter": "Filtrar",
-                "sort": "Ordenar",
-                "view": "Ver",
-                "close": "Fechar",
-                "yes": "Sim",
-                "no": "Não"
-            },
-            "navigation": {
-                "home": "Início",
-                "services": "Serviços",
-                "bookings": "Reservas",
-                "profile": "Perfil",
-                "settings": "Configurações",
-                "help": "Ajuda",
-                "contact": "Contacto",
-                "about": "Sobre"
-            },
-            "auth": {
-                "login": "Entrar",
-                "logout": "Sair",
-                "register": "Registar",
-                "email": "Email",
-                "password": "Palavra-passe",
-                "confirm_password": "Confirmar Palavra-passe",
-                "forgot_password": "Esqueceu-se da palavra-passe?",
-                "remember_me": "Lembrar-me",
-                "sign_in": "Entrar",
-                "sign_up": "Registar",
-                "create_account": "Criar Conta"
-            },
-            "services": {
-                "categories": "Categorias de Serviços",
-                "imobiliaria": "Consultoria Imobiliária",
-                "transportes": "Serviços de Transporte",
-                "negocios": "Consultoria de Negócios",
-                "juridica": "Serviços Jurídicos",
-                "linguistica": "Serviços Linguísticos",
-                "documentos": "Reconhecimento de Documentos",
-                "catering": "Catering Corporativo",
-                "protocolo": "Serviços de Protocolo",
-                "book_now": "Reservar Agora",
-                "view_details": "Ver Detalhes",
-                "price": "Preço",
-                "duration": "Duração",
-                "location": "Localização",
-                "rating": "Avaliação",
-                "reviews": "Avaliações"
-            },
-            "booking": {
-                "select_date": "Selecionar Data",
-                "select_time": "Selecionar Hora",
-                "special_requirements": "Requisitos Especiais",
-                "book_service": "Reservar Serviço",
-                "booking_summary": "Resumo da Reserva",
-                "total_amount": "Valor Total",
-                "payment_method": "Método de Pagamento",
-                "confirm_booking": "Confirmar Reserva",
-                "booking_confirmed": "Reserva Confirmada"
-            },
-            "profile": {
-                "personal_info": "Informações Pessoais",
-                "business_info": "Informações do Negócio",
-                "contact_info": "Informações de Contacto",
-                "preferences": "Preferências",
-                "notifications": "Notificações",
-                "security": "Segurança",
-                "privacy": "Privacidade"
-            }
-        }
+        try:
+            bundle = translation_bundles.get(language, namespaces or None)
+        except KeyError as exc:
+            return Response(
+                {'error': f'Unknown namespaces: {exc.args[0]}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Return translations based on language
-        if language == 'pt':
-            return Response(pt_translations)
-        else:
-            return Response(en_translations)
+        # Pre-serialized bytes: bypass DRF rendering entirely
+        gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        etag = bundle.gzip_etag if gzipped else bundle.etag
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                bundle.gzipped if gzipped else bundle.body, content_type='application/json; charset=utf-8'
+            )
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, max-age=86400, stale-while-revalidate=604800'
+        return response
 
 
 class UserRegistrationView(APIView):
@@ -357,20 +214,30 @@ class LocationListView(APIView):
     """List locations for dropdowns"""
     permission_classes = [permissions.AllowAny]
     
+    FIELDS = ('id', 'name_pt', 'name_en', 'location_type', 'parent', 'is_active')
+    
     def get(self, request):
-        location_type = request.query_params.get('type', None)
-        parent_id = request.query_params.get('parent', None)
-        
-        queryset = Location.objects.filter(is_active=True)
-        
-        if location_type:
-            queryset = queryset.filter(location_type=location_type)
-        
-        if parent_id:
-            queryset = queryset.filter(parent_id=parent_id)
+        location_type = request.query_params.get('type') or None
+        try:
+            parent_id = int(request.query_params['parent']) if request.query_params.get('parent') else None
+            # Everything below a location, e.g. every province and city of a country
+            within_id = int(request.query_params['within']) if request.query_params.get('within') else None
+        except ValueError:
+            return Response(
+                {'error': 'parent and within must be location ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = LocationSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Served from the in-process snapshot: no queries unless a location changed
+        tree = get_location_tree()
+        etag = f'"locations-{tree.version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            nodes = tree.filter(location_type=location_type, parent=parent_id, within=within_id)
+            response = Response([{field: node[field] for field in self.FIELDS} for node in nodes])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        return response
 
 
 @api_view(['POST'])
@@ -0,0 +1,196 @@
+"""
+Columnar exports (Parquet / Arrow IPC) for offline analysis
+
+Rows are read with a server-side cursor (``.iterator(chunk_size=...)``) and
+written one record batch per chunk, so memory stays flat regardless of the
+export size. Columns are derived from the model's concrete fields; JSON and
+free-text fields are left out (they are rarely useful in columnar form and
+often hold personal data).
+"""
+
+import collections
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.apps import apps
+from django.db import models
+
+from .streaming import date_range_filter
+
+FORMATS = ('parquet', 'arrow')
+DEFAULT_COMPRESSION = {'parquet': 'zstd', 'arrow': None}  # uncompressed IPC files can be memory-mapped
+CONTENT_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class ExportSpec:
+    """A table that can be exported: model, date filter field and column tweaks"""
+
+    def __init__(self, model, date_field, extra=None, exclude=()):
+        self.model_label = model
+        self.date_field = date_field
+        self.extra = extra or {}
+        self.exclude = set(exclude)
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def fields(self):
+        """``[(column, lookup, field)]`` for every exported column"""
+        columns = []
+        for field in self.model._meta.concrete_fields:
+            if field.name in self.exclude or isinstance(field, (models.JSONField, models.TextField)):
+                continue
+            columns.append((field.attname, field.attname, field))
+        for column, lookup in self.extra.items():
+            columns.append((column, lookup, self.model._meta.get_field('id')))
+        return columns
+
+
+EXPORTS = {
+    'bookings': ExportSpec(
+        'bookings.Booking', 'created_at',
+        extra={'category_id': 'service__category_id'},
+        exclude={'idempotency_key'},
+    ),
+    'payments': ExportSpec('payments.Payment', 'created_at', exclude={'gateway_transaction_id'}),
+    'payouts': ExportSpec('payments.Payout', 'created_at'),
+    'analytics_metrics': ExportSpec('analytics.AnalyticsMetric', 'date'),
+    'partner_analytics': ExportSpec('analytics.PartnerAnalytics', 'period_start'),
+    'service_performance': ExportSpec('analytics.ServicePerformance', 'period_start'),
+}
+
+
+def arrow_type(field):
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, (models.IntegerField, models.AutoField, models.ForeignKey)):
+        return pa.int64()
+    return pa.string()
+
+
+def export_schema(spec):
+    return pa.schema([
+        pa.field(column, arrow_type(field), nullable=field.null or column in spec.extra)
+        for column, _, field in spec.fields()
+    ])
+
+
+def export_queryset(spec, date_from=None, date_to=None):
+    return spec.model.objects.filter(
+        date_range_filter(spec.model, spec.date_field, date_from, date_to)
+    ).order_by('pk')
+
+
+def record_batches(spec, date_from=None, date_to=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one ``pyarrow.RecordBatch`` per ``chunk_size`` rows"""
+    schema = export_schema(spec)
+    lookups = [lookup for _, lookup, _ in spec.fields()]
+    rows = export_queryset(spec, date_from, date_to).values_list(*lookups).iterator(chunk_size=chunk_size)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _to_batch(chunk, schema)
+            chunk = []
+    if chunk:
+        yield _to_batch(chunk, schema)
+
+
+def _to_batch(rows, schema):
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def open_writer(sink, schema, file_format, compression=None):
+    if compression is None:
+        compression = DEFAULT_COMPRESSION[file_format]
+    if file_format == 'parquet':
+        return pq.ParquetWriter(sink, schema, compression=compression or 'none')
+    options = pa.ipc.IpcWriteOptions(compression=compression) if compression else None
+    return pa.ipc.new_file(sink, schema, options=options)
+
+
+def export_table(name, sink, file_format='parquet', date_from=None, date_to=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """Write table ``name`` to ``sink`` (path or writable file); returns the row count"""
+    spec = EXPORTS[name]
+    writer = open_writer(sink, export_schema(spec), file_format, compression)
+    rows = 0
+    try:
+        for batch in record_batches(spec, date_from, date_to, chunk_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.pending = collections.deque()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.pending.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        while self.pending:
+            yield self.pending.popleft()
+
+
+def stream_table(name, file_format='parquet', date_from=None, date_to=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """
+    Iterator of file bytes for streaming responses; one batch is buffered at
+    a time.
+    """
+    return _stream(EXPORTS[name], file_format, date_from, date_to, chunk_size, compression)
+
+
+def _stream(spec, file_format, date_from, date_to, chunk_size, compression):
+    sink = _ChunkSink()
+    writer = open_writer(pa.PythonFile(sink, mode='w'), export_schema(spec), file_format, compression)
+    for batch in record_batches(spec, date_from, date_to, chunk_size):
+        writer.write_batch(batch)
+        yield from sink.drain()
+    writer.close()
+    yield from sink.drain()
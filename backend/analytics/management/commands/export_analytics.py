@@ -0,0 +1,44 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from analytics.exports import DEFAULT_CHUNK_SIZE, EXPORTS, EXTENSIONS, FORMATS, export_table
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Export bookings, payments, payouts and analytics tables to Parquet or Arrow IPC files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='+', choices=[*EXPORTS, 'all'], help='Tables to export')
+        parser.add_argument('--format', dest='file_format', choices=FORMATS, default='parquet', help='Output file format')
+        parser.add_argument('--output', default='.', help='Directory the files are written to')
+        parser.add_argument('--date-from', type=parse_date, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--date-to', type=parse_date, help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows read and written per batch')
+        parser.add_argument('--compression', help='Codec override (parquet: zstd/snappy/gzip/none, arrow: zstd/lz4)')
+
+    def handle(self, *args, **options):
+        tables = list(EXPORTS) if 'all' in options['tables'] else options['tables']
+        os.makedirs(options['output'], exist_ok=True)
+
+        for table in tables:
+            path = os.path.join(options['output'], f"{table}.{EXTENSIONS[options['file_format']]}")
+            rows = export_table(
+                table, path, options['file_format'],
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                chunk_size=options['chunk_size'],
+                compression=options['compression'],
+            )
+            self.stdout.write(f'{table}: {rows} rows -> {path}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Exported {len(tables)} table(s)')
+        )
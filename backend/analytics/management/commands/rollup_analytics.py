@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from analytics.rollups import run_rollup
+
+
+class Command(BaseCommand):
+    help = 'Fold booking, payment and sign-up changes into analytics metrics and daily partner/service rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every period instead of resuming from the watermark')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per statement')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding all analytics periods...' if options['full'] else 'Rolling up changes since the last run...')
+
+        written = run_rollup(full=options['full'], batch_size=options['batch_size'])
+
+        summary = ', '.join(f'{period_type.lower()}: {count}' for period_type, count in written.items())
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote analytics rows ({summary})')
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupPendingDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Rollup Pending Day',
+                'verbose_name_plural': 'Rollup Pending Days',
+            },
+        ),
+    ]
@@ -97,6 +97,38 @@ class AnalyticsMetric(models.Model):
         return f"{self.date} - {self.get_period_type_display()}"
 
 
+class RollupWatermark(models.Model):
+    """Point up to which source changes have been folded into a rollup"""
+    
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Rollup Watermark')
+        verbose_name_plural = _('Rollup Watermarks')
+    
+    def __str__(self):
+        return f"{self.name} @ {self.processed_until}"
+
+
+class RollupPendingDay(models.Model):
+    """
+    Day to recompute on the next rollup run for a change the watermark scan
+    cannot see: a deleted row or the old day of a rescheduled booking
+    """
+    
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Rollup Pending Day')
+        verbose_name_plural = _('Rollup Pending Days')
+    
+    def __str__(self):
+        return str(self.date)
+
+
 class PartnerAnalytics(models.Model):
     """Partner-specific analytics and performance metrics"""
     
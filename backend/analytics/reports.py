@@ -0,0 +1,226 @@
+"""
+Streaming CSV / NDJSON reports
+
+Reports read flat rows with ``.values()`` and a server-side cursor
+(``.iterator(chunk_size=...)``) and encode them as they go, so a 100k row
+export never holds more than one chunk in memory and the first bytes leave
+the worker immediately. Each report lists the columns a caller may pick
+(``fields``) and the relation that scopes it to a partner or client.
+"""
+
+import csv
+import datetime
+import json
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .streaming import date_range_filter
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson'}
+CHUNK_SIZE = 2000
+
+
+class Report:
+    """An exportable table: model, selectable columns and per-role scoping"""
+
+    def __init__(self, model, date_field, fields, default_fields, scopes):
+        self.model_label = model
+        self.date_field = date_field
+        self.fields = fields  # column name -> ORM lookup
+        self.default_fields = default_fields
+        self.scopes = scopes  # role -> user relation
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def queryset_for(self, user):
+        """Rows visible to ``user``, or None when their role may not run this report"""
+        queryset = self.model.objects.order_by('pk')
+        if user.role in ('ADMIN', 'STAFF'):
+            return queryset
+        relation = self.scopes.get(user.role)
+        if relation is None:
+            return None
+        return queryset.filter(**{relation: user})
+
+
+REPORTS = {
+    'bookings': Report(
+        'bookings.Booking', 'scheduled_start',
+        fields={
+            'id': 'id',
+            'booking_number': 'booking_number',
+            'status': 'status',
+            'booking_type': 'booking_type',
+            'scheduled_start': 'scheduled_start',
+            'scheduled_end': 'scheduled_end',
+            'service_id': 'service_id',
+            'service_name': 'service__name',
+            'category_name': 'service__category__name',
+            'client_id': 'client_id',
+            'client_first_name': 'client__first_name',
+            'client_last_name': 'client__last_name',
+            'partner_id': 'partner_id',
+            'partner_first_name': 'partner__first_name',
+            'partner_last_name': 'partner__last_name',
+            'location_name': 'service_location__name',
+            'is_online_service': 'is_online_service',
+            'base_price': 'base_price',
+            'additional_fees': 'additional_fees',
+            'discount_amount': 'discount_amount',
+            'tax_amount': 'tax_amount',
+            'total_amount': 'total_amount',
+            'currency': 'currency',
+            'client_rating': 'client_rating',
+            'partner_rating': 'partner_rating',
+            'confirmed_at': 'confirmed_at',
+            'completed_at': 'completed_at',
+            'cancelled_at': 'cancelled_at',
+            'created_at': 'created_at',
+        },
+        default_fields=[
+            'booking_number', 'status', 'scheduled_start', 'service_name',
+            'client_first_name', 'client_last_name', 'partner_first_name', 'partner_last_name',
+            'total_amount', 'currency',
+        ],
+        scopes={'PARTNER': 'partner', 'CLIENT': 'client'},
+    ),
+    'payments': Report(
+        'payments.Payment', 'created_at',
+        fields={
+            'id': 'id',
+            'payment_id': 'payment_id',
+            'booking_number': 'booking__booking_number',
+            'payer_id': 'payer_id',
+            'recipient_id': 'recipient_id',
+            'amount': 'amount',
+            'currency': 'currency',
+            'payment_method': 'payment_method',
+            'status': 'status',
+            'gateway': 'gateway',
+            'gateway_fee': 'gateway_fee',
+            'platform_fee': 'platform_fee',
+            'tax_amount': 'tax_amount',
+            'net_amount': 'net_amount',
+            'created_at': 'created_at',
+            'processed_at': 'processed_at',
+        },
+        default_fields=[
+            'payment_id', 'booking_number', 'amount', 'currency', 'payment_method',
+            'status', 'platform_fee', 'net_amount', 'created_at',
+        ],
+        scopes={'PARTNER': 'recipient', 'CLIENT': 'payer'},
+    ),
+    'payouts': Report(
+        'payments.Payout', 'created_at',
+        fields={
+            'id': 'id',
+            'payout_id': 'payout_id',
+            'partner_id': 'partner_id',
+            'amount': 'amount',
+            'currency': 'currency',
+            'status': 'status',
+            'processing_fee': 'processing_fee',
+            'net_amount': 'net_amount',
+            'created_at': 'created_at',
+            'processed_at': 'processed_at',
+        },
+        default_fields=['payout_id', 'amount', 'currency', 'status', 'net_amount', 'created_at', 'processed_at'],
+        scopes={'PARTNER': 'partner'},
+    ),
+    'invoices': Report(
+        'payments.Invoice', 'issue_date',
+        fields={
+            'id': 'id',
+            'invoice_number': 'invoice_number',
+            'booking_number': 'booking__booking_number',
+            'issue_date': 'issue_date',
+            'due_date': 'due_date',
+            'status': 'status',
+            'bill_to_id': 'bill_to_id',
+            'bill_from_id': 'bill_from_id',
+            'subtotal': 'subtotal',
+            'tax_rate': 'tax_rate',
+            'tax_amount': 'tax_amount',
+            'total_amount': 'total_amount',
+            'currency': 'currency',
+            'paid_amount': 'paid_amount',
+            'paid_at': 'paid_at',
+            'created_at': 'created_at',
+        },
+        default_fields=[
+            'invoice_number', 'booking_number', 'issue_date', 'due_date', 'status',
+            'total_amount', 'paid_amount', 'currency',
+        ],
+        scopes={'PARTNER': 'bill_from', 'CLIENT': 'bill_to'},
+    ),
+}
+
+
+def filter_report(report, queryset, date_from=None, date_to=None, status=None):
+    """Apply the common report filters (dates are inclusive local days)"""
+    queryset = queryset.filter(date_range_filter(report.model, report.date_field, date_from, date_to))
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def report_rows(report, queryset, columns, chunk_size=CHUNK_SIZE):
+    """Tuples of ``columns`` read through a server-side cursor"""
+    lookups = [report.fields[column] for column in columns]
+    return queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _format_cell(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if value is None:
+        return ''
+    return value
+
+
+def encode_csv(columns, rows, lines_per_chunk=500):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_format_cell(value) for value in row]))
+        if len(buffer) >= lines_per_chunk:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def encode_ndjson(columns, rows, lines_per_chunk=500):
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n')
+        if len(buffer) >= lines_per_chunk:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+
+def stream_report(report, queryset, columns, file_format):
+    """Encoded chunks of ``queryset`` for a ``StreamingHttpResponse``"""
+    return ENCODERS[file_format](columns, report_rows(report, queryset, columns))
@@ -0,0 +1,528 @@
+"""
+Incremental rollups into ``AnalyticsMetric``
+
+Each run looks at bookings, payments and sign-ups changed since the stored
+watermark, works out which daily/weekly/monthly periods they fall in, and
+recomputes only those periods from the source tables. Rows are written with
+``bulk_create(update_conflicts=True)`` on the model's ``unique_together`` key.
+
+Two grouping levels are produced per period: one overall row (country,
+province and category all NULL) and one row per (country, province, category)
+of the booked service. The same run writes one daily ``PartnerAnalytics`` and
+``ServicePerformance`` row per partner and service with bookings on a changed
+day (``period_start == period_end``); the series endpoints re-bucket those
+into weeks and months. Country and province are derived from the booking's
+``service_location`` assuming the COUNTRY > PROVINCE > CITY hierarchy.
+Bookings are attributed to the local date of ``scheduled_start``;
+``new_bookings`` and the sign-up counters use the creation date instead.
+
+Deleted bookings, payments and users, and the day a booking was moved away
+from, leave nothing for the watermark scan to find, so ``analytics.signals``
+records those days as ``RollupPendingDay`` rows and the next run recomputes
+them too.
+"""
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Case, Count, DateField, Exists, F, OuterRef, Q, Sum, When
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .series import invalidate_analytics_cache
+
+WATERMARK_NAME = 'analytics_metric'
+
+# Re-read this much before the watermark so rows committed late by slow
+# transactions (with an earlier updated_at) are not missed
+LATE_ARRIVAL = datetime.timedelta(minutes=5)
+
+PERIOD_KINDS = {
+    'DAILY': 'day',
+    'WEEKLY': 'week',
+    'MONTHLY': 'month',
+}
+
+KEY_FIELDS = ('date', 'period_type', 'country', 'province', 'category')
+METRIC_FIELDS = (
+    'total_bookings', 'new_bookings', 'completed_bookings', 'cancelled_bookings',
+    'total_revenue', 'platform_fees', 'partner_earnings', 'active_clients',
+    'active_partners', 'new_clients', 'new_partners', 'average_rating', 'completion_rate',
+)
+
+
+# ---------------------------------------------------------------------------
+# Periods
+# ---------------------------------------------------------------------------
+
+def period_start(day, period_type):
+    if period_type == 'WEEKLY':
+        return day - datetime.timedelta(days=day.weekday())
+    if period_type == 'MONTHLY':
+        return day.replace(day=1)
+    return day
+
+
+def period_end(start, period_type):
+    """First day after the period starting at ``start``"""
+    if period_type == 'WEEKLY':
+        return start + datetime.timedelta(days=7)
+    if period_type == 'MONTHLY':
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def period_ranges(starts, period_type):
+    """Merge period starts into contiguous ``(first_day, end_day)`` ranges"""
+    ranges = []
+    for start in sorted(starts):
+        end = period_end(start, period_type)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), timezone.get_current_timezone())
+
+
+def range_filter(field, ranges):
+    """Index-friendly OR of ``[start, end)`` datetime ranges on ``field``"""
+    condition = Q()
+    for first, end in ranges:
+        condition |= Q(**{f'{field}__gte': _aware(first), f'{field}__lt': _aware(end)})
+    return condition
+
+
+# ---------------------------------------------------------------------------
+# Dirty periods
+# ---------------------------------------------------------------------------
+
+def _local_day(moment):
+    return timezone.localtime(moment).date()
+
+
+def changed_days(since):
+    """Days whose metrics may have changed since ``since`` (None means everything)"""
+    from accounts.models import User
+    from bookings.models import Booking
+    from payments.models import Payment
+
+    bookings = Booking.objects.all()
+    payments = Payment.objects.all()
+    users = User.objects.filter(role__in=('CLIENT', 'PARTNER'))
+    if since is not None:
+        bookings = bookings.filter(updated_at__gte=since)
+        payments = payments.filter(updated_at__gte=since)
+        users = users.filter(date_joined__gte=since)
+
+    days = set()
+    for scheduled, created in bookings.values_list('scheduled_start', 'created_at').iterator(chunk_size=5000):
+        days.add(_local_day(scheduled))
+        days.add(_local_day(created))
+    for scheduled in payments.values_list('booking__scheduled_start', flat=True).iterator(chunk_size=5000):
+        days.add(_local_day(scheduled))
+    for joined in users.values_list('date_joined', flat=True).iterator(chunk_size=5000):
+        days.add(_local_day(joined))
+    return days
+
+
+def mark_days_pending(moments):
+    """Have the next run recompute the local days of ``moments`` (None entries are skipped)"""
+    from .models import RollupPendingDay
+
+    days = {_local_day(moment) for moment in moments if moment is not None}
+    RollupPendingDay.objects.bulk_create([RollupPendingDay(date=day) for day in days])
+
+
+def pending_days():
+    """``(ids, days)`` of the recorded pending days"""
+    from .models import RollupPendingDay
+
+    ids, days = [], set()
+    for pending_id, day in RollupPendingDay.objects.values_list('id', 'date'):
+        ids.append(pending_id)
+        days.add(day)
+    return ids, days
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+def _period(field, period_type):
+    return Trunc(field, PERIOD_KINDS[period_type], output_field=DateField(), tzinfo=timezone.get_current_timezone())
+
+
+def _dimensions(prefix=''):
+    """Country, province and category of a booking (``prefix`` reaches it from another model)"""
+    location = f'{prefix}service_location'
+    return {
+        'country_id': Case(
+            When(**{f'{location}__location_type': 'COUNTRY'}, then=F(f'{location}_id')),
+            When(**{f'{location}__location_type': 'PROVINCE'}, then=F(f'{location}__parent_id')),
+            When(**{f'{location}__location_type': 'CITY'}, then=F(f'{location}__parent__parent_id')),
+        ),
+        'province_id': Case(
+            When(**{f'{location}__location_type': 'PROVINCE'}, then=F(f'{location}_id')),
+            When(**{f'{location}__location_type': 'CITY'}, then=F(f'{location}__parent_id')),
+        ),
+        'category_id': F(f'{prefix}service__category_id'),
+    }
+
+
+def _grouped(queryset, period_type, period_field, aggregates, prefix=''):
+    """
+    ``{(period, country, province, category): values}`` for both grouping
+    levels: the detailed dimensions and the overall (all NULL) row.
+    """
+    queryset = queryset.order_by().annotate(period=_period(period_field, period_type))
+    results = {}
+    for row in queryset.values('period').annotate(**aggregates):
+        results[(row.pop('period'), None, None, None)] = row
+    dimensions = _dimensions(prefix)
+    detail = queryset.annotate(**dimensions).values('period', *dimensions).annotate(**aggregates)
+    for row in detail:
+        key = (row.pop('period'), row.pop('country_id'), row.pop('province_id'), row.pop('category_id'))
+        results[key] = row
+    return results
+
+
+def compute_metrics(period_type, starts):
+    """Fresh ``AnalyticsMetric`` objects for the given period starts"""
+    from accounts.models import User
+    from bookings.models import Booking
+    from payments.models import Payment
+    from .models import AnalyticsMetric
+
+    ranges = period_ranges(starts, period_type)
+    if not ranges:
+        return []
+
+    completed = Q(status='COMPLETED')
+    scheduled = _grouped(
+        Booking.objects.filter(range_filter('scheduled_start', ranges)), period_type, 'scheduled_start', {
+            'total_bookings': Count('id'),
+            'completed_bookings': Count('id', filter=completed),
+            'cancelled_bookings': Count('id', filter=Q(status='CANCELLED')),
+            'average_rating': Avg('client_rating', filter=completed & Q(client_rating__isnull=False)),
+            'active_clients': Count('client', distinct=True),
+            'active_partners': Count('partner', distinct=True),
+        }
+    )
+    created = _grouped(
+        Booking.objects.filter(range_filter('created_at', ranges)), period_type, 'created_at',
+        {'new_bookings': Count('id')}
+    )
+    paid = _grouped(
+        Payment.objects.filter(range_filter('booking__scheduled_start', ranges), status='COMPLETED'),
+        period_type, 'booking__scheduled_start', {
+            'total_revenue': Sum('amount'),
+            'platform_fees': Sum('platform_fee'),
+            'partner_earnings': Sum('net_amount'),
+        },
+        prefix='booking__'
+    )
+    signups = {}
+    joined = User.objects.filter(range_filter('date_joined', ranges)).order_by().annotate(
+        period=_period('date_joined', period_type)
+    ).values('period').annotate(
+        new_clients=Count('id', filter=Q(role='CLIENT')),
+        new_partners=Count('id', filter=Q(role='PARTNER')),
+    )
+    for row in joined:
+        signups[(row.pop('period'), None, None, None)] = row
+
+    wanted = set(starts)
+    metrics = []
+    for key in scheduled.keys() | created.keys() | paid.keys() | signups.keys():
+        day, country_id, province_id, category_id = key
+        if day not in wanted:
+            continue
+        values = {**scheduled.get(key, {}), **created.get(key, {}), **paid.get(key, {}), **signups.get(key, {})}
+        total, finished = values.get('total_bookings', 0), values.get('completed_bookings', 0)
+        rating = values.get('average_rating')
+        metrics.append(AnalyticsMetric(
+            date=day,
+            period_type=period_type,
+            country_id=country_id,
+            province_id=province_id,
+            category_id=category_id,
+            total_bookings=total,
+            new_bookings=values.get('new_bookings', 0),
+            completed_bookings=finished,
+            cancelled_bookings=values.get('cancelled_bookings', 0),
+            total_revenue=values.get('total_revenue') or 0,
+            platform_fees=values.get('platform_fees') or 0,
+            partner_earnings=values.get('partner_earnings') or 0,
+            active_clients=values.get('active_clients', 0),
+            active_partners=values.get('active_partners', 0),
+            new_clients=values.get('new_clients', 0),
+            new_partners=values.get('new_partners', 0),
+            average_rating=round(Decimal(rating), 2) if rating else None,
+            completion_rate=round(Decimal(finished * 100) / total, 2) if total else 0,
+        ))
+    return metrics
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def _key(metric):
+    return (metric.date, metric.period_type, metric.country_id, metric.province_id, metric.category_id)
+
+
+def write_metrics(period_type, starts, metrics, batch_size=1000):
+    """
+    Replace the rows of the given periods with ``metrics``. Rows keyed only on
+    non-NULL values are upserted on ``unique_together``; NULL never conflicts
+    in a unique index, so rows with a NULL key part are matched to existing
+    ids here and upserted on the primary key. Rows of those periods that are
+    no longer produced are deleted.
+    """
+    from .models import AnalyticsMetric
+
+    ranges = period_ranges(starts, period_type)
+    in_periods = Q()
+    for first, end in ranges:
+        in_periods |= Q(date__gte=first, date__lt=end)
+    existing = {}
+    if ranges:
+        rows = AnalyticsMetric.objects.filter(in_periods, period_type=period_type).values_list(
+            'pk', 'date', 'period_type', 'country_id', 'province_id', 'category_id'
+        )
+        existing = {tuple(row[1:]): row[0] for row in rows if row[1] in starts}
+
+    complete, partial = [], []
+    for metric in metrics:
+        key = _key(metric)
+        if None in key:
+            metric.pk = existing.get(key)
+            partial.append(metric)
+        else:
+            complete.append(metric)
+    produced = {_key(metric) for metric in metrics}
+    stale = [pk for key, pk in existing.items() if key not in produced]
+
+    update_fields = [*METRIC_FIELDS, 'updated_at']
+    with transaction.atomic():
+        if stale:
+            AnalyticsMetric.objects.filter(pk__in=stale).delete()
+        if complete:
+            AnalyticsMetric.objects.bulk_create(
+                complete, batch_size=batch_size, update_conflicts=True,
+                unique_fields=list(KEY_FIELDS), update_fields=update_fields,
+            )
+        if partial:
+            AnalyticsMetric.objects.bulk_create(
+                partial, batch_size=batch_size, update_conflicts=True,
+                unique_fields=['id'], update_fields=update_fields,
+            )
+    return len(metrics)
+
+
+# ---------------------------------------------------------------------------
+# Partner and service rows
+# ---------------------------------------------------------------------------
+
+PARTNER_FIELDS = (
+    'total_bookings', 'completed_bookings', 'cancelled_bookings', 'total_earnings', 'pending_earnings',
+    'platform_fees_paid', 'average_rating', 'completion_rate', 'repeat_clients', 'new_clients',
+)
+# views_count, favorites_count and conversion_rate do not come from bookings and are left alone
+SERVICE_FIELDS = (
+    'total_bookings', 'completed_bookings', 'cancelled_bookings', 'total_revenue',
+    'average_booking_value', 'average_rating', 'completion_rate',
+)
+
+
+def _booking_outcomes(ranges, owner):
+    """``{(owner_id, day): counts}`` of the bookings scheduled in ``ranges``"""
+    from bookings.models import Booking
+
+    completed = Q(status='COMPLETED')
+    rows = Booking.objects.filter(range_filter('scheduled_start', ranges)).order_by().annotate(
+        day=_period('scheduled_start', 'DAILY')
+    ).values(owner, 'day').annotate(
+        total_bookings=Count('id'),
+        completed_bookings=Count('id', filter=completed),
+        cancelled_bookings=Count('id', filter=Q(status='CANCELLED')),
+        average_rating=Avg('client_rating', filter=completed & Q(client_rating__isnull=False)),
+        clients=Count('client', distinct=True),
+    )
+    return {(row.pop(owner), row.pop('day')): row for row in rows}
+
+
+def _payment_totals(ranges, owner, aggregates):
+    """``{(owner_id, day): sums}`` of the payments for bookings scheduled in ``ranges``"""
+    from payments.models import Payment
+
+    rows = Payment.objects.filter(range_filter('booking__scheduled_start', ranges)).order_by().annotate(
+        day=_period('booking__scheduled_start', 'DAILY')
+    ).values(f'booking__{owner}', 'day').annotate(**aggregates)
+    return {(row.pop(f'booking__{owner}'), row.pop('day')): row for row in rows}
+
+
+def _rates(total, completed, rating):
+    return {
+        'completed_bookings': completed,
+        'average_rating': round(Decimal(rating), 2) if rating else None,
+        'completion_rate': round(Decimal(completed * 100) / total, 2) if total else 0,
+    }
+
+
+def compute_partner_analytics(days):
+    """Fresh daily ``PartnerAnalytics`` objects for ``days``"""
+    from bookings.models import Booking
+    from .models import PartnerAnalytics
+
+    ranges = period_ranges(days, 'DAILY')
+    if not ranges:
+        return []
+    outcomes = _booking_outcomes(ranges, 'partner_id')
+    completed = Q(status='COMPLETED')
+    payments = _payment_totals(ranges, 'partner_id', {
+        'total_earnings': Sum('net_amount', filter=completed),
+        'pending_earnings': Sum('net_amount', filter=Q(status__in=('PENDING', 'PROCESSING'))),
+        'platform_fees_paid': Sum('platform_fee', filter=completed),
+    })
+
+    # A client is new to a partner on the day of their first booking with them:
+    # only bookings on these days with no earlier booking of the same pair
+    earlier = Booking.objects.filter(
+        partner_id=OuterRef('partner_id'), client_id=OuterRef('client_id'), scheduled_start__lt=OuterRef('scheduled_start')
+    )
+    first_bookings = Booking.objects.filter(range_filter('scheduled_start', ranges)).filter(
+        ~Exists(earlier)
+    ).order_by().values_list('partner_id', 'client_id', 'scheduled_start')
+    first_days = {}
+    for partner_id, client_id, scheduled in first_bookings.iterator(chunk_size=5000):
+        first_days[(partner_id, client_id)] = (partner_id, _local_day(scheduled))
+    new_clients = defaultdict(int)
+    for key in first_days.values():
+        new_clients[key] += 1
+
+    rows = []
+    for key in outcomes.keys() | payments.keys():
+        partner_id, day = key
+        if day not in days:
+            continue
+        values, paid = outcomes.get(key, {}), payments.get(key, {})
+        total, clients = values.get('total_bookings', 0), values.get('clients', 0)
+        rows.append(PartnerAnalytics(
+            partner_id=partner_id,
+            period_start=day,
+            period_end=day,
+            total_bookings=total,
+            cancelled_bookings=values.get('cancelled_bookings', 0),
+            total_earnings=paid.get('total_earnings') or 0,
+            pending_earnings=paid.get('pending_earnings') or 0,
+            platform_fees_paid=paid.get('platform_fees_paid') or 0,
+            new_clients=new_clients[key],
+            repeat_clients=max(clients - new_clients[key], 0),
+            **_rates(total, values.get('completed_bookings', 0), values.get('average_rating')),
+        ))
+    return rows
+
+
+def compute_service_performance(days):
+    """Fresh daily ``ServicePerformance`` objects for ``days``"""
+    from .models import ServicePerformance
+
+    ranges = period_ranges(days, 'DAILY')
+    if not ranges:
+        return []
+    outcomes = _booking_outcomes(ranges, 'service_id')
+    payments = _payment_totals(ranges, 'service_id', {'total_revenue': Sum('amount', filter=Q(status='COMPLETED'))})
+
+    rows = []
+    for key in outcomes.keys() | payments.keys():
+        service_id, day = key
+        if day not in days:
+            continue
+        values = outcomes.get(key, {})
+        total, revenue = values.get('total_bookings', 0), payments.get(key, {}).get('total_revenue') or 0
+        rows.append(ServicePerformance(
+            service_id=service_id,
+            period_start=day,
+            period_end=day,
+            total_bookings=total,
+            cancelled_bookings=values.get('cancelled_bookings', 0),
+            total_revenue=revenue,
+            average_booking_value=round(Decimal(revenue) / total, 2) if total else 0,
+            **_rates(total, values.get('completed_bookings', 0), values.get('average_rating')),
+        ))
+    return rows
+
+
+def write_daily_rows(model, owner, days, rows, fields, keep=None, batch_size=1000):
+    """
+    Upsert the daily ``rows`` of ``model`` for ``days`` on (owner, period_start,
+    period_end). Rows of those days that are no longer produced are deleted,
+    or only have ``fields`` reset when they match ``keep`` (a ``Q``).
+    """
+    if not days:
+        return 0
+    in_days = Q()
+    for first, end in period_ranges(days, 'DAILY'):
+        in_days |= Q(period_start__gte=first, period_start__lt=end)
+    produced = {(getattr(row, f'{owner}_id'), row.period_start) for row in rows}
+    stale = [
+        pk for pk, owner_id, day in model.objects.filter(in_days, period_end=F('period_start')).values_list(
+            'pk', f'{owner}_id', 'period_start'
+        )
+        if day in days and (owner_id, day) not in produced
+    ]
+
+    with transaction.atomic():
+        if stale:
+            stale_rows = model.objects.filter(pk__in=stale)
+            if keep is not None:
+                stale_rows.filter(keep).update(**{name: model._meta.get_field(name).get_default() for name in fields})
+                stale_rows = stale_rows.exclude(keep)
+            stale_rows.delete()
+        if rows:
+            model.objects.bulk_create(
+                rows, batch_size=batch_size, update_conflicts=True,
+                unique_fields=[owner, 'period_start', 'period_end'], update_fields=[*fields, 'updated_at'],
+            )
+    return len(rows)
+
+
+def run_rollup(full=False, batch_size=1000):
+    """
+    Fold changes since the watermark into ``AnalyticsMetric``, ``PartnerAnalytics``
+    and ``ServicePerformance`` (everything when ``full`` or on the first run).
+    Returns ``{period_type or 'PARTNER'/'SERVICE': rows written}``.
+    """
+    from .models import PartnerAnalytics, RollupPendingDay, RollupWatermark, ServicePerformance
+
+    started = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    since = None if full or watermark is None else watermark.processed_until - LATE_ARRIVAL
+
+    # Only the rows read here are consumed; days recorded meanwhile wait for the next run
+    pending_ids, days = pending_days()
+    days |= changed_days(since)
+    written = {}
+    for period_type in PERIOD_KINDS:
+        starts = {period_start(day, period_type) for day in days}
+        metrics = compute_metrics(period_type, starts)
+        written[period_type] = write_metrics(period_type, starts, metrics, batch_size=batch_size)
+    written['PARTNER'] = write_daily_rows(
+        PartnerAnalytics, 'partner', days, compute_partner_analytics(days), PARTNER_FIELDS, batch_size=batch_size
+    )
+    written['SERVICE'] = write_daily_rows(
+        ServicePerformance, 'service', days, compute_service_performance(days), SERVICE_FIELDS,
+        keep=Q(views_count__gt=0) | Q(favorites_count__gt=0), batch_size=batch_size
+    )
+
+    RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'processed_until': started})
+    RollupPendingDay.objects.filter(pk__in=pending_ids).delete()
+    invalidate_analytics_cache()
+    return written
@@ -0,0 +1,78 @@
+import datetime
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .exports import FORMATS
+from .reports import FORMATS as REPORT_FORMATS
+from .series import GRANULARITIES
+
+# Longest range served per granularity, in days
+MAX_RANGE_DAYS = {'day': 366, 'week': 366 * 3, 'month': 366 * 10}
+
+
+class DateRangeSerializer(serializers.Serializer):
+    """Optional ``date_from``/``date_to`` pair, rejected when out of order"""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from must be before date_to")
+        return attrs
+
+
+class SeriesQuerySerializer(DateRangeSerializer):
+    """Serializer for time series query parameters"""
+    granularity = serializers.ChoiceField(choices=GRANULARITIES, default='day')
+    
+    def validate(self, attrs):
+        """Default to the last 30 days and cap the range per granularity"""
+        date_to = attrs.setdefault('date_to', timezone.localdate())
+        date_from = attrs.setdefault('date_from', date_to - datetime.timedelta(days=29))
+        attrs = super().validate(attrs)
+        if (date_to - date_from).days > MAX_RANGE_DAYS[attrs['granularity']]:
+            raise serializers.ValidationError(
+                f"Range too long for {attrs['granularity']} granularity"
+            )
+        return attrs
+
+
+class MetricSeriesQuerySerializer(SeriesQuerySerializer):
+    """Serializer for platform metric series parameters"""
+    country = serializers.IntegerField(required=False)
+    province = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(required=False)
+
+
+class PartnerSeriesQuerySerializer(SeriesQuerySerializer):
+    """Serializer for partner analytics series parameters"""
+    partner_id = serializers.IntegerField(required=False)
+
+
+class ExportQuerySerializer(DateRangeSerializer):
+    """Serializer for columnar export parameters"""
+    # Not ``format``: DRF reserves that query parameter for renderer selection
+    file_format = serializers.ChoiceField(choices=FORMATS, default='parquet')
+
+
+class ReportQuerySerializer(DateRangeSerializer):
+    """Serializer for streaming report parameters (needs the report in context)"""
+    file_format = serializers.ChoiceField(choices=REPORT_FORMATS, default='csv')
+    fields = serializers.CharField(required=False, help_text='Comma separated column names')
+    status = serializers.CharField(required=False)
+    
+    def validate_fields(self, value):
+        report = self.context['report']
+        columns = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in columns if name not in report.fields]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(report.fields)}"
+            )
+        return list(dict.fromkeys(columns))
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        attrs['fields'] = attrs.get('fields') or self.context['report'].default_fields
+        return attrs
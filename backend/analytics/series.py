@@ -0,0 +1,96 @@
+"""
+Time series over the precomputed analytics tables
+
+Rows are re-bucketed to the requested granularity in one grouped query
+(``TruncWeek``/``TruncMonth`` over the row date). Responses are cached per
+(endpoint, scope, filters, range) and carry an ETag and Last-Modified so
+dashboards can revalidate with a 304. Every rollup run bumps a version key,
+which retires all cached series at once.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import DateField, DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import Trunc
+
+from ebglobal.cache import bump_version, get_version
+
+ANALYTICS_VERSION_KEY = 'analytics:version'
+SERIES_CACHE_TIMEOUT = 60 * 15
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def bucket(field, granularity):
+    if granularity == 'day':
+        return F(field)
+    return Trunc(field, granularity, output_field=DateField())
+
+
+def weighted_average(value_field, weight_field):
+    """Aggregates for a weight-averaged column: ``(numerator, denominator)``"""
+    present = Q(**{f'{value_field}__isnull': False})
+    product = ExpressionWrapper(F(value_field) * F(weight_field), output_field=DecimalField())
+    return Sum(product, filter=present), Sum(weight_field, filter=present)
+
+
+def bucketed_series(queryset, date_field, granularity, sums=(), peaks=None, averages=None):
+    """
+    ``(points, last_modified)`` for ``queryset`` grouped into ``granularity``
+    buckets: ``sums`` are added up, ``peaks`` (``{name: field}``) take the
+    largest row value and ``averages`` (``{name: (field, weight)}``) are
+    averaged weighted by another column.
+    """
+    # Weighted averages first: later aggregates reuse column names (e.g.
+    # completed_bookings) and would shadow the raw columns in F() references
+    aggregates = {}
+    for name, (field, weight) in (averages or {}).items():
+        aggregates[f'_{name}_num'], aggregates[f'_{name}_den'] = weighted_average(field, weight)
+    for name in sums:
+        aggregates[name] = Sum(name)
+    for name, field in (peaks or {}).items():
+        aggregates[name] = Max(field)
+
+    rows = queryset.order_by().annotate(period=bucket(date_field, granularity)).values('period').annotate(
+        _last_modified=Max('updated_at'), **aggregates
+    ).order_by('period')
+
+    points, last_modified = [], None
+    for row in rows:
+        modified = row.pop('_last_modified')
+        if modified and (last_modified is None or modified > last_modified):
+            last_modified = modified
+        for name in averages or {}:
+            numerator, denominator = row.pop(f'_{name}_num'), row.pop(f'_{name}_den')
+            row[name] = round(numerator / denominator, 2) if denominator else None
+        points.append(row)
+    return points, last_modified
+
+
+def series_version():
+    return get_version(ANALYTICS_VERSION_KEY)
+
+
+def invalidate_analytics_cache():
+    """Retire every cached series (called after each rollup run)"""
+    bump_version(ANALYTICS_VERSION_KEY)
+
+
+def cached_series(namespace, params, build):
+    """
+    Cached ``{'body', 'etag', 'last_modified'}`` for ``params``; ``build()``
+    returns ``(body, last_modified)`` on a miss.
+    """
+    fingerprint = hashlib.sha1(
+        json.dumps([namespace, params], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    key = f'analytics:series:{series_version()}:{fingerprint}'
+    entry = cache.get(key)
+    if entry is None:
+        body, last_modified = build()
+        etag = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+        entry = {'body': body, 'etag': f'"{etag}"', 'last_modified': last_modified}
+        cache.set(key, entry, SERIES_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import User
+from bookings.models import Booking
+from payments.models import Payment
+from .rollups import mark_days_pending
+
+
+@receiver(post_delete, sender=Booking)
+def recompute_days_of_deleted_booking(sender, instance, **kwargs):
+    mark_days_pending([instance.scheduled_start, instance.created_at])
+
+
+@receiver(post_save, sender=Booking)
+def recompute_day_left_by_rescheduled_booking(sender, instance, created, raw=False, **kwargs):
+    # The new day is picked up by the watermark scan through updated_at
+    if raw or created or not instance.field_changed('scheduled_start'):
+        return
+    mark_days_pending([instance.loaded_value('scheduled_start')])
+
+
+@receiver(post_delete, sender=Payment)
+def recompute_day_of_deleted_payment(sender, instance, **kwargs):
+    scheduled_start = Booking.objects.filter(pk=instance.booking_id).values_list('scheduled_start', flat=True).first()
+    mark_days_pending([scheduled_start])
+
+
+@receiver(post_delete, sender=User)
+def recompute_day_of_deleted_user(sender, instance, **kwargs):
+    if instance.role in ('CLIENT', 'PARTNER'):
+        mark_days_pending([instance.date_joined])
@@ -0,0 +1,37 @@
+"""
+Pieces shared by the file downloads (columnar ``exports`` and CSV/NDJSON ``reports``)
+"""
+
+import datetime
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+def date_range_filter(model, field_name, date_from=None, date_to=None):
+    """``Q`` keeping rows of ``model`` whose ``field_name`` falls on the inclusive local days given"""
+    condition = Q()
+    if model._meta.get_field(field_name).get_internal_type() == 'DateTimeField':
+        tz = timezone.get_current_timezone()
+        if date_from:
+            start = timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min), tz)
+            condition &= Q(**{f'{field_name}__gte': start})
+        if date_to:
+            end = timezone.make_aware(datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min), tz)
+            condition &= Q(**{f'{field_name}__lt': end})
+    else:
+        if date_from:
+            condition &= Q(**{f'{field_name}__gte': date_from})
+        if date_to:
+            condition &= Q(**{f'{field_name}__lte': date_to})
+    return condition
+
+
+def attachment_response(chunks, filename, content_type):
+    """Stream ``chunks`` as a file download"""
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Let nginx pass chunks straight through instead of buffering the whole body
+    response['X-Accel-Buffering'] = 'no'
+    return response
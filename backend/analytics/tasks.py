@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .rollups import run_rollup
+
+
+@shared_task
+def rollup_analytics_metrics():
+    """Incremental analytics rollup; schedule every few minutes with Celery beat"""
+    return run_rollup()
@@ -1,3 +1,162 @@
+import datetime
+import io
+
+import pyarrow.ipc
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from bookings.models import Booking
+from payments.models import Payment
+from services.models import Service, ServiceCategory
+from .models import AnalyticsMetric, RollupPendingDay
+from .rollups import run_rollup
+
+
+class AnalyticsFixtures:
+    """A partner with one service and a client who books it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.client_user = User.objects.create_user(
+            email='client@example.com', password='x', first_name='Cli', last_name='Ent', role='CLIENT'
+        )
+        cls.service = Service.objects.create(
+            partner=cls.partner, category=ServiceCategory.objects.create(name='Cleaning'),
+            name='Home cleaning', description='Cleaning', base_price=50, status='ACTIVE'
+        )
+
+    def book(self, days_ahead, status='PENDING', **fields):
+        start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) + datetime.timedelta(days=days_ahead)
+        return Booking.objects.create(
+            client=self.client_user, partner=self.partner, service=self.service, status=status,
+            scheduled_start=start, scheduled_end=start + datetime.timedelta(minutes=90),
+            base_price=50, total_amount=50, **fields
+        )
+
+
+class MetricRollupTests(AnalyticsFixtures, TestCase):
+    """Incremental rollups into AnalyticsMetric"""
+
+    def daily_bookings(self, booking_day):
+        return AnalyticsMetric.objects.filter(
+            period_type='DAILY', date=booking_day, country__isnull=True, province__isnull=True, category__isnull=True
+        ).values_list('total_bookings', flat=True).first()
+
+    def test_deleted_bookings_are_subtracted(self):
+        kept, deleted = self.book(2), self.book(2)
+        day = timezone.localtime(kept.scheduled_start).date()
+        # Out of reach of the watermark scan, so only the deletes can mark the day
+        Booking.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        run_rollup()
+        self.assertEqual(self.daily_bookings(day), 2)
+
+        deleted.delete()
+        run_rollup()
+        self.assertEqual(self.daily_bookings(day), 1)
+
+        kept.delete()
+        run_rollup()
+        self.assertIsNone(self.daily_bookings(day))
+        self.assertFalse(RollupPendingDay.objects.exists())
+
+    def test_rescheduled_booking_leaves_its_old_day(self):
+        booking = self.book(2)
+        old_day = timezone.localtime(booking.scheduled_start).date()
+        run_rollup()
+
+        booking.scheduled_start += datetime.timedelta(days=1)
+        booking.scheduled_end += datetime.timedelta(days=1)
+        booking.save()
+        run_rollup()
+        self.assertIsNone(self.daily_bookings(old_day))
+        self.assertEqual(self.daily_bookings(old_day + datetime.timedelta(days=1)), 1)
+
+
+class PartnerServiceSeriesTests(AnalyticsFixtures, TestCase):
+    """The partner and service series are built from the rollup's daily rows"""
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.partner)
+        completed = self.book(-3, status='COMPLETED', client_rating=4)
+        Payment.objects.create(
+            payment_id='PAY-1', booking=completed, payer=self.client_user, recipient=self.partner,
+            amount=50, payment_method='CARD', status='COMPLETED', platform_fee=5, net_amount=45
+        )
+        self.cancelled = self.book(-3, status='CANCELLED')
+        self.day = timezone.localtime(completed.scheduled_start).date()
+        run_rollup()
+
+    def series(self, url, **params):
+        params.setdefault('date_from', self.day.isoformat())
+        params.setdefault('date_to', self.day.isoformat())
+        return self.api.get(url, params)
+
+    def test_partner_series(self):
+        [point] = self.series('/api/v1/analytics/partners/').data['results']
+        self.assertEqual(point['total_bookings'], 2)
+        self.assertEqual(point['completed_bookings'], 1)
+        self.assertEqual(point['total_earnings'], 45)
+        self.assertEqual(point['new_clients'], 1)
+        self.assertEqual(point['completion_rate'], 50)
+
+    def test_returning_clients_are_not_new(self):
+        later = timezone.localtime(self.book(-1).scheduled_start).date()
+        run_rollup()
+        [point] = self.series('/api/v1/analytics/partners/', date_from=later.isoformat(), date_to=later.isoformat()).data['results']
+        self.assertEqual((point['total_bookings'], point['new_clients']), (1, 0))
+
+    def test_service_series_follows_deletes(self):
+        [point] = self.series(f'/api/v1/analytics/services/{self.service.pk}/').data['results']
+        self.assertEqual((point['total_bookings'], point['total_revenue']), (2, 50))
+
+        self.cancelled.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            run_rollup()
+        [point] = self.series(f'/api/v1/analytics/services/{self.service.pk}/').data['results']
+        self.assertEqual(point['total_bookings'], 1)
+        self.assertEqual(point['average_booking_value'], 50)
+
+    def test_reversed_range_is_rejected(self):
+        response = self.series(
+            '/api/v1/analytics/partners/', date_to=(self.day - datetime.timedelta(days=1)).isoformat()
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class FileExportTests(AnalyticsFixtures, TestCase):
+    """CSV/NDJSON reports and columnar exports share the inclusive local-day range"""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.inside, self.outside = self.book(1), self.book(3)
+        self.day = timezone.localtime(self.inside.scheduled_start).date()
+
+    def test_report_rows_are_limited_to_the_range(self):
+        self.api.force_authenticate(self.partner)
+        response = self.api.get('/api/v1/analytics/reports/bookings/', {
+            'file_format': 'csv', 'fields': 'booking_number', 'date_from': self.day, 'date_to': self.day,
+        })
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings.csv"')
+        lines = b''.join(response.streaming_content).decode().split()
+        self.assertEqual(lines, ['booking_number', self.inside.booking_number])
 
-# Create your tests here.
+    def test_columnar_export_is_limited_to_the_range(self):
+        staff = User.objects.create_user(
+            email='staff@example.com', password='x', first_name='Sta', last_name='Ff', role='STAFF'
+        )
+        Booking.objects.filter(pk=self.outside.pk).update(created_at=timezone.now() + datetime.timedelta(days=3))
+        self.api.force_authenticate(staff)
+        response = self.api.get('/api/v1/analytics/export/bookings/', {
+            'file_format': 'arrow', 'date_from': timezone.localdate(), 'date_to': timezone.localdate(),
+        })
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings.arrow"')
+        table = pyarrow.ipc.open_file(io.BytesIO(b''.join(response.streaming_content))).read_all()
+        self.assertEqual(table.column('id').to_pylist(), [self.inside.pk])
@@ -1,10 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .views import MetricSeriesView, PartnerAnalyticsSeriesView, ServicePerformanceSeriesView, ExportView, ReportExportView
 
 # Create router for ViewSets
 router = DefaultRouter()
 
 urlpatterns = [
+    # Time series endpoints
+    path('metrics/', MetricSeriesView.as_view(), name='analytics_metrics'),
+    path('partners/', PartnerAnalyticsSeriesView.as_view(), name='analytics_partners'),
+    path('services/<int:service_id>/', ServicePerformanceSeriesView.as_view(), name='analytics_service'),
+    
+    # Columnar exports
+    path('export/<str:table>/', ExportView.as_view(), name='analytics_export'),
+    path('reports/<str:report>/', ReportExportView.as_view(), name='analytics_report'),
+    
     # Include router URLs
     path('', include(router.urls)),
 ]
@@ -1,3 +1,229 @@
-from django.shortcuts import render
+from rest_framework import status, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from services.models import Service
+from .models import AnalyticsMetric, PartnerAnalytics, ServicePerformance
+from .serializers import (
+    SeriesQuerySerializer, MetricSeriesQuerySerializer, PartnerSeriesQuerySerializer,
+    ExportQuerySerializer, ReportQuerySerializer
+)
+from .exports import CONTENT_TYPES, EXPORTS, EXTENSIONS, stream_table
+from . import reports
+from .series import bucketed_series, cached_series
+from .streaming import attachment_response
 
-# Create your views here.
+
+def series_response(request, entry):
+    """Serve a cached series entry, answering conditional requests with 304"""
+    last_modified = int(entry['last_modified'].timestamp()) if entry['last_modified'] else None
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=last_modified)
+    if response is None:
+        response = Response(entry['body'])
+    response['ETag'] = entry['etag']
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+class MetricSeriesView(APIView):
+    """Platform metrics (bookings, revenue, users) as a time series"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    SUMS = (
+        'total_bookings', 'new_bookings', 'completed_bookings', 'cancelled_bookings',
+        'total_revenue', 'platform_fees', 'partner_earnings', 'new_clients', 'new_partners',
+    )
+    
+    def get(self, request):
+        if request.user.role not in ['ADMIN', 'STAFF']:
+            return Response(
+                {'error': 'Only staff can view platform analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = MetricSeriesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        def build():
+            queryset = AnalyticsMetric.objects.filter(
+                period_type=AnalyticsMetric.MetricType.DAILY,
+                date__gte=params['date_from'],
+                date__lte=params['date_to']
+            )
+            dimensions = {key: params[key] for key in ('country', 'province', 'category') if key in params}
+            if dimensions:
+                # Detailed rows summed across the dimensions left open
+                queryset = queryset.filter(category__isnull=False, **dimensions)
+            else:
+                queryset = queryset.filter(country__isnull=True, province__isnull=True, category__isnull=True)
+            
+            points, last_modified = bucketed_series(
+                queryset, 'date', params['granularity'],
+                sums=self.SUMS,
+                peaks={'peak_active_clients': 'active_clients', 'peak_active_partners': 'active_partners'},
+                averages={'average_rating': ('average_rating', 'completed_bookings')}
+            )
+            for point in points:
+                total = point['total_bookings'] or 0
+                point['completion_rate'] = round(point['completed_bookings'] * 100 / total, 2) if total else 0
+            return {'granularity': params['granularity'], 'filters': dimensions, 'results': points}, last_modified
+        
+        return series_response(request, cached_series('metrics', params, build))
+
+
+class PartnerAnalyticsSeriesView(APIView):
+    """Partner performance as a time series"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    SUMS = (
+        'total_bookings', 'completed_bookings', 'cancelled_bookings', 'no_show_bookings',
+        'total_earnings', 'pending_earnings', 'platform_fees_paid', 'repeat_clients', 'new_clients',
+    )
+    
+    def get(self, request):
+        user = request.user
+        serializer = PartnerSeriesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        if user.role == 'PARTNER':
+            partner_id = user.pk
+        elif user.role in ['ADMIN', 'STAFF'] and params.get('partner_id'):
+            partner_id = params['partner_id']
+        else:
+            return Response(
+                {'error': 'Only partners (or staff with partner_id) can view partner analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        def build():
+            queryset = PartnerAnalytics.objects.filter(
+                partner_id=partner_id,
+                period_start__gte=params['date_from'],
+                period_start__lte=params['date_to']
+            )
+            points, last_modified = bucketed_series(
+                queryset, 'period_start', params['granularity'],
+                sums=self.SUMS,
+                averages={
+                    'average_rating': ('average_rating', 'completed_bookings'),
+                    'client_satisfaction_score': ('client_satisfaction_score', 'completed_bookings'),
+                }
+            )
+            for point in points:
+                total = point['total_bookings'] or 0
+                point['completion_rate'] = round(point['completed_bookings'] * 100 / total, 2) if total else 0
+            return {'partner_id': partner_id, 'granularity': params['granularity'], 'results': points}, last_modified
+        
+        return series_response(request, cached_series('partner', dict(params, partner_id=partner_id), build))
+
+
+class ServicePerformanceSeriesView(APIView):
+    """Service performance as a time series"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    SUMS = (
+        'total_bookings', 'completed_bookings', 'cancelled_bookings', 'total_revenue',
+        'views_count', 'favorites_count',
+    )
+    
+    def get(self, request, service_id):
+        user = request.user
+        service = get_object_or_404(Service.objects.only('id', 'partner_id'), pk=service_id)
+        if user.role not in ['ADMIN', 'STAFF'] and service.partner_id != user.pk:
+            return Response(
+                {'error': 'You are not authorized to view analytics for this service'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = SeriesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        def build():
+            queryset = ServicePerformance.objects.filter(
+                service_id=service.pk,
+                period_start__gte=params['date_from'],
+                period_start__lte=params['date_to']
+            )
+            points, last_modified = bucketed_series(
+                queryset, 'period_start', params['granularity'],
+                sums=self.SUMS,
+                averages={'average_rating': ('average_rating', 'completed_bookings')}
+            )
+            for point in points:
+                total, views = point['total_bookings'] or 0, point['views_count'] or 0
+                point['completion_rate'] = round(point['completed_bookings'] * 100 / total, 2) if total else 0
+                point['average_booking_value'] = round(point['total_revenue'] / total, 2) if total else 0
+                point['conversion_rate'] = round(total * 100 / views, 2) if views else 0
+            return {'service_id': service.pk, 'granularity': params['granularity'], 'results': points}, last_modified
+        
+        return series_response(request, cached_series('service', dict(params, service_id=service.pk), build))
+
+
+class ExportView(APIView):
+    """Stream a table as Parquet or Arrow IPC for offline analysis"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, table):
+        if request.user.role not in ['ADMIN', 'STAFF']:
+            return Response(
+                {'error': 'Only staff can export analytics data'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if table not in EXPORTS:
+            return Response(
+                {'error': f'Unknown table, expected one of: {", ".join(EXPORTS)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = ExportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        file_format = params['file_format']
+        
+        content = stream_table(table, file_format, params.get('date_from'), params.get('date_to'))
+        return attachment_response(content, f'{table}.{EXTENSIONS[file_format]}', CONTENT_TYPES[file_format])
+
+
+class ReportExportView(APIView):
+    """Stream bookings, payments, payouts or invoices as CSV or NDJSON"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, report):
+        if report not in reports.REPORTS:
+            return Response(
+                {'error': f'Unknown report, expected one of: {", ".join(reports.REPORTS)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        definition = reports.REPORTS[report]
+        queryset = definition.queryset_for(request.user)
+        if queryset is None:
+            return Response(
+                {'error': 'You do not have access to this report'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = ReportQuerySerializer(data=request.query_params, context={'report': definition})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        file_format = params['file_format']
+        
+        queryset = reports.filter_report(
+            definition, queryset, params.get('date_from'), params.get('date_to'), params.get('status')
+        )
+        return attachment_response(
+            reports.stream_report(definition, queryset, params['fields'], file_format),
+            f'{report}.{reports.EXTENSIONS[file_format]}',
+            reports.CONTENT_TYPES[file_format]
+        )
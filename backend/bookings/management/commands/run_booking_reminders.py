@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from bookings.reminders import REMINDER_LEAD_HOURS, TICK_SECONDS, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Send reminder emails before confirmed bookings start (run a single instance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lead-hours', type=int, nargs='+', default=list(REMINDER_LEAD_HOURS),
+            help='Hours before the start to remind at'
+        )
+        parser.add_argument('--tick', type=int, default=TICK_SECONDS, help='Scheduler resolution in seconds')
+        parser.add_argument('--once', action='store_true', help='Run a single step and exit')
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(lead_hours=tuple(options['lead_hours']), tick_seconds=options['tick'])
+
+        if options['once']:
+            queued = scheduler.run_once()
+            self.stdout.write(
+                self.style.SUCCESS(f'Tracking {len(scheduler.wheel)} reminders, queued {queued} emails')
+            )
+            return
+
+        self.stdout.write('Running booking reminder scheduler (Ctrl+C to stop)...')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingScheduleChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.booking')),
+            ],
+            options={
+                'verbose_name': 'Booking Schedule Change',
+                'verbose_name_plural': 'Booking Schedule Changes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_partnerprofile_time_zone'),
+        ('bookings', '0003_bookingschedulechange'),
+        ('services', '0011_availabilityslot_unique_start'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='bookings_bo_updated_e5c31b_idx'),
+        ),
+    ]
@@ -1,11 +1,43 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import User, Location
+from ebglobal.tracking import TrackedFieldsMixin
 from services.models import Service, AvailabilitySlot
 
 
-class Booking(models.Model):
+class BookingQuerySet(models.QuerySet):
+    """
+    Bulk writes skip the post_save signal, so ``update``/``bulk_update`` of a
+    status or start time record the reminder schedule changes themselves.
+    """
+    
+    def update(self, **kwargs):
+        if not set(kwargs) & set(Booking.SCHEDULE_FIELDS):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            booking_ids = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            record_schedule_changes(booking_ids)
+        return updated
+    
+    def bulk_update(self, objs, fields, batch_size=None):
+        if not set(fields) & set(Booking.SCHEDULE_FIELDS):
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        with transaction.atomic(using=self.db):
+            updated = super().bulk_update(objs, fields, batch_size=batch_size)
+            record_schedule_changes([obj.pk for obj in objs])
+        return updated
+
+
+def record_schedule_changes(booking_ids):
+    """Queue bookings for the reminder scheduler (see bookings.reminders)"""
+    BookingScheduleChange.objects.bulk_create(
+        [BookingScheduleChange(booking_id=booking_id) for booking_id in booking_ids]
+    )
+
+
+class Booking(TrackedFieldsMixin, models.Model):
     """Main booking model for service appointments"""
     
     class BookingStatus(models.TextChoices):
@@ -70,6 +102,9 @@ class Booking(models.Model):
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     
+    # Client-supplied key so retried create requests return the original booking
+    idempotency_key = models.CharField(max_length=64, blank=True)
+    
     # Service-specific data
     service_data = models.JSONField(default=dict, blank=True, help_text=_('Service-specific booking data'))
     
@@ -103,6 +138,8 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BookingQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Booking')
         verbose_name_plural = _('Bookings')
@@ -112,11 +149,25 @@ class Booking(models.Model):
             models.Index(fields=['client', 'status']),
             models.Index(fields=['partner', 'status']),
             models.Index(fields=['scheduled_start']),
+            # Rollup watermark scans (analytics.rollups.changed_days)
+            models.Index(fields=['updated_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client', 'idempotency_key'],
+                condition=~models.Q(idempotency_key=''),
+                name='unique_booking_idempotency_key',
+            ),
         ]
     
     def __str__(self):
         return f"Booking #{self.booking_number} - {self.service.name}"
     
+    # Loaded values remembered so signal handlers can tell what changed on save
+    TRACKED_FIELDS = ('status', 'client_rating', 'scheduled_start')
+    STATS_FIELDS = ('status', 'client_rating')
+    SCHEDULE_FIELDS = ('status', 'scheduled_start')
+    
     def save(self, *args, **kwargs):
         if not self.booking_number:
             self.booking_number = self.generate_booking_number()
@@ -145,6 +196,21 @@ class Booking(models.Model):
         return self.status == self.BookingStatus.COMPLETED
 
 
+class BookingScheduleChange(models.Model):
+    """Booking whose status or start time changed, waiting to be applied by the reminder scheduler"""
+    
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Booking Schedule Change')
+        verbose_name_plural = _('Booking Schedule Changes')
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"Schedule change for booking {self.booking_id}"
+
+
 class BookingStatusHistory(models.Model):
     """Track booking status changes"""
     
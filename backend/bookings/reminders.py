@@ -0,0 +1,255 @@
+"""
+Reminders before a confirmed booking starts (T-24h and T-1h by default)
+
+One long-running scheduler (``run_booking_reminders``) keeps the reminders
+of bookings starting in the next ~30 hours in a hierarchical timing wheel.
+Bookings are loaded in ``LOAD_WINDOW`` slices over the ``scheduled_start``
+index as time moves on, so the table is never scanned as a whole and memory
+only holds the near future. Confirmations, reschedules and cancellations
+reach the scheduler through ``BookingScheduleChange`` rows written by the
+booking post_save signal, or by ``BookingQuerySet.update``/``bulk_update``
+when a status or start time is bulk-written; each one is an O(1) cancel plus
+re-insert in the wheel, never a rescan. Raw SQL writes to those two columns
+must call ``bookings.models.record_schedule_changes`` themselves.
+
+Reminder emails go on the email outbox with a dedupe key per booking, start
+time, lead time and recipient, so a restarted scheduler never sends the
+same reminder twice. Run a single scheduler: it consumes the change rows.
+"""
+
+import datetime
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REMINDER_LEAD_HOURS = (24, 1)
+TICK_SECONDS = 60
+LOAD_WINDOW = datetime.timedelta(hours=6)
+# Reminders missed by at most this much (e.g. during a restart) are still sent
+GRACE = datetime.timedelta(minutes=15)
+CHANGE_BATCH_SIZE = 1000
+SEND_BATCH_SIZE = 500
+
+Reminder = namedtuple('Reminder', ['booking', 'recipient', 'hours'])
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel: ``schedule`` and ``cancel`` are O(1) whatever
+    the number of timers. Level 0 has one slot per tick; each higher level
+    has one slot per full turn of the level below. ``advance`` walks one
+    level-0 slot per tick and, whenever a level turns, moves the entries of
+    the next slot of the level above down into finer slots. Timers beyond the
+    top level wait in an overflow map re-checked once per turn of the top level.
+    """
+
+    def __init__(self, start_tick, sizes=(60, 24, 32)):
+        self.current = start_tick
+        self.sizes = sizes
+        self.spans = []
+        span = 1
+        for size in sizes:
+            self.spans.append(span)
+            span *= size
+        self.levels = [[{} for _ in range(size)] for size in sizes]
+        self.overflow = {}
+        self.timers = {}  # key: (fire_tick, payload, slot holding the key)
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def _place(self, key, fire_tick, payload):
+        slot = self.overflow
+        for level, (size, span) in enumerate(zip(self.sizes, self.spans)):
+            if fire_tick // span - self.current // span < size:
+                slot = self.levels[level][(fire_tick // span) % size]
+                break
+        slot[key] = fire_tick
+        self.timers[key] = (fire_tick, payload, slot)
+
+    def schedule(self, key, fire_tick, payload=None):
+        """Add or move the timer ``key``; ticks already passed fire on the next advance"""
+        self.cancel(key)
+        self._place(key, max(fire_tick, self.current + 1), payload)
+
+    def cancel(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return False
+        del timer[2][key]
+        return True
+
+    def _cascade(self, slot):
+        entries = list(slot.items())
+        slot.clear()
+        for key, fire_tick in entries:
+            self._place(key, fire_tick, self.timers[key][1])
+
+    def advance(self, tick):
+        """Move the wheel to ``tick``; returns ``[(key, payload)]`` of the timers that fired"""
+        fired = []
+        top = len(self.sizes) - 1
+        while self.current < tick:
+            self.current += 1
+            if self.current % (self.spans[top] * self.sizes[top]) == 0 and self.overflow:
+                self._cascade(self.overflow)
+            for level in range(top, 0, -1):
+                if self.current % self.spans[level] == 0:
+                    self._cascade(self.levels[level][(self.current // self.spans[level]) % self.sizes[level]])
+            slot = self.levels[0][self.current % self.sizes[0]]
+            for key in list(slot):
+                fired.append((key, self.timers.pop(key)[1]))
+            slot.clear()
+        return fired
+
+
+class ReminderScheduler:
+    """Keeps the timing wheel in step with the bookings table and sends due reminders"""
+
+    def __init__(self, lead_hours=REMINDER_LEAD_HOURS, tick_seconds=TICK_SECONDS, load_window=LOAD_WINDOW):
+        self.lead_times = [datetime.timedelta(hours=hours) for hours in lead_hours]
+        self.lead_hours = lead_hours
+        self.tick_seconds = tick_seconds
+        self.load_window = load_window
+        self.lookahead = max(self.lead_times) + load_window
+        self.wheel = None
+        self.loaded_until = None
+
+    def tick(self, moment):
+        return int(moment.timestamp()) // self.tick_seconds
+
+    def start(self, now=None):
+        """Fresh wheel; change rows written so far are covered by the initial load"""
+        from .models import BookingScheduleChange
+
+        now = now or timezone.now()
+        last_change = BookingScheduleChange.objects.order_by('-id').values_list('id', flat=True).first()
+        if last_change is not None:
+            BookingScheduleChange.objects.filter(id__lte=last_change).delete()
+        self.wheel = TimingWheel(self.tick(now))
+        self.loaded_until = now - GRACE
+        self.load(now)
+
+    def schedule_booking(self, booking_id, scheduled_start, now):
+        for hours, lead_time in zip(self.lead_hours, self.lead_times):
+            fire_at = scheduled_start - lead_time
+            if fire_at > now - GRACE and scheduled_start > now:
+                self.wheel.schedule((booking_id, hours), self.tick(fire_at), scheduled_start.timestamp())
+
+    def cancel_booking(self, booking_id):
+        for hours in self.lead_hours:
+            self.wheel.cancel((booking_id, hours))
+
+    def load(self, now):
+        """Load confirmed bookings window by window until the wheel covers ``now + lookahead``"""
+        from .models import Booking
+
+        loaded = 0
+        while self.loaded_until < now + self.lookahead:
+            window_end = self.loaded_until + self.load_window
+            bookings = Booking.objects.filter(
+                status=Booking.BookingStatus.CONFIRMED,
+                scheduled_start__gte=self.loaded_until,
+                scheduled_start__lt=window_end,
+            ).values_list('id', 'scheduled_start')
+            for booking_id, scheduled_start in bookings.iterator(chunk_size=2000):
+                self.schedule_booking(booking_id, scheduled_start, now)
+                loaded += 1
+            self.loaded_until = window_end
+        return loaded
+
+    def apply_changes(self, now):
+        """Re-plan the bookings changed since the last call; bookings outside the loaded windows wait for their load"""
+        from .models import Booking, BookingScheduleChange
+
+        applied = 0
+        while True:
+            changes = list(
+                BookingScheduleChange.objects.order_by('id').values_list('id', 'booking_id')[:CHANGE_BATCH_SIZE]
+            )
+            if not changes:
+                return applied
+            booking_ids = {booking_id for _, booking_id in changes}
+            for booking_id in booking_ids:
+                self.cancel_booking(booking_id)
+            for booking_id, status, scheduled_start in Booking.objects.filter(
+                pk__in=booking_ids
+            ).values_list('id', 'status', 'scheduled_start'):
+                if status == Booking.BookingStatus.CONFIRMED and scheduled_start < self.loaded_until:
+                    self.schedule_booking(booking_id, scheduled_start, now)
+            BookingScheduleChange.objects.filter(id__in=[change_id for change_id, _ in changes]).delete()
+            applied += len(booking_ids)
+            if len(changes) < CHANGE_BATCH_SIZE:
+                return applied
+
+    def send(self, fired):
+        """Queue reminder emails for fired ``((booking_id, hours), start_timestamp)`` timers"""
+        from accounts.email_templates import render_email
+        from accounts.models import EmailOutbox
+        from .models import Booking
+
+        queued = 0
+        for start in range(0, len(fired), SEND_BATCH_SIZE):
+            batch = fired[start:start + SEND_BATCH_SIZE]
+            bookings = Booking.objects.filter(
+                pk__in={booking_id for (booking_id, _), _ in batch},
+                status=Booking.BookingStatus.CONFIRMED,
+            ).select_related('client__preferences', 'partner__preferences', 'service').in_bulk()
+            messages = []
+            for (booking_id, hours), start_timestamp in batch:
+                booking = bookings.get(booking_id)
+                # Moved or cancelled after the timer was set and before the change reached us
+                if booking is None or booking.scheduled_start.timestamp() != start_timestamp:
+                    continue
+                for recipient in (booking.client, booking.partner):
+                    if not wants_email(recipient):
+                        continue
+                    message = render_email('booking_reminder', Reminder(booking, recipient, hours))
+                    messages.append(EmailOutbox(
+                        to_email=recipient.email,
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        subject=message['subject'],
+                        text_body=message['text_content'],
+                        html_body=message['html_content'],
+                        category='booking_reminder',
+                        dedupe_key=f'booking-reminder:{booking_id}:{int(start_timestamp)}:{hours}:{recipient.pk}',
+                    ))
+            EmailOutbox.objects.bulk_create(messages, ignore_conflicts=True)
+            queued += len(messages)
+        return queued
+
+    def run_once(self, now=None):
+        """One scheduler step; returns the number of reminder emails queued"""
+        now = now or timezone.now()
+        if self.wheel is None:
+            self.start(now)
+        self.apply_changes(now)
+        self.load(now)
+        fired = self.wheel.advance(self.tick(now))
+        return self.send(fired) if fired else 0
+
+    def run(self, stop=None):
+        """Step once per tick until ``stop()`` returns true (forever by default)"""
+        while not (stop and stop()):
+            queued = self.run_once()
+            if queued:
+                logger.info(f"Queued {queued} booking reminders")
+            time.sleep(self.tick_seconds - time.time() % self.tick_seconds)
+
+
+def wants_email(user):
+    """Users without saved preferences get the default (email on)"""
+    from accounts.models import UserPreference
+
+    try:
+        return user.preferences.notification_email
+    except UserPreference.DoesNotExist:
+        return True
@@ -0,0 +1,117 @@
+"""
+Slot reservation
+
+Slots are claimed with a single conditional ``UPDATE ... WHERE is_available``
+so exactly one of several concurrent requests wins. Losers see zero updated
+rows and fail fast instead of queueing on a row lock held across a
+read-modify-write. Checkout holds are leases: ``held_until`` is compared with
+the current time in the same ``WHERE`` clause, so an expired hold needs no
+cleanup job before someone else can take the slot.
+"""
+
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from services.availability import refresh_availability_days
+from services.models import AvailabilitySlot
+
+HOLD_MINUTES = 10
+
+
+class SlotUnavailable(Exception):
+    """The slot is booked, blocked, in the past or held by someone else"""
+
+
+def claimable(user, now):
+    """Filter for slots ``user`` may hold or book at ``now``"""
+    return (
+        Q(is_available=True, is_blocked=False, start_time__gt=now) &
+        (Q(held_until__isnull=True) | Q(held_until__lte=now) | Q(held_by=user))
+    )
+
+
+def hold_slot(slot_id, user, minutes=HOLD_MINUTES):
+    """Hold a slot for ``user`` during checkout; returns the hold expiry"""
+    now = timezone.now()
+    held_until = now + datetime.timedelta(minutes=minutes)
+    updated = AvailabilitySlot.objects.filter(claimable(user, now), pk=slot_id).update(
+        held_by=user, held_until=held_until
+    )
+    if not updated:
+        raise SlotUnavailable('Slot is not available')
+    return held_until
+
+
+def release_hold(slot_id, user):
+    """Drop ``user``'s hold on a slot, if any"""
+    return AvailabilitySlot.objects.filter(pk=slot_id, held_by=user).update(held_by=None, held_until=None)
+
+
+def claim_slot(slot, user):
+    """
+    Atomically mark ``slot`` (loaded with ``service__partner``) as booked by
+    ``user``; raises SlotUnavailable if it was taken in the meantime.
+    """
+    updated = AvailabilitySlot.objects.filter(claimable(user, timezone.now()), pk=slot.pk).update(
+        is_available=False, held_by=None, held_until=None
+    )
+    if not updated:
+        raise SlotUnavailable('Slot is not available')
+    slot.is_available, slot.held_by, slot.held_until = False, None, None
+    # .update() skips the slot signals
+    refresh_availability_days(slot.service_id, [slot.start_time])
+    return slot
+
+
+def find_replay(client, idempotency_key):
+    """Booking previously created by ``client`` with ``idempotency_key``, if any"""
+    from .models import Booking
+
+    if not idempotency_key:
+        return None
+    return Booking.objects.filter(client=client, idempotency_key=idempotency_key).first()
+
+
+def reserve_booking(client, slot, idempotency_key='', **booking_fields):
+    """
+    Claim ``slot`` and create its booking in one transaction. ``slot`` must be
+    loaded with ``select_related('service__partner')``; no further reads are
+    issued. With an ``idempotency_key``, a retry racing the original request
+    returns the booking created first instead of a duplicate (callers check
+    ``find_replay`` before validating).
+    """
+    from .models import Booking, BookingStatusHistory
+
+    try:
+        with transaction.atomic():
+            claim_slot(slot, client)
+            booking = Booking.objects.create(
+                client=client,
+                partner=slot.service.partner,
+                service=slot.service,
+                availability_slot=slot,
+                scheduled_start=slot.start_time,
+                scheduled_end=slot.end_time,
+                base_price=slot.effective_price,
+                total_amount=slot.effective_price,
+                currency=slot.service.currency,
+                status=Booking.BookingStatus.PENDING,
+                idempotency_key=idempotency_key,
+                **booking_fields
+            )
+            BookingStatusHistory.objects.create(
+                booking=booking,
+                new_status=Booking.BookingStatus.PENDING,
+                notes='Booking created',
+                changed_by=client
+            )
+    except (IntegrityError, SlotUnavailable):
+        # A concurrent request with the same key may have won the slot first
+        existing = find_replay(client, idempotency_key)
+        if existing is None:
+            raise
+        return existing, False
+    return booking, True
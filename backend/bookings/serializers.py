@@ -1,12 +1,12 @@
 from rest_framework import serializers
 from django.utils import timezone
-from django.db import transaction
 from .models import (
     Booking, BookingStatusHistory, BookingMessage, BookingDocument,
     BookingDispute, RecurringBooking
 )
 from accounts.serializers import UserProfileSerializer, LocationSerializer
-from services.serializers import ServiceDetailSerializer, AvailabilitySlotSerializer
+from services.serializers import ServiceDetailSerializer, ServiceSummarySerializer, AvailabilitySlotSerializer
+from .reservations import SlotUnavailable, reserve_booking
 
 
 class BookingStatusHistorySerializer(serializers.ModelSerializer):
@@ -15,10 +15,10 @@ class BookingStatusHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = BookingStatusHistory
         fields = [
-            'id', 'status', 'timestamp', 'notes', 'created_by',
+            'id', 'old_status', 'new_status', 'changed_by', 'reason', 'notes',
             'created_at'
         ]
-        read_only_fields = ['id', 'timestamp', 'created_at']
+        read_only_fields = ['id', 'created_at']
 
 
 class BookingMessageSerializer(serializers.ModelSerializer):
@@ -41,7 +41,8 @@ class BookingDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = BookingDocument
         fields = [
-            'id', 'booking', 'document_type', 'file', 'description',
+            'id', 'booking', 'document_type', 'title', 'description',
+            'file_url', 'file_name', 'file_size', 'file_type',
             'uploaded_by', 'created_at'
         ]
         read_only_fields = ['id', 'uploaded_by', 'created_at']
@@ -49,17 +50,18 @@ class BookingDocumentSerializer(serializers.ModelSerializer):
 
 class BookingDisputeSerializer(serializers.ModelSerializer):
     """Serializer for booking disputes"""
-    created_by = UserProfileSerializer(read_only=True)
+    raised_by = UserProfileSerializer(read_only=True)
     
     class Meta:
         model = BookingDispute
         fields = [
             'id', 'booking', 'dispute_type', 'description', 'status',
-            'resolution_notes', 'created_by', 'resolved_by', 'created_at',
-            'resolved_at'
+            'resolution', 'raised_by', 'disputed_user', 'resolved_by',
+            'created_at', 'resolved_at'
         ]
         read_only_fields = [
-            'id', 'created_by', 'resolved_by', 'created_at', 'resolved_at'
+            'id', 'booking', 'status', 'resolution', 'raised_by',
+            'disputed_user', 'resolved_by', 'created_at', 'resolved_at'
         ]
 
 
@@ -67,8 +69,8 @@ class BookingListSerializer(serializers.ModelSerializer):
     """Serializer for booking list view (optimized)"""
     client = UserProfileSerializer(read_only=True)
     partner = UserProfileSerializer(read_only=True)
-    service = ServiceDetailSerializer(read_only=True)
-    location = LocationSerializer(read_only=True)
+    service = ServiceSummarySerializer(read_only=True)
+    location = LocationSerializer(source='service_location', read_only=True)
     
     class Meta:
         model = Booking
@@ -85,22 +87,22 @@ class BookingDetailSerializer(serializers.ModelSerializer):
     client = UserProfileSerializer(read_only=True)
     partner = UserProfileSerializer(read_only=True)
     service = ServiceDetailSerializer(read_only=True)
-    location = LocationSerializer(read_only=True)
+    location = LocationSerializer(source='service_location', read_only=True)
     status_history = BookingStatusHistorySerializer(many=True, read_only=True)
     messages = BookingMessageSerializer(many=True, read_only=True)
     documents = BookingDocumentSerializer(many=True, read_only=True)
-    disputes = BookingDisputeSerializer(many=True, read_only=True)
+    dispute = BookingDisputeSerializer(read_only=True)
     
     class Meta:
         model = Booking
         fields = [
             'id', 'booking_number', 'client', 'partner', 'service',
             'location', 'scheduled_start', 'scheduled_end', 'status',
-            'total_amount', 'currency', 'service_fee', 'platform_fee',
-            'tax_amount', 'special_requirements', 'client_notes',
-            'partner_notes', 'client_rating', 'client_comment',
-            'partner_rating', 'partner_comment', 'status_history',
-            'messages', 'documents', 'disputes', 'created_at', 'updated_at'
+            'base_price', 'additional_fees', 'discount_amount', 'tax_amount',
+            'total_amount', 'currency', 'special_requirements', 'client_notes',
+            'partner_notes', 'client_rating', 'client_review',
+            'partner_rating', 'partner_review', 'status_history',
+            'messages', 'documents', 'dispute', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'booking_number', 'created_at', 'updated_at'
@@ -114,92 +116,64 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = [
-            'service', 'slot_id', 'location', 'special_requirements',
-            'client_notes'
+            'id', 'booking_number', 'status', 'service', 'slot_id',
+            'service_location', 'scheduled_start', 'scheduled_end',
+            'total_amount', 'currency', 'special_requirements', 'client_notes'
+        ]
+        read_only_fields = [
+            'id', 'booking_number', 'status', 'scheduled_start',
+            'scheduled_end', 'total_amount', 'currency'
         ]
     
     def validate_slot_id(self, value):
         """Validate that the slot exists and is available"""
         from services.models import AvailabilitySlot
         
+        # Loaded once with its service and partner; validate() and create() reuse it
         try:
-            slot = AvailabilitySlot.objects.get(id=value)
+            slot = AvailabilitySlot.objects.select_related('service__partner').get(id=value)
         except AvailabilitySlot.DoesNotExist:
             raise serializers.ValidationError("Invalid slot ID")
         
-        if not slot.is_available:
+        if not slot.is_available or slot.is_blocked:
             raise serializers.ValidationError("Slot is not available")
         
         if slot.start_time <= timezone.now():
             raise serializers.ValidationError("Cannot book past time slots")
         
+        if slot.is_held_for_other(self.context['request'].user):
+            raise serializers.ValidationError("Slot is on hold for another client")
+        
+        if (slot.end_time - slot.start_time).total_seconds() != 5400:  # 90 minutes
+            raise serializers.ValidationError("Booking slots must be exactly 90 minutes")
+        
+        self.slot = slot
         return value
     
     def validate(self, attrs):
         """Validate booking constraints"""
-        slot_id = attrs.get('slot_id')
         service = attrs.get('service')
         
-        if slot_id and service:
-            from services.models import AvailabilitySlot
-            
-            try:
-                slot = AvailabilitySlot.objects.get(id=slot_id)
-                if slot.service != service:
-                    raise serializers.ValidationError(
-                        "Slot does not belong to the selected service"
-                    )
-            except AvailabilitySlot.DoesNotExist:
-                raise serializers.ValidationError("Invalid slot")
+        if service and 'slot_id' in attrs and self.slot.service_id != service.pk:
+            raise serializers.ValidationError(
+                "Slot does not belong to the selected service"
+            )
         
         return attrs
     
-    @transaction.atomic
     def create(self, validated_data):
-        """Create booking with slot validation"""
-        slot_id = validated_data.pop('slot_id')
-        
-        # Get the slot and validate 90-minute duration
-        from services.models import AvailabilitySlot
-        slot = AvailabilitySlot.objects.get(id=slot_id)
-        
-        # Calculate 90-minute duration
-        scheduled_start = slot.start_time
-        scheduled_end = slot.start_time + timezone.timedelta(minutes=90)
-        
-        # Validate slot duration matches 90 minutes
-        if (slot.end_time - slot.start_time).total_seconds() != 5400:  # 90 minutes
-            raise serializers.ValidationError(
-                "Booking slots must be exactly 90 minutes"
+        """Claim the slot and create the booking atomically"""
+        try:
+            booking, self.created = reserve_booking(
+                client=self.context['request'].user,
+                slot=self.slot,
+                idempotency_key=validated_data.get('idempotency_key', ''),
+                service_location=validated_data.get('service_location'),
+                special_requirements=validated_data.get('special_requirements', ''),
+                client_notes=validated_data.get('client_notes', ''),
             )
-        
-        # Create booking
-        booking = Booking.objects.create(
-            client=self.context['request'].user,
-            partner=validated_data['service'].partner,
-            service=validated_data['service'],
-            location=validated_data.get('location'),
-            scheduled_start=scheduled_start,
-            scheduled_end=scheduled_end,
-            special_requirements=validated_data.get('special_requirements', ''),
-            client_notes=validated_data.get('client_notes', ''),
-            total_amount=validated_data['service'].base_price,
-            currency=validated_data['service'].currency,
-            status='PENDING'
-        )
-        
-        # Mark slot as unavailable
-        slot.is_available = False
-        slot.save()
-        
-        # Create initial status history
-        BookingStatusHistory.objects.create(
-            booking=booking,
-            status='PENDING',
-            notes='Booking created',
-            created_by=self.context['request'].user
-        )
-        
+        except SlotUnavailable as exc:
+            raise serializers.ValidationError({'slot_id': [str(exc)]})
         return booking
 
 
@@ -210,7 +184,7 @@ class BookingUpdateSerializer(serializers.ModelSerializer):
         model = Booking
         fields = [
             'special_requirements', 'client_notes', 'partner_notes',
-            'client_rating', 'client_comment', 'partner_rating', 'partner_comment'
+            'client_rating', 'client_review', 'partner_rating', 'partner_review'
         ]
     
     def validate_client_rating(self, value):
@@ -285,3 +259,6 @@ class BookingSearchSerializer(serializers.Serializer):
     )
     page = serializers.IntegerField(default=1, min_value=1)
     page_size = serializers.IntegerField(default=20, min_value=1, max_value=100)
+    # Cursor pagination (opt-in; send an empty cursor for the first page)
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    include_count = serializers.BooleanField(default=False)
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from services.ratings import recompute_ratings, record_client_rating
+from .models import Booking, BookingScheduleChange
+from .stats import invalidate_booking_stats
+
+
+def counted_rating(status, client_rating):
+    """Whether a booking in this state counts towards its service's rating"""
+    return status == Booking.BookingStatus.COMPLETED and client_rating is not None
+
+
+def recompute_service_rating(service_id):
+    transaction.on_commit(lambda: recompute_ratings([service_id]))
+
+
+@receiver(post_save, sender=Booking)
+def track_booking_changes(sender, instance, created, raw=False, **kwargs):
+    """
+    Dashboard stats only depend on each booking's status and client rating;
+    reminders only on its status and start time (see bookings.reminders).
+    """
+    if raw:
+        return
+    if created or any(instance.field_changed(name) for name in Booking.STATS_FIELDS):
+        invalidate_booking_stats(instance)
+    if created:
+        schedule_changed = instance.status == Booking.BookingStatus.CONFIRMED
+    else:
+        schedule_changed = any(instance.field_changed(name) for name in Booking.SCHEDULE_FIELDS)
+    if schedule_changed:
+        BookingScheduleChange.objects.create(booking=instance)
+    track_rating_changes(instance, created)
+
+
+def track_rating_changes(instance, created):
+    """
+    Keep the service rating in step with every save of a booking, whether it
+    comes from rate_service, a booking update or the admin. New, revised and
+    re-counted ratings are folded in; a rating that stops counting, or a save
+    of a booking loaded without its status or rating, recomputes the service.
+    """
+    is_counted = counted_rating(instance.status, instance.client_rating)
+    if created:
+        if is_counted:
+            with transaction.atomic(savepoint=False):
+                record_client_rating(instance)
+        return
+    if not (instance.field_loaded('status') and instance.field_loaded('client_rating')):
+        recompute_service_rating(instance.service_id)
+        return
+    was_counted = counted_rating(instance.loaded_value('status'), instance.loaded_value('client_rating'))
+    if was_counted and not is_counted:
+        recompute_service_rating(instance.service_id)
+    elif is_counted and (not was_counted or instance.field_changed('client_rating')):
+        with transaction.atomic(savepoint=False):
+            record_client_rating(
+                instance, previous_rating=instance.loaded_value('client_rating') if was_counted else None
+            )
+
+
+@receiver(post_delete, sender=Booking)
+def refresh_booking_stats_on_delete(sender, instance, **kwargs):
+    invalidate_booking_stats(instance)
+    if counted_rating(instance.status, instance.client_rating):
+        recompute_service_rating(instance.service_id)
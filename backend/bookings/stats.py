@@ -0,0 +1,71 @@
+"""
+Booking statistics
+
+All dashboard counters come from a single conditional aggregation over the
+user's bookings and are cached per scope (the partner, the client, or
+everything for admin/staff). The booking save/delete signals drop the affected
+scopes when a booking is created, deleted, changes status or gets rated.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+
+BOOKING_STATS_CACHE_KEY = 'bookings:stats:{scope}'
+BOOKING_STATS_TIMEOUT = 60 * 10
+
+STATUS_COUNTERS = {
+    'pending_bookings': 'PENDING',
+    'confirmed_bookings': 'CONFIRMED',
+    'completed_bookings': 'COMPLETED',
+    'cancelled_bookings': 'CANCELLED',
+}
+
+
+def stats_scope(user):
+    if user.role in ('ADMIN', 'STAFF'):
+        return 'all'
+    if user.role == 'PARTNER':
+        return f'partner:{user.pk}'
+    return f'client:{user.pk}'
+
+
+def compute_booking_stats(queryset, include_revenue=False):
+    """Every counter for ``queryset`` in one aggregate query"""
+    completed = Q(status='COMPLETED')
+    aggregates = {
+        'total_bookings': Count('id'),
+        **{key: Count('id', filter=Q(status=value)) for key, value in STATUS_COUNTERS.items()},
+        'average_rating': Avg('client_rating', filter=completed & Q(client_rating__isnull=False)),
+    }
+    if include_revenue:
+        aggregates['total_revenue'] = Sum('total_amount', filter=completed)
+    row = queryset.order_by().aggregate(**aggregates)
+
+    total, finished = row['total_bookings'], row['completed_bookings']
+    return {
+        'total_bookings': total,
+        **{key: row[key] for key in STATUS_COUNTERS},
+        'average_rating': round(row['average_rating'], 1) if row['average_rating'] else 0.0,
+        'total_revenue': float(row.get('total_revenue') or 0),
+        'completion_rate': round((finished / total * 100) if total > 0 else 0, 1),
+    }
+
+
+def get_booking_stats(user, queryset):
+    """Cached stats for ``user``; ``queryset`` must be the bookings visible to them"""
+    key = BOOKING_STATS_CACHE_KEY.format(scope=stats_scope(user))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_booking_stats(queryset, include_revenue=user.role == 'PARTNER')
+        cache.set(key, stats, BOOKING_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_booking_stats(booking):
+    """Drop every cached scope that includes ``booking`` once the current transaction commits"""
+    keys = [
+        BOOKING_STATS_CACHE_KEY.format(scope=scope)
+        for scope in ('all', f'partner:{booking.partner_id}', f'client:{booking.client_id}')
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
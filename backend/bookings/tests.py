@@ -1,3 +1,444 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import random
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import EmailOutbox, Location, User, UserPreference
+from services.availability import refresh_for_slots
+from services.categories import get_category_service_counts
+from services.models import AvailabilitySlot, Service, ServiceAvailabilityDay, ServiceCategory
+from .models import Booking, BookingDocument, BookingMessage, BookingScheduleChange, BookingStatusHistory
+from .reminders import ReminderScheduler, TimingWheel
+from .reservations import SlotUnavailable, hold_slot, reserve_booking
+
+
+class SlotFixtures:
+    """A partner's service with one bookable slot and a client"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.client_user = User.objects.create_user(
+            email='client@example.com', password='x', first_name='Cli', last_name='Ent', role='CLIENT'
+        )
+        category = ServiceCategory.objects.create(name='Cleaning')
+        cls.service = Service.objects.create(
+            partner=cls.partner, category=category, name='Home cleaning',
+            description='Cleaning', base_price=50, status='ACTIVE'
+        )
+        start = (timezone.now() + datetime.timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+        cls.slot = AvailabilitySlot.objects.create(
+            partner=cls.partner, service=cls.service,
+            start_time=start, end_time=start + datetime.timedelta(minutes=90)
+        )
+
+
+class BookingCreateQueryTests(SlotFixtures, TestCase):
+    """Query budget for the booking create path"""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def book(self, **headers):
+        return self.api.post(
+            '/api/v1/bookings/list/',
+            {'service': self.service.pk, 'slot_id': self.slot.pk},
+            format='json',
+            **headers
+        )
+
+    def test_create_loads_slot_once(self):
+        # service, slot with service and partner (one join), savepoint, claim
+        # UPDATE, booking and status history inserts, release savepoint; the
+        # availability index refresh waits for the commit
+        with self.assertNumQueries(7):
+            response = self.book()
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(AvailabilitySlot.objects.get(pk=self.slot.pk).is_available)
+
+    def test_create_refreshes_availability_index_after_commit(self):
+        refresh_for_slots([self.slot])
+        free_days = ServiceAvailabilityDay.objects.filter(service=self.service, free_slots__gt=0)
+        self.assertTrue(free_days.exists())
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.book()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(free_days.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(free_days.exists())
+
+    def test_idempotent_retry_is_single_query(self):
+        first = self.book(HTTP_IDEMPOTENCY_KEY='retry-1')
+        with self.assertNumQueries(1):
+            retry = self.book(HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class SlotReservationTests(SlotFixtures, TestCase):
+    """Conditional claims, checkout holds and idempotent retries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_client = User.objects.create_user(
+            email='other@example.com', password='x', first_name='Out', last_name='Ro', role='CLIENT'
+        )
+
+    def reserve(self, client, **fields):
+        slot = AvailabilitySlot.objects.select_related('service__partner').get(pk=self.slot.pk)
+        return reserve_booking(client, slot, **fields)
+
+    def test_a_slot_is_booked_once(self):
+        booking, created = self.reserve(self.client_user)
+        self.assertTrue(created)
+        with self.assertRaises(SlotUnavailable):
+            self.reserve(self.other_client)
+        self.assertEqual(Booking.objects.get().pk, booking.pk)
+
+    def test_holds_keep_others_out_until_they_expire(self):
+        hold_slot(self.slot.pk, self.client_user)
+        with self.assertRaises(SlotUnavailable):
+            hold_slot(self.slot.pk, self.other_client)
+        with self.assertRaises(SlotUnavailable):
+            self.reserve(self.other_client)
+
+        AvailabilitySlot.objects.filter(pk=self.slot.pk).update(held_until=timezone.now() - datetime.timedelta(seconds=1))
+        booking, _ = self.reserve(self.other_client)
+        self.assertEqual(booking.client, self.other_client)
+
+    def test_retry_with_the_same_key_returns_the_first_booking(self):
+        first, _ = self.reserve(self.client_user, idempotency_key='checkout-1')
+        # The slot is gone by now, but the retry is recognised instead of failing
+        retry, created = self.reserve(self.client_user, idempotency_key='checkout-1')
+        self.assertFalse(created)
+        self.assertEqual(retry.pk, first.pk)
+
+
+class BookingFixtures:
+    """A partner, a client and bookings with every related row the responses show"""
+
+    @classmethod
+    def setUpTestData(cls):
+        province = Location.objects.create(name='Luanda', location_type='PROVINCE')
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.client_user = User.objects.create_user(
+            email='client@example.com', password='x', first_name='Cli', last_name='Ent', role='CLIENT'
+        )
+        for user in (cls.partner, cls.client_user):
+            UserPreference.objects.create(user=user, default_province=province)
+        cls.category = ServiceCategory.objects.create(name='Cleaning')
+        cls.location = province
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def make_bookings(self, count):
+        start = timezone.now() + datetime.timedelta(days=1)
+        for _ in range(count):
+            service = Service.objects.create(
+                partner=self.partner, category=self.category, name='Home cleaning',
+                description='Cleaning', base_price=50, status='ACTIVE'
+            )
+            AvailabilitySlot.objects.create(
+                partner=self.partner, service=service,
+                start_time=start, end_time=start + datetime.timedelta(minutes=90)
+            )
+            booking = Booking.objects.create(
+                client=self.client_user, partner=self.partner, service=service,
+                service_location=self.location, scheduled_start=start,
+                scheduled_end=start + datetime.timedelta(minutes=90),
+                base_price=50, total_amount=50
+            )
+            BookingStatusHistory.objects.create(booking=booking, new_status='PENDING', changed_by=self.client_user)
+            BookingMessage.objects.create(
+                booking=booking, sender=self.client_user, recipient=self.partner, message='Hello'
+            )
+            BookingDocument.objects.create(
+                booking=booking, uploaded_by=self.partner, document_type='OTHER', title='Quote',
+                file_url='https://example.com/quote.pdf', file_name='quote.pdf', file_size=1, file_type='application/pdf'
+            )
+        # Category service counts are cached; warm the cache so they stay out of the budget
+        get_category_service_counts()
+        return booking
+
+
+class BookingQueryBudgetTests(BookingFixtures, TestCase):
+    """Booking list/detail responses must cost a fixed number of queries whatever the data size"""
+
+    # Authentication is forced, so these are the serializer and pagination queries only
+    LIST_QUERIES = 2  # page count, bookings with their select_related relations
+    DETAIL_QUERIES = 6  # booking, status history, messages, documents, attribute values, slots
+
+    def test_list_query_count_does_not_grow(self):
+        for total in (1, 5, 12):
+            self.make_bookings(total - Booking.objects.count())
+            with self.assertNumQueries(self.LIST_QUERIES):
+                response = self.api.get('/api/v1/bookings/list/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), total)
+
+    def test_detail_query_count_does_not_grow(self):
+        booking = self.make_bookings(1)
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            first = self.api.get(f'/api/v1/bookings/list/{booking.pk}/')
+        self.assertEqual(first.status_code, 200)
+
+        for _ in range(3):
+            BookingMessage.objects.create(
+                booking=booking, sender=self.partner, recipient=self.client_user, message='Reply'
+            )
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.api.get(f'/api/v1/bookings/list/{booking.pk}/')
+        self.assertEqual(len(response.data['messages']), 4)
+        self.assertEqual(response.data['location']['id'], self.location.pk)
+
+
+
+class BookingDetailTests(BookingFixtures, TestCase):
+    """Detail relations are loaded once and only where the detail is rendered"""
+
+    def test_only_upcoming_slots_are_rendered(self):
+        booking = self.make_bookings(1)
+        past = timezone.now() - datetime.timedelta(days=2)
+        AvailabilitySlot.objects.create(
+            partner=self.partner, service=booking.service,
+            start_time=past, end_time=past + datetime.timedelta(minutes=90)
+        )
+        response = self.api.get(f'/api/v1/bookings/list/{booking.pk}/')
+        slots = response.data['service']['availability_slots']
+        self.assertEqual(len(slots), 1)
+        self.assertGreater(slots[0]['start_time'], timezone.now().isoformat())
+
+    def test_update_status_fetches_the_booking_once(self):
+        booking = self.make_bookings(1)
+        self.api.force_authenticate(self.partner)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.post(
+                f'/api/v1/bookings/list/{booking.pk}/update_status/', {'status': 'CONFIRMED'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [entry['new_status'] for entry in response.data['booking']['status_history']], ['CONFIRMED', 'PENDING']
+        )
+        booking_fetches = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "bookings_booking"' in query['sql']
+        ]
+        self.assertEqual(len(booking_fetches), 1)
+
+
+class BookingCalendarTests(BookingFixtures, TestCase):
+    """Cursor pages over a partner's calendar"""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.partner)
+
+    def calendar(self, **params):
+        day = timezone.localdate(timezone.now() + datetime.timedelta(days=1)).isoformat()
+        params = {'start_date': day, 'end_date': day, **params}
+        return self.api.get('/api/v1/bookings/calendar/', params)
+
+    def test_cursor_pages_cover_every_booking_once(self):
+        self.make_bookings(5)
+        seen, cursor = [], ''
+        while cursor is not None:
+            body = self.calendar(cursor=cursor, page_size=2).data
+            seen += [row['id'] for row in body['results']]
+            cursor = body['next_cursor']
+        self.assertCountEqual(seen, Booking.objects.values_list('id', flat=True))
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.calendar(cursor='', page_size='ten').status_code, 400)
+        self.assertEqual(self.calendar(cursor='', page_size=0).status_code, 400)
+        self.assertEqual(self.calendar(start_date='2024-02-30').status_code, 400)
+
+    def test_tampered_cursor_is_rejected(self):
+        self.make_bookings(3)
+        cursor = self.calendar(cursor='', page_size=2).data['next_cursor']
+        value, _ = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        tampered = base64.urlsafe_b64encode(json.dumps([value, 'x']).encode()).decode()
+        response = self.calendar(cursor=tampered, page_size=2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+
+class BookingStatsTests(BookingFixtures, TestCase):
+    """Dashboard counters: one aggregate query, cached until a counted field changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.partner)
+
+    def test_stats_are_cached_until_a_status_changes(self):
+        booking = self.make_bookings(2)
+        with self.assertNumQueries(1):
+            first = self.api.get('/api/v1/bookings/stats/').data
+        self.assertEqual((first['total_bookings'], first['pending_bookings']), (2, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.client_notes = 'Ring twice'
+            booking.save()
+        with self.assertNumQueries(0):
+            self.api.get('/api/v1/bookings/stats/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.status = 'COMPLETED'
+            booking.save()
+        stats = self.api.get('/api/v1/bookings/stats/').data
+        self.assertEqual((stats['pending_bookings'], stats['completed_bookings']), (1, 1))
+        self.assertEqual(stats['completion_rate'], 50.0)
+
+class TimingWheelTests(SimpleTestCase):
+    """Timers fire exactly on their tick across every wheel level"""
+
+    def test_timers_fire_on_their_tick(self):
+        wheel = TimingWheel(start_tick=1000, sizes=(8, 4, 2))
+        rng = random.Random(7)
+        due = {key: 1000 + rng.randint(1, 200) for key in range(300)}
+        for key, tick in due.items():
+            wheel.schedule(key, tick, payload=tick)
+        cancelled = set(range(0, 300, 3))
+        for key in cancelled:
+            self.assertTrue(wheel.cancel(key))
+        wheel.schedule(1, due[1] + 5, payload=due[1] + 5)
+        due[1] += 5
+
+        for tick in range(1001, 1210):
+            for key, payload in wheel.advance(tick):
+                self.assertEqual(payload, tick)
+                self.assertEqual(due.pop(key), tick)
+        self.assertEqual(set(due), cancelled)
+        self.assertEqual(len(wheel), 0)
+
+    def test_past_timers_fire_on_next_advance(self):
+        wheel = TimingWheel(start_tick=50)
+        wheel.schedule('late', 10)
+
+        self.assertEqual(wheel.advance(51), [('late', None)])
+
+
+class BookingReminderTests(TestCase):
+    """Reminder scheduler follows confirmations, reschedules and cancellations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.client_user = User.objects.create_user(
+            email='client@example.com', password='x', first_name='Cli', last_name='Ent', role='CLIENT',
+            preferred_language='pt'
+        )
+        UserPreference.objects.create(user=cls.partner, notification_email=False)
+        category = ServiceCategory.objects.create(name='Cleaning')
+        cls.service = Service.objects.create(
+            partner=cls.partner, category=category, name='Home cleaning',
+            description='Cleaning', base_price=50, status='ACTIVE'
+        )
+
+    def setUp(self):
+        self.now = timezone.now().replace(second=0, microsecond=0)
+
+    def book(self, starts_in, status=Booking.BookingStatus.CONFIRMED):
+        start = self.now + starts_in
+        return Booking.objects.create(
+            client=self.client_user, partner=self.partner, service=self.service, status=status,
+            scheduled_start=start, scheduled_end=start + datetime.timedelta(hours=1),
+            base_price=50, total_amount=50
+        )
+
+    def reminders(self):
+        return list(EmailOutbox.objects.order_by('id').values_list('to_email', 'subject'))
+
+    def test_reminders_fire_before_start(self):
+        booking = self.book(datetime.timedelta(hours=30))
+        scheduler = ReminderScheduler()
+        scheduler.start(self.now)
+        self.assertEqual(len(scheduler.wheel), 2)
+
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=5, minutes=59)), 0)
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=6)), 1)
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=29)), 1)
+        # Partner opted out of email
+        self.assertEqual(self.reminders(), [
+            ('client@example.com', f'Lembrete: reserva {booking.booking_number} em 24 horas'),
+            ('client@example.com', f'Lembrete: reserva {booking.booking_number} em 1 hora'),
+        ])
+
+    def test_bookings_beyond_the_window_are_loaded_later(self):
+        self.book(datetime.timedelta(days=3))
+        scheduler = ReminderScheduler()
+        scheduler.start(self.now)
+        self.assertEqual(len(scheduler.wheel), 0)
+
+        scheduler.run_once(self.now + datetime.timedelta(hours=47))
+
+        self.assertEqual(len(scheduler.wheel), 2)
+
+    def test_reschedule_and_cancel_move_timers(self):
+        scheduler = ReminderScheduler()
+        scheduler.start(self.now)
+        booking = self.book(datetime.timedelta(hours=2), status=Booking.BookingStatus.PENDING)
+        self.assertFalse(BookingScheduleChange.objects.exists())
+
+        booking.status = Booking.BookingStatus.CONFIRMED
+        booking.save()
+        scheduler.run_once(self.now)
+        self.assertEqual(len(scheduler.wheel), 1)
+
+        booking.scheduled_start += datetime.timedelta(hours=1)
+        booking.save()
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=1)), 0)
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=2)), 1)
+
+        later = self.book(datetime.timedelta(hours=5))
+        scheduler.run_once(self.now + datetime.timedelta(hours=2))
+        later.status = Booking.BookingStatus.CANCELLED
+        later.save()
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=4)), 0)
+        self.assertEqual(len(scheduler.wheel), 0)
+        self.assertFalse(BookingScheduleChange.objects.exists())
+
+    def test_bulk_reschedule_moves_timers(self):
+        booking = self.book(datetime.timedelta(hours=2))
+        scheduler = ReminderScheduler()
+        scheduler.start(self.now)
+
+        Booking.objects.filter(pk=booking.pk).update(scheduled_start=self.now + datetime.timedelta(hours=3))
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=1)), 0)
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=2)), 1)
+
+        booking.refresh_from_db()
+        booking.scheduled_start = self.now + datetime.timedelta(hours=4)
+        Booking.objects.bulk_update([booking], ['scheduled_start'])
+        self.assertEqual(scheduler.run_once(self.now + datetime.timedelta(hours=3)), 1)
+
+    def test_restarted_scheduler_does_not_repeat_reminders(self):
+        self.book(datetime.timedelta(minutes=50))
+        minute = datetime.timedelta(minutes=1)
+        for _ in range(2):
+            # The missed T-1h reminder goes out on the scheduler's first tick
+            scheduler = ReminderScheduler()
+            scheduler.run_once(self.now)
+            scheduler.run_once(self.now + minute)
+
+        self.assertEqual(len(self.reminders()), 1)
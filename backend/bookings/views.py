@@ -2,9 +2,11 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.core.paginator import Paginator
+from ebglobal.pagination import KeysetPaginator, cursor_page_response, page_size_param, wants_cursor
 from django.db import transaction
 from .models import (
     Booking, BookingStatusHistory, BookingMessage, BookingDocument,
@@ -16,12 +18,48 @@ from .serializers import (
     BookingMessageSerializer, BookingDocumentSerializer, BookingDisputeSerializer,
     RecurringBookingSerializer, BookingSearchSerializer
 )
+from services.models import AvailabilitySlot, ServiceAttributeValue
+from .reservations import find_replay
+from .stats import get_booking_stats
+
+
+def _profile(path):
+    """select_related path covering what UserProfileSerializer renders for ``path``"""
+    return f'{path}__preferences__default_province'
+
+
+def with_list_relations(queryset):
+    """Load everything BookingListSerializer renders with the bookings themselves"""
+    return queryset.select_related(
+        _profile('client'), _profile('partner'), 'service_location',
+        'service__category', 'service__rating_summary'
+    )
+
+
+def with_detail_relations(queryset):
+    """
+    Relations rendered by BookingDetailSerializer; the query count does not
+    grow with the data. Only upcoming slots of the service are loaded.
+    """
+    return with_list_relations(queryset).select_related(
+        _profile('service__partner'), 'service__primary_location',
+        _profile('dispute__raised_by')
+    ).prefetch_related(
+        'status_history',
+        Prefetch('messages', queryset=BookingMessage.objects.select_related(_profile('sender'))),
+        Prefetch('documents', queryset=BookingDocument.objects.select_related(_profile('uploaded_by'))),
+        Prefetch('service__attribute_values', queryset=ServiceAttributeValue.objects.select_related('attribute')),
+        Prefetch('service__availability_slots', queryset=AvailabilitySlot.objects.filter(start_time__gte=timezone.now()))
+    )
 
 
 class BookingViewSet(viewsets.ModelViewSet):
     """ViewSet for bookings"""
     permission_classes = [permissions.IsAuthenticated]
     
+    # Actions that render BookingDetailSerializer from the fetched booking
+    DETAIL_ACTIONS = ('retrieve', 'update_status', 'rate_client')
+    
     def get_queryset(self):
         """Filter bookings based on user role"""
         user = self.request.user
@@ -36,11 +74,11 @@ class BookingViewSet(viewsets.ModelViewSet):
             # Clients can see their own bookings
             queryset = Booking.objects.filter(client=user)
         
-        return queryset.select_related(
-            'client', 'partner', 'service', 'location'
-        ).prefetch_related(
-            'status_history', 'messages', 'documents', 'disputes'
-        )
+        if self.action == 'list':
+            return with_list_relations(queryset)
+        if self.action in self.DETAIL_ACTIONS:
+            return with_detail_relations(queryset)
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -52,9 +90,20 @@ class BookingViewSet(viewsets.ModelViewSet):
         else:
             return BookingDetailSerializer
     
-    def perform_create(self, serializer):
-        """Create booking with proper context"""
-        serializer.save()
+    def create(self, request, *args, **kwargs):
+        """Create a booking; retries carrying the same Idempotency-Key return the original"""
+        idempotency_key = request.headers.get('Idempotency-Key', '')[:64]
+        existing = find_replay(request.user, idempotency_key)
+        if existing:
+            return Response(self.get_serializer(existing).data, status=status.HTTP_200_OK)
+        
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(idempotency_key=idempotency_key)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK
+        )
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -77,11 +126,14 @@ class BookingViewSet(viewsets.ModelViewSet):
             # Create status history entry
             BookingStatusHistory.objects.create(
                 booking=booking,
-                status=new_status,
+                old_status=old_status,
+                new_status=new_status,
                 notes=notes or f"Status changed from {old_status} to {new_status}",
-                created_by=request.user
+                changed_by=request.user
             )
             
+            # Drop the prefetched history so the response includes the new entry
+            booking.refresh_from_db(fields=['status_history'])
             return Response({
                 'message': 'Booking status updated successfully',
                 'booking': BookingDetailSerializer(booking).data
@@ -157,19 +209,22 @@ class BookingViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             dispute = serializer.save(
                 booking=booking,
-                created_by=request.user
+                raised_by=request.user,
+                disputed_user=booking.partner if request.user == booking.client else booking.client
             )
             
             # Update booking status to disputed
+            old_status = booking.status
             booking.status = 'DISPUTED'
             booking.save()
             
             # Create status history
             BookingStatusHistory.objects.create(
                 booking=booking,
-                status='DISPUTED',
+                old_status=old_status,
+                new_status='DISPUTED',
                 notes=f'Dispute created: {dispute.description}',
-                created_by=request.user
+                changed_by=request.user
             )
             
             return Response({
@@ -207,9 +262,13 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        booking.client_rating = int(rating)
-        booking.client_comment = comment
-        booking.save()
+        with transaction.atomic():
+            # Lock the booking so the previous rating read here is the one replaced
+            booking = Booking.objects.select_for_update().get(pk=booking.pk)
+            booking.client_rating = int(rating)
+            booking.client_review = comment
+            # The post_save handler folds the rating into the service summary
+            booking.save()
         
         return Response({
             'message': 'Service rated successfully',
@@ -245,7 +304,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             )
         
         booking.partner_rating = int(rating)
-        booking.partner_comment = comment
+        booking.partner_review = comment
         booking.save()
         
         return Response({
@@ -294,24 +353,37 @@ class BookingSearchView(APIView):
             queryset = queryset.filter(service_id=data['service_id'])
         
         if data.get('location_id'):
-            queryset = queryset.filter(location_id=data['location_id'])
+            queryset = queryset.filter(service_location_id=data['location_id'])
         
         # Apply sorting
         sort_by = data.get('sort_by', 'date_desc')
         if sort_by == 'date_asc':
-            queryset = queryset.order_by('scheduled_start')
+            ordering = 'scheduled_start'
         elif sort_by == 'date_desc':
-            queryset = queryset.order_by('-scheduled_start')
+            ordering = '-scheduled_start'
         elif sort_by == 'amount_asc':
-            queryset = queryset.order_by('total_amount')
+            ordering = 'total_amount'
         elif sort_by == 'amount_desc':
-            queryset = queryset.order_by('-total_amount')
+            ordering = '-total_amount'
         elif sort_by == 'status':
-            queryset = queryset.order_by('status')
+            ordering = 'status'
+        
+        page_size = data.get('page_size', 20)
+        queryset = with_list_relations(queryset)
+        
+        # Opt-in cursor pagination: every page costs the same, no COUNT(*)
+        if wants_cursor(data):
+            paginator = KeysetPaginator(queryset, ordering, page_size)
+            return Response(cursor_page_response(
+                BookingListSerializer, paginator, data['cursor'],
+                include_count=data.get('include_count', False),
+                filters_applied=data
+            ))
+        
+        queryset = queryset.order_by(ordering)
         
         # Pagination
         page = data.get('page', 1)
-        page_size = data.get('page_size', 20)
         paginator = Paginator(queryset, page_size)
         page_obj = paginator.get_page(page)
         
@@ -340,38 +412,7 @@ class BookingStatsView(APIView):
         else:
             queryset = Booking.objects.filter(client=user)
         
-        # Calculate statistics
-        total_bookings = queryset.count()
-        pending_bookings = queryset.filter(status='PENDING').count()
-        confirmed_bookings = queryset.filter(status='CONFIRMED').count()
-        completed_bookings = queryset.filter(status='COMPLETED').count()
-        cancelled_bookings = queryset.filter(status='CANCELLED').count()
-        
-        # Calculate average rating
-        avg_rating = queryset.filter(
-            status='COMPLETED',
-            client_rating__isnull=False
-        ).aggregate(avg_rating=Avg('client_rating'))['avg_rating']
-        
-        # Calculate total revenue (for partners)
-        total_revenue = 0
-        if user.role == 'PARTNER':
-            total_revenue = queryset.filter(
-                status='COMPLETED'
-            ).aggregate(total=models.Sum('total_amount'))['total'] or 0
-        
-        return Response({
-            'total_bookings': total_bookings,
-            'pending_bookings': pending_bookings,
-            'confirmed_bookings': confirmed_bookings,
-            'completed_bookings': completed_bookings,
-            'cancelled_bookings': cancelled_bookings,
-            'average_rating': round(avg_rating, 1) if avg_rating else 0.0,
-            'total_revenue': float(total_revenue),
-            'completion_rate': round(
-                (completed_bookings / total_bookings * 100) if total_bookings > 0 else 0, 1
-            )
-        })
+        return Response(get_booking_stats(user, queryset))
 
 
 class BookingCalendarView(APIView):
@@ -388,12 +429,15 @@ class BookingCalendarView(APIView):
             )
         
         # Get date range
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
+        try:
+            start_date = parse_date(request.query_params.get('start_date') or '')
+            end_date = parse_date(request.query_params.get('end_date') or '')
+        except ValueError:
+            start_date = end_date = None
         
         if not start_date or not end_date:
             return Response(
-                {'error': 'start_date and end_date are required'},
+                {'error': 'start_date and end_date are required (YYYY-MM-DD)'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -403,10 +447,21 @@ class BookingCalendarView(APIView):
         else:
             queryset = Booking.objects.all()
         
-        queryset = queryset.filter(
+        queryset = with_list_relations(queryset.filter(
             scheduled_start__date__gte=start_date,
             scheduled_start__date__lte=end_date
-        ).order_by('scheduled_start')
+        ))
+        
+        # Opt-in cursor pagination so large calendars can be fetched in pages
+        if wants_cursor(request.query_params):
+            page_size = page_size_param(request.query_params, default=100, maximum=500)
+            paginator = KeysetPaginator(queryset, 'scheduled_start', page_size)
+            return Response(cursor_page_response(
+                BookingListSerializer, paginator, request.query_params.get('cursor'),
+                include_count=request.query_params.get('include_count') == 'true'
+            ))
+        
+        queryset = queryset.order_by('scheduled_start')
         
         serializer = BookingListSerializer(queryset, many=True)
         return Response(serializer.data)
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Response cache for public, read-heavy endpoints
+
+Cached bodies are keyed on the endpoint, the query parameters it actually
+reads (normalized: sorted, blanks dropped), the host and the request
+language. Each entry records the versions of the tags it depends on (e.g.
+``services``, ``categories``, ``locations``); ``invalidate_tags`` bumps those
+versions from model signals, so every dependent entry goes stale at once
+without scanning keys.
+
+Stale entries (past their TTL or built against an older tag version) keep
+being served for ``stale_timeout`` seconds while a single request, holding a
+short lock, rebuilds them. That caps the rebuild to one query set per entry
+instead of a stampede when a popular key expires.
+"""
+
+import functools
+import hashlib
+import json
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language_from_request
+from rest_framework.response import Response
+
+TAG_VERSION_KEY = 'respcache:tag:{tag}'
+ENTRY_KEY = 'respcache:entry:{namespace}:{fingerprint}'
+LOCK_KEY = 'respcache:lock:{namespace}:{fingerprint}'
+
+DEFAULT_TIMEOUT = 60 * 5
+DEFAULT_STALE_TIMEOUT = 60 * 30
+REBUILD_LOCK_TIMEOUT = 30
+
+
+def get_version(key, current=None):
+    """
+    Shared version token stored under ``key`` (never expires), created on
+    first use. ``current`` is a value already read from the cache, if any.
+    """
+    version = current if current is not None else cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(*keys):
+    """
+    Give every key in ``keys`` a new version, retiring whatever was built
+    against the old one. Applied when the current transaction commits
+    (immediately outside one), so no reader rebuilds from rows about to change.
+    """
+    transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def tag_versions(tags):
+    """Current version of every tag, creating missing ones"""
+    keys = {TAG_VERSION_KEY.format(tag=tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    return {tag: get_version(key, found.get(key)) for key, tag in keys.items()}
+
+
+def invalidate_tags(*tags):
+    """Mark every cached response depending on ``tags`` as stale"""
+    bump_version(*(TAG_VERSION_KEY.format(tag=tag) for tag in tags))
+
+
+def request_fingerprint(request, params, extra=None):
+    """Hash of the normalized parameters a cached response varies on"""
+    query = sorted(
+        (name, value)
+        for name in params
+        for value in request.query_params.getlist(name)
+        if value != ''
+    )
+    payload = [request.get_host(), get_language_from_request(request), query, extra]
+    return hashlib.sha1(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+def cached_response(namespace, tags, params=(), timeout=DEFAULT_TIMEOUT, stale_timeout=DEFAULT_STALE_TIMEOUT):
+    """
+    Decorator for ``get``/``list``/``retrieve`` view methods returning a
+    public ``Response``. Only 200 responses are stored; URL kwargs (e.g.
+    ``pk``) are part of the key.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            fingerprint = request_fingerprint(request, params, kwargs or None)
+            key = ENTRY_KEY.format(namespace=namespace, fingerprint=fingerprint)
+            versions = tag_versions(tags)
+
+            entry = cache.get(key)
+            if entry is not None:
+                fresh = entry['versions'] == versions and entry['fresh_until'] > time.time()
+                if fresh:
+                    return _respond(entry, 'HIT')
+                lock = LOCK_KEY.format(namespace=namespace, fingerprint=fingerprint)
+                if not cache.add(lock, 1, REBUILD_LOCK_TIMEOUT):
+                    # Someone else is rebuilding this entry; serve what we have
+                    return _respond(entry, 'STALE')
+                try:
+                    return _rebuild(method, view, request, args, kwargs, key, versions, timeout, stale_timeout)
+                finally:
+                    cache.delete(lock)
+
+            return _rebuild(method, view, request, args, kwargs, key, versions, timeout, stale_timeout)
+        return wrapper
+    return decorator
+
+
+def _rebuild(method, view, request, args, kwargs, key, versions, timeout, stale_timeout):
+    response = method(view, request, *args, **kwargs)
+    if response.status_code == 200 and isinstance(response, Response):
+        entry = {'data': response.data, 'versions': versions, 'fresh_until': time.time() + timeout}
+        cache.set(key, entry, timeout + stale_timeout)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def _respond(entry, state):
+    response = Response(entry['data'])
+    response['X-Cache'] = state
+    return response
@@ -0,0 +1,236 @@
+"""
+Keyset (cursor) pagination for large listings
+
+Pages are selected with a ``WHERE sort_key < last_key OR (sort_key = last_key
+AND pk < last_pk)`` filter (``>`` for ascending orderings) on an indexed
+ordering instead of ``OFFSET``, so every page costs the same as the first one,
+and no ``COUNT(*)`` is issued unless explicitly asked for.
+"""
+
+import base64
+import bisect
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+def wants_cursor(params):
+    """Cursor mode is opt-in: enabled when the request carries a ``cursor`` key (may be empty)"""
+    return 'cursor' in params
+
+
+class KeysetPaginator:
+    """Forward-only cursor pagination over ``queryset`` ordered by ``ordering`` then ``pk``"""
+
+    def __init__(self, queryset, ordering, page_size=20):
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.page_size = page_size
+        tiebreak = '-pk' if self.descending else 'pk'
+        self.queryset = queryset.order_by(ordering, tiebreak)
+
+    # Cursor encoding ------------------------------------------------------
+
+    def _dump(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+    def _load(self, value):
+        try:
+            field = self.queryset.model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            # Annotation (e.g. a search rank); stored as a JSON-native value
+            return value
+        return field.to_python(value)
+
+    def encode_cursor(self, obj):
+        payload = json.dumps([self._dump(getattr(obj, self.field)), obj.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return self._load(value), int(pk)
+        except (ValueError, TypeError, DjangoValidationError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    # Paging ---------------------------------------------------------------
+
+    def get_page(self, cursor=None):
+        """Return ``(items, next_cursor)``; ``next_cursor`` is None on the last page"""
+        queryset = self.queryset
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            op = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{op}': value}) |
+                Q(**{self.field: value, f'pk__{op}': pk})
+            )
+        items = list(queryset[:self.page_size + 1])
+        next_cursor = None
+        if len(items) > self.page_size:
+            items = items[:self.page_size]
+            next_cursor = self.encode_cursor(items[-1])
+        return items, next_cursor
+
+    def count(self):
+        return estimate_count(self.queryset)
+
+
+def page_size_param(params, default=20, maximum=100):
+    """``page_size`` query parameter capped at ``maximum``; anything but a positive integer is a 400"""
+    try:
+        page_size = int(params.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = 0
+    if page_size < 1:
+        raise ValidationError({'page_size': 'Must be a positive integer'})
+    return min(page_size, maximum)
+
+
+def estimate_count(queryset):
+    """
+    Cheap result-size estimate: the planner's row estimate on PostgreSQL, an
+    exact count elsewhere (development databases are small).
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cursor_page_response(serializer_class, paginator, cursor, include_count=False, context=None, **extra):
+    """Build the response body for a cursor page"""
+    items, next_cursor = paginator.get_page(cursor or None)
+    body = {
+        'results': serializer_class(items, many=True, context=context or {}).data,
+        'next_cursor': next_cursor,
+        'count': paginator.count() if include_count else None,
+    }
+    body.update(extra)
+    return body
+
+
+class ScoredPaginator:
+    """
+    Pagination over ``queryset`` ordered by a score computed outside SQL
+    (fallback search relevance, distance) then ``pk``. Ids are ranked by score
+    first; a cursor page then checks candidates against ``queryset`` a page's
+    worth at a time, so only the rows of the requested page are loaded, each
+    with its score set as ``attribute``. Page-number mode needs the total and
+    checks every candidate, in batches of ``MEMBER_BATCH`` ids.
+    """
+
+    MEMBER_BATCH = 500
+
+    def __init__(self, queryset, scores, attribute, descending=False, page_size=20, filtered=False):
+        # filtered: ``scores`` only holds rows of ``queryset`` already, no membership check needed
+        self.queryset = queryset
+        self.scores = scores
+        self.attribute = attribute
+        self.descending = descending
+        self.page_size = page_size
+        self.filtered = filtered
+        self._candidates = None
+        self._ranked = None
+
+    def sort_key(self, score, pk):
+        return (-score, -pk) if self.descending else (score, pk)
+
+    def candidates(self):
+        """``[(score, pk)]`` of every scored id, in page order"""
+        if self._candidates is None:
+            self._candidates = sorted(
+                ((score, pk) for pk, score in self.scores.items()),
+                key=lambda entry: self.sort_key(*entry),
+            )
+        return self._candidates
+
+    def members(self, entries):
+        """The ``entries`` whose row is in ``queryset``, in order"""
+        if self.filtered:
+            return list(entries)
+        found = []
+        for start in range(0, len(entries), self.MEMBER_BATCH):
+            batch = entries[start:start + self.MEMBER_BATCH]
+            present = set(self.queryset.filter(pk__in=[pk for _, pk in batch]).values_list('pk', flat=True))
+            found.extend(entry for entry in batch if entry[1] in present)
+        return found
+
+    def ranked(self):
+        """``[(score, pk)]`` of every row in ``queryset``, in page order"""
+        if self._ranked is None:
+            self._ranked = self.members(self.candidates())
+        return self._ranked
+
+    def load(self, entries):
+        """Model instances for ``[(score, pk)]``, in that order"""
+        rows = self.queryset.in_bulk([pk for _, pk in entries])
+        items = []
+        for score, pk in entries:
+            if pk in rows:
+                setattr(rows[pk], self.attribute, score)
+                items.append(rows[pk])
+        return items
+
+    def page(self, number):
+        """Page-number mode: a ``django.core.paginator`` page whose ``object_list`` holds the instances"""
+        from django.core.paginator import Paginator
+
+        page = Paginator(self.ranked(), self.page_size).get_page(number)
+        page.object_list = self.load(page.object_list)
+        return page
+
+    # Cursor mode, same interface as KeysetPaginator --------------------------
+
+    def encode_cursor(self, score, pk):
+        payload = json.dumps([score, pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            score, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return float(score), int(pk)
+        except (ValueError, TypeError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    def get_page(self, cursor=None):
+        """Return ``(items, next_cursor)``; ``next_cursor`` is None on the last page"""
+        candidates = self.candidates()
+        position = 0
+        if cursor:
+            position = bisect.bisect_right(
+                candidates, self.sort_key(*self.decode_cursor(cursor)), key=lambda entry: self.sort_key(*entry)
+            )
+        # Load the next candidates until one row more than a page is found;
+        # batches start at a page and double while other filters reject rows
+        items, size = [], self.page_size + 1
+        while len(items) <= self.page_size and position < len(candidates):
+            batch = candidates[position:position + size]
+            position += len(batch)
+            items.extend(self.load(batch))
+            size = min(size * 2, self.MEMBER_BATCH)
+        next_cursor = None
+        if len(items) > self.page_size:
+            items = items[:self.page_size]
+            last = items[-1]
+            next_cursor = self.encode_cursor(getattr(last, self.attribute), last.pk)
+        return items, next_cursor
+
+    def count(self):
+        return len(self.ranked())
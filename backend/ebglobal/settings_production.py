@@ -32,6 +32,16 @@ DATABASES = {
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
+# Shared cache so invalidations reach every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://localhost:6379/2'),
+        'KEY_PREFIX': 'ebglobal',
+        'TIMEOUT': 300,
+    }
+}
+
 # CORS settings for production
 CORS_ALLOWED_ORIGINS = [
     "https://www.e-b-global.online",
@@ -0,0 +1,184 @@
+"""
+Per-process snapshots of small, read-mostly tables
+
+A ``VersionedSnapshot`` keeps one immutable object per process (e.g. the
+category or location tree) and rebuilds it with ``load()`` whenever the shared
+version key (see ``ebglobal.cache.get_version``) has changed, so a write in
+any process retires every other process's copy on its next read.
+
+Snapshots too large to rebuild on every write (e.g. the fallback search
+index) are a ``JournaledSnapshot`` instead: writers append the ids they
+changed to a shared journal and readers patch just those into their copy.
+"""
+
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import bump_version, get_version
+
+
+class VersionedSnapshot:
+    """Process-local value rebuilt by ``load(version)`` when the shared version changes"""
+
+    def __init__(self, version_key, load):
+        self.version_key = version_key
+        self.load = load
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+
+    def version(self):
+        return get_version(self.version_key)
+
+    def get(self):
+        version = self.version()
+        if self._version == version and self._value is not None:
+            return self._value
+        with self._lock:
+            if self._version != version or self._value is None:
+                self._value = self.load(version)
+                self._version = version
+        return self._value
+
+    def invalidate(self):
+        bump_version(self.version_key)
+
+
+class JournaledSnapshot:
+    """
+    Process-local value kept current from a shared journal of changed ids
+
+    ``record(ids)`` appends one entry per commit under an increasing sequence
+    number (``cache.incr``). A reader behind the journal passes the ids of the
+    entries it missed to ``apply(value, ids)``; it only rebuilds with
+    ``load()`` when an entry is missing (evicted or not written yet) or it is
+    more than ``max_replay`` entries behind. The sequence lives under a random
+    epoch that is replaced whenever the counter is lost, so a restarted
+    counter is never mistaken for a position a reader has already seen.
+    """
+
+    def __init__(self, key, load, apply, max_replay=500, timeout=60 * 60):
+        self.key = key
+        self.load = load
+        self.apply = apply
+        self.max_replay = max_replay
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._position = None
+        self._value = None
+
+    def _sequence_key(self, epoch):
+        return f'{self.key}:{epoch}:sequence'
+
+    def _entry_key(self, epoch, sequence):
+        return f'{self.key}:{epoch}:{sequence}'
+
+    def _new_epoch(self):
+        epoch = uuid.uuid4().hex
+        cache.add(self._sequence_key(epoch), 0, None)
+        cache.set(self.key, epoch, None)
+        return epoch
+
+    def position(self):
+        """Current ``(epoch, sequence)`` of the journal"""
+        epoch = cache.get(self.key)
+        sequence = cache.get(self._sequence_key(epoch)) if epoch else None
+        if sequence is None:
+            return self._new_epoch(), 0
+        return epoch, sequence
+
+    def _missed(self, position):
+        """Ids changed since this process's copy, or None when it must be rebuilt"""
+        if self._value is None or self._position is None:
+            return None
+        (epoch, seen), (current_epoch, sequence) = self._position, position
+        if epoch != current_epoch or not 0 <= sequence - seen <= self.max_replay:
+            return None
+        keys = [self._entry_key(epoch, number) for number in range(seen + 1, sequence + 1)]
+        entries = cache.get_many(keys)
+        if len(entries) != len(keys):
+            return None
+        return {item for entry in entries.values() for item in entry}
+
+    def get(self):
+        position = self.position()
+        if self._position == position and self._value is not None:
+            return self._value
+        with self._lock:
+            position = self.position()
+            if self._position != position or self._value is None:
+                missed = self._missed(position)
+                if missed is None:
+                    self._value = self.load()
+                elif missed:
+                    self.apply(self._value, missed)
+                self._position = position
+        return self._value
+
+    def reload(self):
+        """Rebuild this process's copy from scratch"""
+        with self._lock:
+            position = self.position()
+            self._value = self.load()
+            self._position = position
+        return self._value
+
+    def record(self, ids):
+        """Journal ``ids`` as changed once the current transaction commits"""
+        ids = sorted(set(ids))
+        transaction.on_commit(lambda: self._append(ids))
+
+    def _append(self, ids):
+        epoch = cache.get(self.key)
+        try:
+            sequence = cache.incr(self._sequence_key(epoch)) if epoch else None
+        except ValueError:
+            sequence = None
+        if sequence is None:
+            # Counter lost: a new epoch makes every reader rebuild
+            self._new_epoch()
+            return
+        cache.set(self._entry_key(epoch, sequence), ids, self.timeout)
+
+
+class Tree:
+    """Immutable parent/children index over ``{'id', 'parent', ...}`` node dicts"""
+
+    def __init__(self, nodes, version=None):
+        self.version = version
+        self.nodes = {}
+        self.children = {}
+        for node in nodes:
+            self.nodes[node['id']] = node
+            self.children.setdefault(node['parent'], []).append(node['id'])
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def descendant_ids(self, node_id, include_self=True):
+        """Ids of ``node_id`` and everything below it"""
+        if node_id not in self.nodes:
+            return []
+        result = [node_id] if include_self else []
+        stack = list(self.children.get(node_id, ()))
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(self.children.get(node, ()))
+        return result
+
+    def ancestors(self, node_id):
+        """Nodes from the root down to ``node_id``"""
+        path = []
+        node = self.nodes.get(node_id)
+        while node is not None and len(path) <= len(self.nodes):
+            path.append(node)
+            node = self.nodes.get(node['parent'])
+        path.reverse()
+        return path
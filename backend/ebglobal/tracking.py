@@ -0,0 +1,43 @@
+"""
+Change tracking for model saves
+
+Models mixing in ``TrackedFieldsMixin`` remember the values of their
+``TRACKED_FIELDS`` as loaded from the database, so post_save handlers can
+tell what a save actually changed (e.g. only invalidate caches on a status
+transition). The remembered values are reset once ``save()`` returns, after
+every handler has run.
+"""
+
+
+class TrackedFieldsMixin:
+    """Loaded values of ``TRACKED_FIELDS`` (attnames) and ``field_changed``"""
+
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    def loaded_value(self, attname, default=None):
+        """``attname`` as loaded from the database (``default`` for new or deferred values)"""
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def field_loaded(self, attname):
+        """Whether ``attname`` was loaded from the database (False for new or deferred values)"""
+        return attname in getattr(self, '_loaded_values', {})
+
+    def field_changed(self, attname):
+        """Whether ``attname`` differs from the value loaded from the database"""
+        loaded = getattr(self, '_loaded_values', {})
+        if attname not in loaded:
+            return True
+        return loaded[attname] != getattr(self, attname)
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payments_pa_updated_e44ec3_idx'),
+        ),
+    ]
@@ -70,6 +70,8 @@ class Payment(models.Model):
             models.Index(fields=['payment_id']),
             models.Index(fields=['booking', 'status']),
             models.Index(fields=['payer', 'created_at']),
+            # Rollup watermark scans (analytics.rollups.changed_days)
+            models.Index(fields=['updated_at']),
         ]
     
     def __str__(self):
@@ -0,0 +1,192 @@
+"""
+Compact availability index for services
+
+Each day is divided into 16 fixed 90-minute slots (00:00, 01:30, ... 22:30).
+``ServiceAvailabilityDay.free_slots`` holds one bit per slot that has at least
+one free ``AvailabilitySlot`` starting in it, so "which services are free on
+day D / in range R / at time T" is answered from the index with bitwise tests
+instead of joining the slot table. Days and slots are those of the service's
+partner, in ``PartnerProfile.time_zone`` (the platform time zone when blank),
+the same clock its slots are generated from, so a search for "Monday 09:00"
+means 09:00 where the service is offered.
+"""
+
+import datetime
+import zoneinfo
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+SLOT_MINUTES = 90
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def partner_zone(name):
+    """``name`` as a tzinfo; blank or unknown names fall back to the platform time zone"""
+    if name:
+        try:
+            return zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_current_timezone()
+
+
+def service_zones(services):
+    """``{service_id: tzinfo}`` for a Service queryset, read in one query"""
+    rows = services.values_list('pk', 'partner__partner_profile__time_zone')
+    return {service_id: partner_zone(name) for service_id, name in rows}
+
+
+def slot_index(moment, tz=None):
+    """Index (0-15) of the daily slot ``moment`` falls in"""
+    local = timezone.localtime(moment, tz) if timezone.is_aware(moment) else moment
+    return (local.hour * 60 + local.minute) // SLOT_MINUTES
+
+
+def slot_bit(moment, tz=None):
+    return 1 << slot_index(moment, tz)
+
+
+def slot_time(index):
+    """Start time of daily slot ``index``"""
+    minutes = index * SLOT_MINUTES
+    return datetime.time(minutes // 60, minutes % 60)
+
+
+def slot_indexes(mask):
+    return [index for index in range(SLOTS_PER_DAY) if mask & (1 << index)]
+
+
+def local_date(moment, tz=None):
+    return timezone.localtime(moment, tz).date() if timezone.is_aware(moment) else moment.date()
+
+
+def day_bounds(start_date, end_date=None, tz=None):
+    """Aware ``[start, end)`` datetimes covering ``start_date`` through ``end_date`` in ``tz``"""
+    end_date = end_date or start_date
+    tz = tz or timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min), tz)
+    end = timezone.make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min), tz)
+    return start, end
+
+
+def refresh_availability_days(service_id, start_times):
+    """
+    Recompute the bitmap rows of ``service_id`` for the days containing
+    ``start_times`` once the current transaction commits, so a booking never
+    waits on the index lock.
+    """
+    start_times = set(start_times)
+    transaction.on_commit(lambda: refresh_availability_index({service_id: start_times}))
+
+
+def refresh_availability_index(touched, batch_size=1000):
+    """
+    Recompute the bitmap rows of the days containing ``touched``
+    (``{service_id: start_times}``) with one slot scan, one delete and one
+    upsert per batch of services.
+
+    The batch's service rows are locked before the slots are read, so two
+    refreshes of the same service run one after the other and the last one
+    sees every committed slot change; nothing writes a mask computed from a
+    scan that another booking has since invalidated. Request paths go through
+    ``refresh_availability_days``, which runs this after their commit so the
+    lock is never held alongside a booking's own row locks.
+    """
+    from .models import AvailabilitySlot, Service, ServiceAvailabilityDay
+
+    touched = {service_id: set(start_times) for service_id, start_times in touched.items() if start_times}
+    service_ids = sorted(touched)
+    for offset in range(0, len(service_ids), batch_size):
+        batch = service_ids[offset:offset + batch_size]
+
+        # No savepoint when nested in a caller's transaction (e.g. slot generation)
+        with transaction.atomic(savepoint=False):
+            zones = service_zones(
+                Service.objects.select_for_update(of=('self',)).filter(pk__in=batch).order_by('pk')
+            )
+            days = {
+                service_id: {local_date(moment, zones.get(service_id)) for moment in touched[service_id]}
+                for service_id in batch
+            }
+            bounds = [
+                day_bounds(min(days[service_id]), max(days[service_id]), zones.get(service_id))
+                for service_id in batch
+            ]
+            start, end = min(bound[0] for bound in bounds), max(bound[1] for bound in bounds)
+
+            masks = defaultdict(int)
+            free = AvailabilitySlot.objects.filter(
+                service_id__in=batch,
+                start_time__gte=start,
+                start_time__lt=end,
+                is_available=True,
+                is_blocked=False,
+            ).values_list('service_id', 'start_time')
+            for service_id, start_time in free:
+                tz = zones.get(service_id)
+                day = local_date(start_time, tz)
+                if day in days[service_id]:
+                    masks[(service_id, day)] |= slot_bit(start_time, tz)
+
+            present = defaultdict(set)
+            for service_id, day in masks:
+                present[service_id].add(day)
+            empty = Q()
+            for service_id in batch:
+                gone = days[service_id] - present[service_id]
+                if gone:
+                    empty |= Q(service_id=service_id, date__in=gone)
+
+            if empty:
+                ServiceAvailabilityDay.objects.filter(empty).delete()
+            if masks:
+                ServiceAvailabilityDay.objects.bulk_create(
+                    [
+                        ServiceAvailabilityDay(service_id=service_id, date=day, free_slots=mask)
+                        for (service_id, day), mask in masks.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['service', 'date'],
+                    update_fields=['free_slots', 'updated_at'],
+                )
+
+
+def refresh_for_slots(slots):
+    """Refresh the index for every (service, day) touched by ``slots``"""
+    touched = defaultdict(set)
+    for slot in slots:
+        touched[slot.service_id].add(slot.start_time)
+    refresh_availability_index(touched)
+
+
+def available_service_ids(date_from, date_to=None, time=None):
+    """
+    Subquery of service ids with a free slot between ``date_from`` and
+    ``date_to`` (inclusive), optionally in the daily slot containing ``time``;
+    dates and times are read on each service's own clock.
+    """
+    from .models import ServiceAvailabilityDay
+
+    days = ServiceAvailabilityDay.objects.filter(date__gte=date_from, date__lte=date_to or date_from)
+    if time is not None:
+        bit = 1 << ((time.hour * 60 + time.minute) // SLOT_MINUTES)
+        days = days.alias(matching=F('free_slots').bitand(bit)).filter(matching__gt=0)
+    else:
+        days = days.filter(free_slots__gt=0)
+    return days.values('service_id')
+
+
+def availability_summary(service_id, date_from, date_to):
+    """``[{date, free_slots}]`` for the days of a service that have free slots"""
+    from .models import ServiceAvailabilityDay
+
+    days = ServiceAvailabilityDay.objects.filter(
+        service_id=service_id, date__gte=date_from, date__lte=date_to, free_slots__gt=0
+    ).order_by('date').values_list('date', 'free_slots')
+    return [
+        {'date': day, 'free_slots': [slot_time(index).strftime('%H:%M') for index in slot_indexes(mask)]}
+        for day, mask in days
+    ]
@@ -0,0 +1,140 @@
+"""
+Category hierarchy and category-level aggregates for the service catalogue
+
+The hierarchy is materialized in ``ServiceCategoryClosure`` (maintained on
+``ServiceCategory.save``) for SQL subtree filters, and mirrored in a per-process
+``CategoryTree`` snapshot for breadcrumbs and descendant lookups without queries.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from ebglobal.snapshots import Tree, VersionedSnapshot
+
+CATEGORY_COUNTS_CACHE_KEY = 'services:category_service_counts'
+CATEGORY_COUNTS_TIMEOUT = 60 * 15
+
+CATEGORY_TREE_VERSION_KEY = 'services:category_tree_version'
+
+
+# ---------------------------------------------------------------------------
+# Closure table maintenance
+# ---------------------------------------------------------------------------
+
+def move_category_subtree(category, adding=False):
+    """Re-link ``category`` and its descendants under ``category.parent`` in the closure table"""
+    from .models import ServiceCategoryClosure
+
+    if adding:
+        subtree = [(category.pk, 0)]
+    else:
+        subtree = list(
+            ServiceCategoryClosure.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth')
+        ) or [(category.pk, 0)]
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        # Detach the subtree from its old ancestors, keep its internal links
+        ServiceCategoryClosure.objects.filter(descendant_id__in=subtree_ids).exclude(
+            ancestor_id__in=subtree_ids
+        ).delete()
+
+    ancestors = []
+    if category.parent_id:
+        ancestors = list(
+            ServiceCategoryClosure.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+        )
+    links = [
+        ServiceCategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+        for ancestor_id, up in ancestors
+        for descendant_id, down in subtree
+    ]
+    if adding or not ServiceCategoryClosure.objects.filter(ancestor_id=category.pk, descendant_id=category.pk).exists():
+        links.append(ServiceCategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0))
+    ServiceCategoryClosure.objects.bulk_create(links)
+
+
+def subtree_filter(category_id, field='category'):
+    """``Q`` matching rows whose ``field`` is ``category_id`` or any of its subcategories"""
+    from .models import ServiceCategoryClosure
+
+    descendants = ServiceCategoryClosure.objects.filter(ancestor_id=category_id).values('descendant_id')
+    return Q(**{f'{field}__in': descendants})
+
+
+# ---------------------------------------------------------------------------
+# In-process tree snapshot
+# ---------------------------------------------------------------------------
+
+class CategoryTree(Tree):
+    """Immutable snapshot of the whole category hierarchy"""
+
+    def __init__(self, rows, version=None):
+        super().__init__((
+            {'id': category_id, 'parent': parent_id, 'name': name, 'is_active': is_active}
+            for category_id, parent_id, name, is_active in rows
+        ), version=version)
+
+    def breadcrumb(self, category_id):
+        """Nodes from the root down to ``category_id``"""
+        return self.ancestors(category_id)
+
+
+def _load_tree(version):
+    from .models import ServiceCategory
+
+    rows = ServiceCategory.objects.order_by('sort_order', 'name').values_list('id', 'parent_id', 'name', 'is_active')
+    return CategoryTree(rows, version=version)
+
+
+_snapshot = VersionedSnapshot(CATEGORY_TREE_VERSION_KEY, _load_tree)
+
+
+def get_category_tree():
+    """
+    Return this process's category tree, reloading it (one query) when another
+    process or request bumped the shared version.
+    """
+    return _snapshot.get()
+
+
+def invalidate_category_tree():
+    _snapshot.invalidate()
+
+
+def get_descendant_ids(category_id, include_self=True):
+    return get_category_tree().descendant_ids(category_id, include_self=include_self)
+
+
+def get_breadcrumb(category_id):
+    return get_category_tree().breadcrumb(category_id)
+
+
+# ---------------------------------------------------------------------------
+# Service counts
+# ---------------------------------------------------------------------------
+
+def compute_category_service_counts():
+    """
+    Active service counts per category including all subcategories, in one
+    grouped query over the closure table.
+    """
+    from .models import ServiceCategoryClosure
+
+    rows = ServiceCategoryClosure.objects.order_by().values_list('ancestor_id').annotate(
+        total=Count('descendant__services', filter=Q(descendant__services__status='ACTIVE'))
+    )
+    return dict(rows)
+
+
+def get_category_service_counts():
+    """Cached ``{category_id: active service count including subcategories}``"""
+    counts = cache.get(CATEGORY_COUNTS_CACHE_KEY)
+    if counts is None:
+        counts = compute_category_service_counts()
+        cache.set(CATEGORY_COUNTS_CACHE_KEY, counts, CATEGORY_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_category_service_counts():
+    """Drop the cached counts once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(CATEGORY_COUNTS_CACHE_KEY))
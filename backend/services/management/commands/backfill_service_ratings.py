@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from services.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild service rating summaries from existing booking ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per statement')
+        parser.add_argument('--service', type=int, action='append', dest='services', help='Only this service (repeatable)')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Aggregating ratings...')
+
+        rated = recompute_ratings(service_ids=options['services'], batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt rating summaries for {rated} services')
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from services.slot_generation import DEFAULT_HORIZON_DAYS, generate_slots
+
+
+class Command(BaseCommand):
+    help = 'Generate 90-minute availability slots from partner business hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partner', type=int, action='append', dest='partners', help='Partner user id (repeatable); all partners by default')
+        parser.add_argument('--days', type=int, default=DEFAULT_HORIZON_DAYS, help='Horizon in days starting today')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Partners per pass and slots per insert')
+
+    def handle(self, *args, **options):
+        scope = f"{len(options['partners'])} partner(s)" if options['partners'] else 'all partners'
+        self.stdout.write(f"Generating slots for {scope} over {options['days']} days...")
+
+        created = generate_slots(
+            partner_ids=options['partners'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {created} availability slots')
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from services.ranking import RANKING_DEPTH, rank_services
+
+
+class Command(BaseCommand):
+    help = 'Score services by recent demand, rating and completion and store the top services per scope'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=RANKING_DEPTH, help='Services kept per category/location')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Ranking services...')
+
+        written = rank_services(depth=options['depth'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored {written} ranking rows')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from services.search import rebuild_index, use_postgres
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Services updated per statement')
+
+    def handle(self, *args, **options):
+        backend = 'PostgreSQL tsvector' if use_postgres() else 'in-process inverted index'
+        self.stdout.write(f'Rebuilding search index ({backend})...')
+
+        indexed = rebuild_index(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} services')
+        )
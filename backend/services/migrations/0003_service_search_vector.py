@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:08
+
+import django.contrib.postgres.search
+import services.search
+from django.db import migrations
+
+
+# services.search.SEARCH_DOCUMENT as of this migration
+SEARCH_DOCUMENT = [
+    ('name', 'A', ('portuguese', 'english')),
+    ('name_pt', 'A', ('portuguese',)),
+    ('name_en', 'A', ('english',)),
+    ('description', 'B', ('portuguese', 'english')),
+    ('description_pt', 'B', ('portuguese',)),
+    ('description_en', 'B', ('english',)),
+]
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Initial tsvector backfill (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    vector = None
+    for field, weight, languages in SEARCH_DOCUMENT:
+        for language in languages:
+            part = SearchVector(field, weight=weight, config=language)
+            vector = part if vector is None else vector + part
+    Service = apps.get_model('services', 'Service')
+    Service.objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_alter_service_primary_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=services.search.SearchVectorIndex(fields=['search_vector'], name='service_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
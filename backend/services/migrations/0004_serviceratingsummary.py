@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_service_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('histogram', models.JSONField(blank=True, default=dict, help_text='Number of ratings per star value')),
+                ('recent_reviews', models.JSONField(blank=True, default=list, help_text='Most recent reviews, newest first')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rating_summary', to='services.service')),
+            ],
+            options={
+                'verbose_name': 'Service Rating Summary',
+                'verbose_name_plural': 'Service Rating Summaries',
+            },
+        ),
+    ]
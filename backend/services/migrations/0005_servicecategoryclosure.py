@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    """Populate the closure table for existing categories"""
+    ServiceCategory = apps.get_model('services', 'ServiceCategory')
+    ServiceCategoryClosure = apps.get_model('services', 'ServiceCategoryClosure')
+
+    parents = dict(ServiceCategory.objects.values_list('id', 'parent_id'))
+    links = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            links.append(ServiceCategoryClosure(ancestor_id=node, descendant_id=category_id, depth=depth))
+            node, depth = parents.get(node), depth + 1
+    ServiceCategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_serviceratingsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceCategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(help_text='Number of levels between ancestor and descendant (0 for itself)')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='services.servicecategory')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='services.servicecategory')),
+            ],
+            options={
+                'verbose_name': 'Service Category Closure',
+                'verbose_name_plural': 'Service Category Closures',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='services_se_descend_45428e_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:14
+
+import django.db.models.deletion
+import zoneinfo
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.utils import timezone
+
+SLOT_MINUTES = 90
+
+
+def partner_zone(name):
+    if name:
+        try:
+            return zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_current_timezone()
+
+
+def build_availability_index(apps, schema_editor):
+    """Populate the per-day slot bitmaps from existing free slots, on each partner's clock"""
+    AvailabilitySlot = apps.get_model('services', 'AvailabilitySlot')
+    Service = apps.get_model('services', 'Service')
+    ServiceAvailabilityDay = apps.get_model('services', 'ServiceAvailabilityDay')
+
+    zones = {
+        service_id: partner_zone(name)
+        for service_id, name in Service.objects.values_list('pk', 'partner__partner_profile__time_zone').iterator()
+    }
+    masks = defaultdict(int)
+    free = AvailabilitySlot.objects.filter(is_available=True, is_blocked=False).values_list('service_id', 'start_time')
+    for service_id, start_time in free.iterator(chunk_size=2000):
+        local = timezone.localtime(start_time, zones[service_id])
+        masks[(service_id, local.date())] |= 1 << ((local.hour * 60 + local.minute) // SLOT_MINUTES)
+    ServiceAvailabilityDay.objects.bulk_create(
+        [ServiceAvailabilityDay(service_id=service_id, date=day, free_slots=mask) for (service_id, day), mask in masks.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_servicecategoryclosure'),
+        ('accounts', '0009_partnerprofile_time_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceAvailabilityDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('free_slots', models.PositiveIntegerField(default=0, help_text='Bitmask of the 16 daily 90-minute slots that are free')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_days', to='services.service')),
+            ],
+            options={
+                'verbose_name': 'Service Availability Day',
+                'verbose_name_plural': 'Service Availability Days',
+                'indexes': [models.Index(fields=['date', 'service'], name='services_se_date_a59131_idx')],
+                'unique_together': {('service', 'date')},
+            },
+        ),
+        migrations.RunPython(build_availability_index, migrations.RunPython.noop),
+    ]
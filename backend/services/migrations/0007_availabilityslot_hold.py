@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_serviceavailabilityday'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilityslot',
+            name='held_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_slots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='availabilityslot',
+            name='held_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
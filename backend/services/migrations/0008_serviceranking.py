@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_availabilityslot_hold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('GLOBAL', 'Global'), ('CATEGORY', 'Category'), ('LOCATION', 'Location')], max_length=10)),
+                ('scope_id', models.PositiveBigIntegerField(default=0, help_text='Category or location id (0 for global)')),
+                ('rank', models.PositiveSmallIntegerField(help_text='1 is the most popular')),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='services.service')),
+            ],
+            options={
+                'verbose_name': 'Service Ranking',
+                'verbose_name_plural': 'Service Rankings',
+                'ordering': ['scope', 'scope_id', 'rank'],
+                'unique_together': {('scope', 'scope_id', 'rank')},
+            },
+        ),
+    ]
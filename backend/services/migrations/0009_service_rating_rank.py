@@ -0,0 +1,60 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:35
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+# services.ratings as of this migration
+RATING_PRIOR_MEAN = Decimal('3.5')
+RATING_PRIOR_WEIGHT = 5
+
+
+def backfill_rating_rank(apps, schema_editor):
+    """
+    Fill rating_rank from the existing rating summaries and store
+    average_rating with the single displayed rounding (one decimal, half up)
+    """
+    Service = apps.get_model('services', 'Service')
+    ServiceRatingSummary = apps.get_model('services', 'ServiceRatingSummary')
+
+    totals = ServiceRatingSummary.objects.aggregate(rating_sum=Sum('rating_sum'), rating_count=Sum('rating_count'))
+    prior_mean = RATING_PRIOR_MEAN
+    if totals['rating_count']:
+        prior_mean = (Decimal(totals['rating_sum']) / totals['rating_count']).quantize(Decimal('0.001'))
+
+    services = []
+    for service_id, rating_sum, rating_count in ServiceRatingSummary.objects.filter(
+        rating_count__gt=0
+    ).values_list('service_id', 'rating_sum', 'rating_count').iterator(chunk_size=2000):
+        smoothed = (Decimal(rating_sum) + prior_mean * RATING_PRIOR_WEIGHT) / (rating_count + RATING_PRIOR_WEIGHT)
+        services.append(Service(
+            pk=service_id,
+            average_rating=(Decimal(rating_sum) / rating_count).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP),
+            rating_rank=smoothed.quantize(Decimal('0.001'), rounding=ROUND_HALF_UP),
+        ))
+    Service.objects.bulk_update(services, ['average_rating', 'rating_rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_serviceranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_rank',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Bayesian-smoothed rating used for sorting (0 when unrated), maintained by services.ratings', max_digits=4),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', 'rating_rank'], name='services_se_status_878fe2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', 'average_rating'], name='services_se_status_d4efb4_idx'),
+        ),
+        migrations.RunPython(backfill_rating_rank, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:16
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_slots(apps, schema_editor):
+    """Keep one slot per (service, start_time), preferring a booked one, and move bookings onto it"""
+    AvailabilitySlot = apps.get_model('services', 'AvailabilitySlot')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    duplicates = AvailabilitySlot.objects.values('service_id', 'start_time').annotate(
+        copies=Count('id')
+    ).filter(copies__gt=1).values_list('service_id', 'start_time')
+    for service_id, start_time in duplicates.iterator():
+        slot_ids = list(
+            AvailabilitySlot.objects.filter(service_id=service_id, start_time=start_time).order_by('pk').values_list('pk', flat=True)
+        )
+        booked = Booking.objects.filter(availability_slot_id__in=slot_ids).order_by('availability_slot_id')
+        keep = booked.values_list('availability_slot_id', flat=True).first() or slot_ids[0]
+        drop = [slot_id for slot_id in slot_ids if slot_id != keep]
+        Booking.objects.filter(availability_slot_id__in=drop).update(availability_slot_id=keep)
+        AvailabilitySlot.objects.filter(pk__in=drop).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_service_rating_rank'),
+        ('bookings', '0003_bookingschedulechange'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='availabilityslot',
+            constraint=models.UniqueConstraint(fields=('service', 'start_time'), name='unique_service_slot_start'),
+        ),
+        migrations.RemoveIndex(
+            model_name='availabilityslot',
+            name='services_av_service_b2f0ce_idx',
+        ),
+    ]
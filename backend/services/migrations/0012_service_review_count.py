@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+def backfill_review_count(apps, schema_editor):
+    """Copy each rating summary's count onto its service"""
+    Service = apps.get_model('services', 'Service')
+    ServiceRatingSummary = apps.get_model('services', 'ServiceRatingSummary')
+
+    services = [
+        Service(pk=service_id, review_count=rating_count)
+        for service_id, rating_count in ServiceRatingSummary.objects.filter(
+            rating_count__gt=0
+        ).values_list('service_id', 'rating_count').iterator(chunk_size=2000)
+    ]
+    Service.objects.bulk_update(services, ['review_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0011_availabilityslot_unique_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of counted client ratings, maintained by services.ratings'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', 'review_count'], name='services_se_status_dfad56_idx'),
+        ),
+        migrations.RunPython(backfill_review_count, migrations.RunPython.noop),
+    ]
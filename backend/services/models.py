@@ -1,7 +1,11 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import User, Location
+from ebglobal.tracking import TrackedFieldsMixin
+from .search import SearchVectorIndex
 
 
 class ServiceCategory(models.Model):
@@ -34,15 +38,66 @@ class ServiceCategory(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded parent so save() knows when the closure table must change
+        if 'parent_id' in field_names:
+            instance._loaded_parent_id = values[field_names.index('parent_id')]
+        return instance
+    
+    def clean(self):
+        """Prevent a category from being moved under itself or one of its descendants"""
+        from django.core.exceptions import ValidationError
+        if self.pk and self.parent_id:
+            if ServiceCategoryClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+                raise ValidationError('A category cannot be nested under itself or its subcategories')
+    
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+        from .categories import move_category_subtree
+        
+        adding = self._state.adding
+        parent_changed = adding or getattr(self, '_loaded_parent_id', None) != self.parent_id
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if parent_changed:
+                move_category_subtree(self, adding=adding)
+        self._loaded_parent_id = self.parent_id
+    
     @property
     def full_name(self):
         """Return the full category name with hierarchy"""
+        if self.pk:
+            from .categories import get_category_tree
+            breadcrumb = get_category_tree().breadcrumb(self.pk)
+            if breadcrumb:
+                return ' > '.join(node['name'] for node in breadcrumb)
         if self.parent:
             return f"{self.parent.full_name} > {self.name}"
         return self.name
 
 
-class Service(models.Model):
+class ServiceCategoryClosure(models.Model):
+    """Closure table of the category hierarchy: one row per (ancestor, descendant) pair"""
+    
+    ancestor = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField(help_text=_('Number of levels between ancestor and descendant (0 for itself)'))
+    
+    class Meta:
+        verbose_name = _('Service Category Closure')
+        verbose_name_plural = _('Service Category Closures')
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
+class Service(TrackedFieldsMixin, models.Model):
     """Individual service offered by partners"""
     
     class ServiceStatus(models.TextChoices):
@@ -136,6 +191,19 @@ class Service(models.Model):
         blank=True,
         validators=[MinValueValidator(1), MaxValueValidator(5)]
     )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Number of counted client ratings, maintained by services.ratings')
+    )
+    rating_rank = models.DecimalField(
+        max_digits=4,
+        decimal_places=3,
+        default=0,
+        help_text=_('Bayesian-smoothed rating used for sorting (0 when unrated), maintained by services.ratings')
+    )
+    
+    # Full-text search document (PostgreSQL only, maintained by services.search)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -144,10 +212,19 @@ class Service(models.Model):
         verbose_name = _('Service')
         verbose_name_plural = _('Services')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'rating_rank']),
+            models.Index(fields=['status', 'average_rating']),
+            models.Index(fields=['status', 'review_count']),
+            SearchVectorIndex(fields=['search_vector'], name='service_search_vector_gin'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.partner.get_full_name()}"
     
+    # Loaded values remembered so signal handlers can tell what changed on save
+    TRACKED_FIELDS = ('status', 'category_id')
+    
     @property
     def is_approved(self):
         return self.status == self.ServiceStatus.ACTIVE
@@ -160,6 +237,58 @@ class Service(models.Model):
         return (self.completed_bookings / self.total_bookings) * 100
 
 
+class ServiceRatingSummary(models.Model):
+    """Denormalized client rating aggregate for a service, maintained on each rating write"""
+    
+    RECENT_REVIEWS_LIMIT = 5
+    
+    service = models.OneToOneField(Service, on_delete=models.CASCADE, related_name='rating_summary')
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    histogram = models.JSONField(default=dict, blank=True, help_text=_('Number of ratings per star value'))
+    recent_reviews = models.JSONField(default=list, blank=True, help_text=_('Most recent reviews, newest first'))
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Service Rating Summary')
+        verbose_name_plural = _('Service Rating Summaries')
+    
+    def __str__(self):
+        return f"{self.service.name} - {self.average} ({self.rating_count})"
+    
+    @property
+    def average(self):
+        """Average client rating, rounded like ``Service.average_rating``"""
+        from .ratings import average_rating
+        
+        if not self.rating_count:
+            return 0.0
+        return float(average_rating(self.rating_sum, self.rating_count))
+    
+    def apply(self, booking, previous_rating=None):
+        """Fold a (possibly revised) client rating into the aggregate"""
+        histogram = {str(star): self.histogram.get(str(star), 0) for star in range(1, 6)}
+        if previous_rating:
+            self.rating_sum -= previous_rating
+            self.rating_count -= 1
+            histogram[str(previous_rating)] = max(histogram[str(previous_rating)] - 1, 0)
+        self.rating_sum += booking.client_rating
+        self.rating_count += 1
+        histogram[str(booking.client_rating)] += 1
+        self.histogram = histogram
+        
+        reviews = [review for review in self.recent_reviews if review.get('booking_id') != booking.pk]
+        reviews.insert(0, {
+            'booking_id': booking.pk,
+            'rating': booking.client_rating,
+            'comment': booking.client_review,
+            'client_name': booking.client.get_full_name(),
+            'date': booking.updated_at.isoformat() if booking.updated_at else None,
+        })
+        self.recent_reviews = reviews[:self.RECENT_REVIEWS_LIMIT]
+
+
 class ServiceAttribute(models.Model):
     """Custom attributes for services (e.g., vehicle type for transport)"""
     
@@ -224,7 +353,7 @@ class ServiceAttributeValue(models.Model):
         return f"{self.service.name} - {self.attribute.name}: {self.value}"
 
 
-class AvailabilitySlot(models.Model):
+class AvailabilitySlot(TrackedFieldsMixin, models.Model):
     """90-minute availability slots for services"""
     
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='availability_slots')
@@ -238,6 +367,16 @@ class AvailabilitySlot(models.Model):
     is_blocked = models.BooleanField(default=False)
     block_reason = models.CharField(max_length=200, blank=True)
     
+    # Short checkout hold; expires on its own once held_until has passed
+    held_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='held_slots'
+    )
+    held_until = models.DateTimeField(null=True, blank=True)
+    
     # Pricing override for this slot
     price_override = models.DecimalField(
         max_digits=10, 
@@ -257,12 +396,18 @@ class AvailabilitySlot(models.Model):
         ordering = ['start_time']
         indexes = [
             models.Index(fields=['start_time', 'end_time']),
-            models.Index(fields=['service', 'start_time']),
+        ]
+        constraints = [
+            # Also the (service, start_time) index; lets slot generation insert with ignore_conflicts
+            models.UniqueConstraint(fields=['service', 'start_time'], name='unique_service_slot_start'),
         ]
     
     def __str__(self):
         return f"{self.service.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+    # A moved slot also refreshes its old day in the availability index
+    TRACKED_FIELDS = ('start_time',)
+    
     def clean(self):
         """Validate slot duration is exactly 90 minutes"""
         from django.core.exceptions import ValidationError
@@ -286,3 +431,55 @@ class AvailabilitySlot(models.Model):
     def effective_price(self):
         """Return the effective price for this slot"""
         return self.price_override if self.price_override else self.service.base_price
+    
+    def is_held_for_other(self, user, now=None):
+        """True while another user's checkout hold is active"""
+        now = now or timezone.now()
+        return bool(self.held_until and self.held_until > now and self.held_by_id != getattr(user, 'pk', None))
+
+
+class ServiceAvailabilityDay(models.Model):
+    """Per-service, per-day bitmap of free 90-minute slots (bit N = slot starting at N * 90 minutes)"""
+    
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='availability_days')
+    date = models.DateField()
+    free_slots = models.PositiveIntegerField(default=0, help_text=_('Bitmask of the 16 daily 90-minute slots that are free'))
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Service Availability Day')
+        verbose_name_plural = _('Service Availability Days')
+        unique_together = ['service', 'date']
+        indexes = [
+            models.Index(fields=['date', 'service']),
+        ]
+    
+    def __str__(self):
+        return f"{self.service_id} - {self.date}: {self.free_slots:016b}"
+
+
+class ServiceRanking(models.Model):
+    """Precomputed top services per scope (overall, category subtree, location), maintained by services.ranking"""
+    
+    class Scope(models.TextChoices):
+        GLOBAL = 'GLOBAL', _('Global')
+        CATEGORY = 'CATEGORY', _('Category')
+        LOCATION = 'LOCATION', _('Location')
+    
+    scope = models.CharField(max_length=10, choices=Scope.choices)
+    scope_id = models.PositiveBigIntegerField(default=0, help_text=_('Category or location id (0 for global)'))
+    rank = models.PositiveSmallIntegerField(help_text=_('1 is the most popular'))
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='rankings')
+    score = models.FloatField()
+    
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = _('Service Ranking')
+        verbose_name_plural = _('Service Rankings')
+        ordering = ['scope', 'scope_id', 'rank']
+        unique_together = ['scope', 'scope_id', 'rank']
+    
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} #{self.rank} - {self.service_id} ({self.score:.3f})"
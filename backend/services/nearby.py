@@ -0,0 +1,69 @@
+"""
+Proximity search for services
+
+A service is located at its primary location and at each of its service
+areas; its distance is the nearest of those. Candidate locations come from
+the geohash prefix index on ``Location`` (see ``accounts.geo``), so a lookup
+is a handful of index range scans followed by two lookups on the service
+tables, never a scan over every service.
+
+There is deliberately no PostGIS path: a geometry column would need GDAL,
+GEOS and SpatiaLite in every development and test environment, and the
+geohash index already bounds each lookup the same way on SQLite and
+PostgreSQL.
+"""
+
+from accounts.geo import locations_within
+
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 1000
+# First k-nearest probe radius; multiplied until enough services are found
+KNN_START_RADIUS_KM = 5
+KNN_GROWTH = 4
+
+
+def services_within(latitude, longitude, radius_km, queryset):
+    """``{service_id: distance_km}`` for services in ``queryset`` within ``radius_km``"""
+    from .models import Service
+
+    locations = locations_within(latitude, longitude, radius_km)
+    if not locations:
+        return {}
+
+    distances = {}
+
+    def keep_nearest(service_id, location_id):
+        distance = locations[location_id]
+        if service_id not in distances or distance < distances[service_id]:
+            distances[service_id] = distance
+
+    for service_id, location_id in Service.objects.filter(
+        primary_location_id__in=locations
+    ).values_list('id', 'primary_location_id'):
+        keep_nearest(service_id, location_id)
+    for service_id, location_id in Service.service_areas.through.objects.filter(
+        location_id__in=locations
+    ).values_list('service_id', 'location_id'):
+        keep_nearest(service_id, location_id)
+    if not distances:
+        return {}
+
+    allowed = set(queryset.filter(pk__in=list(distances)).values_list('pk', flat=True))
+    return {service_id: distance for service_id, distance in distances.items() if service_id in allowed}
+
+
+def nearest_services(latitude, longitude, limit, queryset, max_radius_km=MAX_RADIUS_KM):
+    """
+    The ``limit`` nearest services as ``[(service_id, distance_km)]``. The
+    search radius grows until enough services are found; everything outside
+    the final radius is farther than everything inside it, so the result is
+    exact up to ``max_radius_km``.
+    """
+    radius = KNN_START_RADIUS_KM
+    while True:
+        radius = min(radius, max_radius_km)
+        distances = services_within(latitude, longitude, radius, queryset)
+        if len(distances) >= limit or radius >= max_radius_km:
+            break
+        radius *= KNN_GROWTH
+    return sorted(distances.items(), key=lambda item: (item[1], item[0]))[:limit]
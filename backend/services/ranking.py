@@ -0,0 +1,239 @@
+"""
+Popularity ranking for the homepage and category pages
+
+``rank_services`` scores every active service from its recent activity and
+stores the top ``RANKING_DEPTH`` per scope in ``ServiceRanking``:
+
+* bookings and views over the last ``WINDOW_DAYS``, each weighted by
+  ``0.5 ** (age / HALF_LIFE_DAYS)`` so recent demand counts most;
+* completion rate of the finished bookings in the same window;
+* the Bayesian-smoothed client rating (``Service.rating_rank``), re-smoothed
+  against the current platform mean at the start of each run so the prior is
+  the same one ``services.ratings`` applies on every rating write.
+
+Scopes are the whole catalogue, every category (a service also counts for
+the ancestors of its category) and every location (a service also counts
+for the province and country above its primary location). Reading the top K
+of a scope is then an index range scan on ``(scope, scope_id, rank)``.
+
+A category narrowed to a location has no scope of its own. Every scope is
+cut at ``RANKING_DEPTH``, so ``top_services`` merges the category's entries
+located there with the location's entries in the category (scores come from
+the same run, so the merge is in score order) and tops the list up from
+``unranked_services`` when both lists together come up short.
+"""
+
+import datetime
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ebglobal.cache import invalidate_tags
+
+WINDOW_DAYS = 90
+HALF_LIFE_DAYS = 14
+RANKING_DEPTH = 50
+
+WEIGHTS = {
+    'bookings': 0.5,
+    'rating': 0.25,
+    'views': 0.15,
+    'completion': 0.1,
+}
+
+
+def decay(age_days):
+    return 0.5 ** (max(age_days, 0) / HALF_LIFE_DAYS)
+
+
+def _decayed_bookings(since, today):
+    """``{service_id: decayed booking count}`` and ``{service_id: (completed, finished)}`` of active services"""
+    from bookings.models import Booking
+
+    rows = Booking.objects.filter(service__status='ACTIVE', created_at__gte=since).order_by().annotate(
+        day=TruncDate('created_at')
+    ).values('service_id', 'day').annotate(
+        bookings=Count('id'),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+        finished=Count('id', filter=Q(status__in=('COMPLETED', 'CANCELLED'))),
+    )
+    demand = defaultdict(float)
+    outcomes = defaultdict(lambda: [0, 0])
+    for row in rows:
+        demand[row['service_id']] += row['bookings'] * decay((today - row['day']).days)
+        outcomes[row['service_id']][0] += row['completed']
+        outcomes[row['service_id']][1] += row['finished']
+    return demand, outcomes
+
+
+def _decayed_views(since, today):
+    from analytics.models import ServicePerformance
+
+    rows = ServicePerformance.objects.filter(
+        service__status='ACTIVE', period_end__gte=since.date(), views_count__gt=0
+    ).values_list('service_id', 'period_end', 'views_count')
+    views = defaultdict(float)
+    for service_id, period_end, count in rows:
+        views[service_id] += count * decay((today - period_end).days)
+    return views
+
+
+def score_services(now=None):
+    """``{service_id: score}`` for every active service (scores are in ``[0, 1]``)"""
+    from .models import Service
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    since = now - datetime.timedelta(days=WINDOW_DAYS)
+    # Service.rating_rank is already Bayesian-smoothed (see services.ratings)
+    ratings = {
+        service_id: float(rank) / 5
+        for service_id, rank in Service.objects.filter(status='ACTIVE').values_list('id', 'rating_rank')
+    }
+    if not ratings:
+        return {}
+
+    # Aggregated over a join on the active services rather than an IN list of their ids
+    demand, outcomes = _decayed_bookings(since, today)
+    views = _decayed_views(since, today)
+
+    # Log-scale the open-ended counters, then normalize by the busiest service
+    top_demand = max((math.log1p(value) for value in demand.values()), default=0) or 1
+    top_views = max((math.log1p(value) for value in views.values()), default=0) or 1
+
+    scores = {}
+    for service_id in ratings:
+        completed, finished = outcomes.get(service_id, (0, 0))
+        scores[service_id] = (
+            WEIGHTS['bookings'] * math.log1p(demand.get(service_id, 0)) / top_demand
+            + WEIGHTS['views'] * math.log1p(views.get(service_id, 0)) / top_views
+            + WEIGHTS['rating'] * ratings[service_id]
+            + WEIGHTS['completion'] * (completed / finished if finished else 0)
+        )
+    return scores
+
+
+def _scopes(scores):
+    """``{service_id: [(scope, scope_id), ...]}`` of the scored services, including ancestor categories and locations"""
+    from accounts.location_tree import get_location_tree
+    from .categories import get_category_tree
+    from .models import Service, ServiceRanking
+
+    tree = get_category_tree()
+    locations = get_location_tree()
+
+    scopes = {}
+    for service_id, category_id, location_id in Service.objects.filter(status='ACTIVE').values_list(
+        'id', 'category_id', 'primary_location_id'
+    ):
+        if service_id not in scores:
+            continue
+        entries = [(ServiceRanking.Scope.GLOBAL, 0)]
+        entries += [(ServiceRanking.Scope.CATEGORY, node['id']) for node in tree.breadcrumb(category_id)]
+        entries += [(ServiceRanking.Scope.LOCATION, node['id']) for node in locations.ancestors(location_id)]
+        scopes[service_id] = entries
+    return scopes
+
+
+def rank_services(depth=RANKING_DEPTH, now=None):
+    """Recompute every ranking; returns the number of rows written"""
+    from .models import ServiceRanking
+    from .ratings import refresh_rating_ranks
+
+    now = now or timezone.now()
+    refresh_rating_ranks()
+    scores = score_services(now)
+
+    members = defaultdict(list)
+    for service_id, entries in _scopes(scores).items():
+        for scope in entries:
+            members[scope].append(service_id)
+
+    written = 0
+    for (scope, scope_id), service_ids in members.items():
+        # Ties broken by the newer service (higher id)
+        top = heapq.nlargest(depth, service_ids, key=lambda service_id: (scores[service_id], service_id))
+        rows = [
+            ServiceRanking(
+                scope=scope, scope_id=scope_id, rank=position, service_id=service_id,
+                score=round(scores[service_id], 6), computed_at=now
+            )
+            for position, service_id in enumerate(top, start=1)
+        ]
+        # Each scope is swapped on its own; readers never see it empty or half written
+        with transaction.atomic():
+            ServiceRanking.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['scope', 'scope_id', 'rank'],
+                update_fields=['service', 'score', 'computed_at'],
+            )
+            ServiceRanking.objects.filter(scope=scope, scope_id=scope_id, rank__gt=len(rows)).delete()
+        written += len(rows)
+
+    # Scopes that lost all their services in this run
+    ServiceRanking.objects.filter(computed_at__lt=now).delete()
+    invalidate_tags('rankings')
+    return written
+
+
+LIST_RELATIONS = ('partner', 'category', 'primary_location', 'rating_summary')
+
+
+def _ranked(scope, scope_id, limit, **filters):
+    """``[(score, service)]`` of the first ``limit`` active entries of a scope"""
+    from .models import ServiceRanking
+
+    entries = ServiceRanking.objects.filter(
+        scope=scope, scope_id=scope_id, service__status='ACTIVE', **filters
+    ).select_related(*(f'service__{relation}' for relation in LIST_RELATIONS)).order_by('rank')[:limit]
+    return [(entry.score, entry.service) for entry in entries]
+
+
+def unranked_services(category_id=None, location_ids=None):
+    """Active services by lifetime completed bookings, for scopes without a ranking"""
+    from .categories import subtree_filter
+    from .models import Service
+
+    queryset = Service.objects.filter(status='ACTIVE')
+    if category_id:
+        queryset = queryset.filter(subtree_filter(category_id))
+    if location_ids is not None:
+        queryset = queryset.filter(primary_location_id__in=location_ids)
+    return queryset.select_related(*LIST_RELATIONS).order_by('-completed_bookings', '-created_at')
+
+
+def top_services(scope, scope_id=0, limit=10, location_id=None):
+    """
+    Ranked active services of a scope, in order, with everything the list
+    serializer reads; None when the scope has no ranked services yet, so
+    callers can fall back to ``unranked_services``. ``location_id`` narrows a
+    category to the services located under that location.
+    """
+    from accounts.location_tree import get_descendant_ids as get_location_descendant_ids
+    from .categories import get_descendant_ids
+    from .models import ServiceRanking
+
+    if location_id is None:
+        return [service for _, service in _ranked(scope, scope_id, limit)] or None
+
+    location_ids = get_location_descendant_ids(location_id)
+    entries = _ranked(scope, scope_id, limit, service__primary_location_id__in=location_ids)
+    entries += _ranked(
+        ServiceRanking.Scope.LOCATION, location_id, limit, service__category_id__in=get_descendant_ids(scope_id)
+    )
+    if not entries:
+        return None
+    # Ties broken by the newer service, as in rank_services
+    merged = {service.pk: (score, service) for score, service in entries}
+    ranked = sorted(merged.values(), key=lambda entry: (entry[0], entry[1].pk), reverse=True)
+    services = [service for _, service in ranked[:limit]]
+    if len(services) < limit:
+        # Past the depth of both rankings: fill up with a live query
+        services += unranked_services(scope_id, location_ids).exclude(
+            pk__in=[service.pk for service in services]
+        )[:limit - len(services)]
+    return services
@@ -0,0 +1,178 @@
+"""
+Maintenance of the denormalized service rating aggregates
+
+Ratings are folded in incrementally whenever a saved booking gains or revises
+a counted rating (``record_client_rating``, called from the Booking post_save
+handler). Changes that cannot be folded in (a rated booking deleted, moved out
+of COMPLETED or stripped of its rating) recompute the service from its bookings
+(``recompute_ratings``, also behind ``manage.py backfill_service_ratings``).
+
+Every writer here goes through ``QuerySet.update``/``bulk_update``, which skip
+the ``Service`` signals, so each retires the ``services`` cached responses itself.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from ebglobal.cache import invalidate_tags
+from .models import Service, ServiceRatingSummary
+
+# Bayesian prior for ``Service.rating_rank``: every service starts as if it had
+# RATING_PRIOR_WEIGHT ratings of the platform-wide mean, so a single 5-star
+# review does not outrank a long record of 4.8s. RATING_PRIOR_MEAN stands in
+# until the platform has ratings.
+RATING_PRIOR_MEAN = Decimal('3.5')
+RATING_PRIOR_WEIGHT = 5
+RATING_PRIOR_CACHE_KEY = 'services:rating_prior_mean'
+RATING_PRIOR_TIMEOUT = 60 * 60
+
+
+def record_client_rating(booking, previous_rating=None):
+    """
+    Fold ``booking.client_rating`` into its service's rating summary.
+    
+    Must run inside a transaction, ideally the one that saved the rating; the
+    summary row is locked so concurrent ratings of the same service serialize
+    on it.
+    """
+    summary, _ = ServiceRatingSummary.objects.select_for_update().get_or_create(
+        service_id=booking.service_id
+    )
+    summary.apply(booking, previous_rating=previous_rating)
+    summary.save()
+    
+    Service.objects.filter(pk=booking.service_id).update(
+        **rating_fields(summary.rating_sum, summary.rating_count, rating_prior_mean())
+    )
+    invalidate_tags('services')
+    return summary
+
+
+def rating_prior_mean(refresh=False):
+    """Platform-wide mean client rating (cached), shared by every smoothed rating"""
+    mean = None if refresh else cache.get(RATING_PRIOR_CACHE_KEY)
+    if mean is None:
+        totals = ServiceRatingSummary.objects.aggregate(rating_sum=Sum('rating_sum'), rating_count=Sum('rating_count'))
+        mean = RATING_PRIOR_MEAN
+        if totals['rating_count']:
+            mean = (Decimal(totals['rating_sum']) / totals['rating_count']).quantize(Decimal('0.001'))
+        cache.set(RATING_PRIOR_CACHE_KEY, mean, RATING_PRIOR_TIMEOUT)
+    return mean
+
+
+def rating_fields(rating_sum, rating_count, prior_mean=RATING_PRIOR_MEAN):
+    """Denormalized ``Service`` rating columns for an aggregate"""
+    return {
+        'average_rating': average_rating(rating_sum, rating_count),
+        'review_count': rating_count,
+        'rating_rank': rating_rank(rating_sum, rating_count, prior_mean),
+    }
+
+
+def average_rating(rating_sum, rating_count):
+    """
+    Average as displayed and stored on ``Service.average_rating`` (one
+    decimal, half up; None when unrated), so filters match what users see
+    """
+    if not rating_count:
+        return None
+    return (Decimal(rating_sum) / Decimal(rating_count)).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+def rating_rank(rating_sum, rating_count, prior_mean=RATING_PRIOR_MEAN):
+    """Bayesian-smoothed average for sorting (0 when unrated, so unrated services sort last)"""
+    if not rating_count:
+        return Decimal('0')
+    smoothed = (Decimal(rating_sum) + prior_mean * RATING_PRIOR_WEIGHT) / (rating_count + RATING_PRIOR_WEIGHT)
+    return smoothed.quantize(Decimal('0.001'), rounding=ROUND_HALF_UP)
+
+
+def recompute_ratings(service_ids=None, batch_size=1000):
+    """
+    Rebuild the rating summaries and ``Service`` rating columns of
+    ``service_ids`` (every service when None) from the rated bookings;
+    returns the number of rated services.
+    """
+    from bookings.models import Booking
+
+    rated = Booking.objects.filter(status='COMPLETED', client_rating__isnull=False)
+    services = Service.objects.all()
+    if service_ids is not None:
+        rated = rated.filter(service_id__in=service_ids)
+        services = services.filter(pk__in=service_ids)
+
+    summaries = {}
+    totals = rated.order_by().values('service_id').annotate(
+        rating_sum=Sum('client_rating'),
+        rating_count=Count('id'),
+        **{f'stars_{star}': Count('id', filter=Q(client_rating=star)) for star in range(1, 6)}
+    )
+    for row in totals:
+        summaries[row['service_id']] = ServiceRatingSummary(
+            service_id=row['service_id'],
+            rating_sum=row['rating_sum'],
+            rating_count=row['rating_count'],
+            histogram={str(star): row[f'stars_{star}'] for star in range(1, 6)},
+            recent_reviews=[],
+        )
+
+    limit = ServiceRatingSummary.RECENT_REVIEWS_LIMIT
+    reviews = rated.select_related('client').only(
+        'id', 'service_id', 'client_rating', 'client_review', 'updated_at',
+        'client__first_name', 'client__last_name'
+    ).order_by('service_id', '-updated_at')
+    for booking in reviews.iterator(chunk_size=2000):
+        recent = summaries[booking.service_id].recent_reviews
+        if len(recent) < limit:
+            recent.append({
+                'booking_id': booking.pk,
+                'rating': booking.client_rating,
+                'comment': booking.client_review,
+                'client_name': booking.client.get_full_name(),
+                'date': booking.updated_at.isoformat(),
+            })
+
+    prior_mean = rating_prior_mean()
+    with transaction.atomic():
+        ServiceRatingSummary.objects.filter(service__in=services).exclude(service_id__in=summaries.keys()).delete()
+        ServiceRatingSummary.objects.bulk_create(
+            summaries.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['service'],
+            update_fields=['rating_sum', 'rating_count', 'histogram', 'recent_reviews'],
+        )
+        services.exclude(pk__in=summaries.keys()).update(**rating_fields(0, 0))
+        Service.objects.bulk_update(
+            [
+                Service(pk=service_id, **rating_fields(summary.rating_sum, summary.rating_count, prior_mean))
+                for service_id, summary in summaries.items()
+            ],
+            ['average_rating', 'review_count', 'rating_rank'],
+            batch_size=batch_size,
+        )
+        invalidate_tags('services')
+    return len(summaries)
+
+
+def refresh_rating_ranks(batch_size=1000):
+    """
+    Re-smooth every rated service against the current platform mean (the
+    prior drifts as ratings come in); returns the number of services changed.
+    """
+    prior_mean = rating_prior_mean(refresh=True)
+    changed = []
+    rows = ServiceRatingSummary.objects.filter(rating_count__gt=0).values_list(
+        'service_id', 'rating_sum', 'rating_count', 'service__rating_rank'
+    )
+    for service_id, rating_sum, rating_count, current in rows.iterator(chunk_size=2000):
+        rank = rating_rank(rating_sum, rating_count, prior_mean)
+        if rank != current:
+            changed.append(Service(pk=service_id, rating_rank=rank))
+    if changed:
+        Service.objects.bulk_update(changed, ['rating_rank'], batch_size=batch_size)
+        invalidate_tags('services')
+    return len(changed)
@@ -0,0 +1,310 @@
+"""
+Full-text search for services
+
+PostgreSQL deployments keep a weighted ``tsvector`` per service in
+``Service.search_vector`` (GIN indexed) built with the Portuguese and English
+text search configurations, updated from the ``Service`` save signal. Other
+databases (SQLite in development) use an in-process inverted index with light
+Portuguese/English stemming, kept as a ``JournaledSnapshot``: service saves
+and deletes journal the service id and every process re-indexes just those
+services on its next search.
+"""
+
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection
+from django.db.backends.ddl_references import Statement
+
+from ebglobal.snapshots import JournaledSnapshot
+
+# (field, weight, text search configurations)
+SEARCH_DOCUMENT = [
+    ('name', 'A', ('portuguese', 'english')),
+    ('name_pt', 'A', ('portuguese',)),
+    ('name_en', 'A', ('english',)),
+    ('description', 'B', ('portuguese', 'english')),
+    ('description_pt', 'B', ('portuguese',)),
+    ('description_en', 'B', ('english',)),
+]
+SEARCH_FIELDS = frozenset(field for field, _, _ in SEARCH_DOCUMENT)
+
+# Same relative weights PostgreSQL uses for ts_rank ({D, C, B, A})
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+SEARCH_INDEX_JOURNAL_KEY = 'services:search_index'
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+# ---------------------------------------------------------------------------
+# Tokenizing and stemming (fallback index only)
+# ---------------------------------------------------------------------------
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOP_WORDS = {
+    'portuguese': {
+        'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na',
+        'nos', 'nas', 'um', 'uma', 'para', 'por', 'com', 'sem', 'que', 'se', 'ao', 'aos',
+    },
+    'english': {
+        'a', 'an', 'the', 'and', 'or', 'of', 'in', 'on', 'for', 'to', 'with', 'at',
+        'by', 'from', 'is', 'are', 'be', 'as', 'it', 'this', 'that',
+    },
+}
+
+# Longest suffix first; (suffix, replacement)
+SUFFIXES = {
+    'portuguese': [
+        ('amentos', ''), ('imentos', ''), ('amento', ''), ('imento', ''),
+        ('adoras', ''), ('adores', ''), ('acoes', ''), ('mente', ''), ('idades', ''),
+        ('idade', ''), ('adora', ''), ('ador', ''), ('acao', ''), ('ismos', ''),
+        ('ismo', ''), ('istas', ''), ('ista', ''), ('coes', 'c'), ('cao', 'c'),
+        ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ando', ''),
+        ('endo', ''), ('indo', ''), ('ados', ''), ('idos', ''), ('ada', ''),
+        ('ado', ''), ('ida', ''), ('ido', ''), ('ar', ''), ('er', ''), ('ir', ''),
+        ('as', ''), ('os', ''), ('es', ''), ('a', ''), ('o', ''), ('e', ''), ('s', ''),
+    ],
+    'english': [
+        ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'), ('iveness', 'ive'),
+        ('ations', 'ate'), ('ation', 'ate'), ('ments', ''), ('ment', ''), ('ness', ''),
+        ('ings', ''), ('ing', ''), ('ies', 'y'), ('ied', 'y'), ('ers', ''), ('er', ''),
+        ('ed', ''), ('ly', ''), ('es', ''), ('s', ''),
+    ],
+}
+
+MIN_STEM_LENGTH = 3
+
+
+def fold(text):
+    """Lowercase and strip accents so 'Serviço' and 'servico' match"""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def stem(token, language):
+    for suffix, replacement in SUFFIXES[language]:
+        if token.endswith(suffix) and len(token) - len(suffix) + len(replacement) >= MIN_STEM_LENGTH:
+            return token[:len(token) - len(suffix)] + replacement
+    return token
+
+
+def analyze(text, languages):
+    """Yield stemmed terms for ``text`` in each of ``languages``"""
+    for token in TOKEN_RE.findall(fold(text or '')):
+        for language in languages:
+            if token in STOP_WORDS[language]:
+                continue
+            yield stem(token, language)
+
+
+# ---------------------------------------------------------------------------
+# In-process inverted index (non-PostgreSQL fallback)
+# ---------------------------------------------------------------------------
+
+class InvertedIndex:
+    """
+    Term -> {service_id: weight} postings over every service. ``update``
+    swaps in new postings dicts instead of editing them, so searches running
+    in other threads never iterate a dict that is being changed.
+    """
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.terms = {}
+        for row in rows:
+            weights = self.weights(row)
+            for term, weight in weights.items():
+                self.postings[term][row['id']] = weight
+            self.terms[row['id']] = tuple(weights)
+        self.postings = dict(self.postings)
+
+    @property
+    def size(self):
+        return len(self.terms)
+
+    @staticmethod
+    def weights(row):
+        weights = defaultdict(float)
+        for field, weight, languages in SEARCH_DOCUMENT:
+            for term in analyze(row.get(field), languages):
+                weights[term] += WEIGHTS[weight]
+        return weights
+
+    def update(self, service_ids, rows):
+        """Replace the postings of ``service_ids`` with those of ``rows`` (none for deleted services)"""
+        changed = {}
+
+        def postings(term):
+            if term not in changed:
+                changed[term] = dict(self.postings.get(term, ()))
+            return changed[term]
+
+        for service_id in service_ids:
+            for term in self.terms.pop(service_id, ()):
+                postings(term).pop(service_id, None)
+        for row in rows:
+            weights = self.weights(row)
+            for term, weight in weights.items():
+                postings(term)[row['id']] = weight
+            self.terms[row['id']] = tuple(weights)
+        for term, entries in changed.items():
+            if entries:
+                self.postings[term] = entries
+            else:
+                self.postings.pop(term, None)
+
+    def search(self, query):
+        """``{service_id: score}`` of the services matching every query word"""
+        words = [
+            {stem(token, language) for language in SUFFIXES if token not in STOP_WORDS[language]}
+            for token in TOKEN_RE.findall(fold(query))
+        ]
+        words = [variants for variants in words if variants]
+        if not words:
+            return {}
+
+        total = max(self.size, 1)
+        scores = None
+        for variants in words:
+            word_scores = defaultdict(float)
+            for term in variants:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for service_id, weight in postings.items():
+                    word_scores[service_id] = max(word_scores[service_id], weight * idf)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    service_id: score + word_scores[service_id]
+                    for service_id, score in scores.items()
+                    if service_id in word_scores
+                }
+            if not scores:
+                return {}
+        return dict(scores)
+
+
+def _load_index():
+    from .models import Service
+
+    return InvertedIndex(Service.objects.values('id', *SEARCH_FIELDS).iterator(chunk_size=2000))
+
+
+def _update_index(index, service_ids):
+    from .models import Service
+
+    index.update(service_ids, Service.objects.filter(pk__in=service_ids).values('id', *SEARCH_FIELDS))
+
+
+fallback_index = JournaledSnapshot(SEARCH_INDEX_JOURNAL_KEY, _load_index, _update_index)
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL helpers
+# ---------------------------------------------------------------------------
+
+def build_search_vector():
+    """Weighted tsvector expression over all searchable service fields"""
+    from django.contrib.postgres.search import SearchVector
+
+    vector = None
+    for field, weight, languages in SEARCH_DOCUMENT:
+        for language in languages:
+            part = SearchVector(field, weight=weight, config=language)
+            vector = part if vector is None else vector + part
+    return vector
+
+
+def build_search_query(query):
+    from django.contrib.postgres.search import SearchQuery
+
+    return (
+        SearchQuery(query, config='portuguese', search_type='websearch') |
+        SearchQuery(query, config='english', search_type='websearch')
+    )
+
+
+class SearchVectorIndex(GinIndex):
+    """GIN index over ``search_vector``; nothing is created on databases without GIN"""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Statement('SELECT 1')
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Statement('SELECT 1')
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def index_service(service, update_fields=None):
+    """Refresh the search entry for a saved service"""
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    if use_postgres():
+        from .models import Service
+
+        Service.objects.filter(pk=service.pk).update(search_vector=build_search_vector())
+    else:
+        fallback_index.record([service.pk])
+
+
+def remove_service(service_id):
+    """Drop a deleted service from the search index"""
+    if not use_postgres():
+        fallback_index.record([service_id])
+
+
+def rebuild_index(batch_size=1000):
+    """Recompute every service's search entry; returns the number of services indexed"""
+    from .models import Service
+
+    if not use_postgres():
+        return fallback_index.reload().size
+
+    ids = list(Service.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        Service.objects.filter(pk__in=batch).update(search_vector=build_search_vector())
+    return len(ids)
+
+
+def search_services(queryset, query, narrow=True):
+    """
+    ``(queryset, scores)``: ``queryset`` narrowed to the services matching
+    ``query``. On PostgreSQL the rows are annotated with ``search_rank`` and
+    ``scores`` is None; otherwise ``scores`` is ``{service_id: relevance}``
+    for ranking the filtered rows in Python (see ``ScoredPaginator``). With
+    ``narrow=False`` the fallback leaves ``queryset`` alone, for callers that
+    rank ``scores`` first and only check the page's ids against it.
+    """
+    if use_postgres():
+        from django.contrib.postgres.search import SearchRank
+        from django.db.models import F
+
+        search_query = build_search_query(query)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ), None
+
+    scores = fallback_index.get().search(query)
+    if not scores:
+        return queryset.none(), scores
+    if not narrow:
+        return queryset, scores
+    return queryset.filter(pk__in=list(scores)), scores
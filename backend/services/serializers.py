@@ -1,7 +1,11 @@
 from rest_framework import serializers
-from django.db.models import Avg, Count
-from .models import ServiceCategory, Service, ServiceAttribute, ServiceAttributeValue, AvailabilitySlot
+from .models import (
+    ServiceCategory, ServiceCategoryClosure, Service, ServiceAttribute, ServiceAttributeValue,
+    AvailabilitySlot, ServiceRatingSummary
+)
 from accounts.serializers import UserProfileSerializer, LocationSerializer
+from .categories import get_category_service_counts
+from .nearby import MAX_RADIUS_KM
 
 
 class ServiceCategorySerializer(serializers.ModelSerializer):
@@ -17,8 +21,18 @@ class ServiceCategorySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def validate_parent(self, parent):
+        """Same rule as ``ServiceCategory.clean``: no nesting under itself or a subcategory"""
+        if parent is not None and self.instance is not None:
+            if ServiceCategoryClosure.objects.filter(ancestor_id=self.instance.pk, descendant_id=parent.pk).exists():
+                raise serializers.ValidationError('A category cannot be nested under itself or its subcategories')
+        return parent
+    
     def get_service_count(self, obj):
-        return obj.services.filter(status='ACTIVE').count()
+        counts = self.context.get('service_counts')
+        if counts is None:
+            counts = get_category_service_counts()
+        return counts.get(obj.pk, 0)
 
 
 class ServiceAttributeSerializer(serializers.ModelSerializer):
@@ -28,7 +42,7 @@ class ServiceAttributeSerializer(serializers.ModelSerializer):
         model = ServiceAttribute
         fields = [
             'id', 'name_pt', 'name_en', 'attribute_type', 'is_required',
-            'options_pt', 'options_en', 'service_category'
+            'options_pt', 'options_en', 'category'
         ]
         read_only_fields = ['id']
 
@@ -50,81 +64,107 @@ class AvailabilitySlotSerializer(serializers.ModelSerializer):
         model = AvailabilitySlot
         fields = [
             'id', 'start_time', 'end_time', 'is_available',
-            'price_override', 'notes', 'created_at', 'updated_at'
+            'price_override', 'is_blocked', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+def get_rating_summary(service):
+    """Return the prefetched rating summary for a service, or None if it was never rated"""
+    try:
+        return service.rating_summary
+    except ServiceRatingSummary.DoesNotExist:
+        return None
+
+
 class ServiceListSerializer(serializers.ModelSerializer):
     """Serializer for listing services (optimized for list views)"""
     partner_name = serializers.CharField(source='partner.get_full_name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
+    rating = serializers.SerializerMethodField()
     
     class Meta:
         model = Service
         fields = [
             'id', 'name', 'description', 'partner_name', 'category_name', 
-            'base_price', 'currency', 'duration_minutes', 'status', 'created_at'
+            'base_price', 'currency', 'duration_minutes', 'status', 'rating',
+            'review_count', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'review_count', 'created_at']
+    
+    def get_rating(self, obj):
+        summary = get_rating_summary(obj)
+        return summary.average if summary else 0.0
+    
+
+class NearbyServiceSerializer(ServiceListSerializer):
+    """Service listing with the distance to the searched point (``distances`` in context)"""
+    distance_km = serializers.SerializerMethodField()
+    
+    class Meta(ServiceListSerializer.Meta):
+        fields = ServiceListSerializer.Meta.fields + ['distance_km']
+    
+    def get_distance_km(self, obj):
+        distance = self.context.get('distances', {}).get(obj.pk)
+        return round(distance, 2) if distance is not None else None
+
+
+class ServiceSummarySerializer(serializers.ModelSerializer):
+    """Compact service representation embedded in other listings (e.g. bookings)"""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    rating = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Service
+        fields = [
+            'id', 'name', 'name_pt', 'name_en', 'category', 'category_name',
+            'base_price', 'currency', 'duration_minutes', 'rating'
+        ]
+        read_only_fields = fields
+    
+    def get_rating(self, obj):
+        summary = get_rating_summary(obj)
+        return summary.average if summary else 0.0
 
 
 class ServiceDetailSerializer(serializers.ModelSerializer):
     """Serializer for detailed service view"""
     partner = UserProfileSerializer(read_only=True)
     category = ServiceCategorySerializer(read_only=True)
-    location = LocationSerializer(read_only=True)
-    attributes = ServiceAttributeValueSerializer(many=True, read_only=True)
+    primary_location = LocationSerializer(read_only=True)
+    attribute_values = ServiceAttributeValueSerializer(many=True, read_only=True)
     availability_slots = AvailabilitySlotSerializer(many=True, read_only=True)
     rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
     recent_reviews = serializers.SerializerMethodField()
     
     class Meta:
         model = Service
         fields = [
-            'id', 'title_pt', 'title_en', 'description_pt', 'description_en',
-            'partner', 'category', 'location', 'base_price', 'currency',
-            'duration_minutes', 'max_participants', 'requirements_pt',
-            'requirements_en', 'cancellation_policy_pt', 'cancellation_policy_en',
-            'attributes', 'availability_slots', 'rating', 'review_count',
-            'recent_reviews', 'is_active', 'created_at', 'updated_at'
+            'id', 'name', 'name_pt', 'name_en', 'description', 'description_pt',
+            'description_en', 'partner', 'category', 'primary_location',
+            'pricing_type', 'base_price', 'currency', 'duration_minutes',
+            'max_duration_hours', 'is_online_available', 'is_home_service',
+            'attribute_values', 'availability_slots', 'rating', 'review_count',
+            'recent_reviews', 'status', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'review_count', 'created_at', 'updated_at']
     
     def get_rating(self, obj):
-        from bookings.models import Booking
-        avg_rating = Booking.objects.filter(
-            service=obj,
-            status='COMPLETED',
-            client_rating__isnull=False
-        ).aggregate(avg_rating=Avg('client_rating'))['avg_rating']
-        return round(avg_rating, 1) if avg_rating else 0.0
-    
-    def get_review_count(self, obj):
-        from bookings.models import Booking
-        return Booking.objects.filter(
-            service=obj,
-            status='COMPLETED',
-            client_rating__isnull=False
-        ).count()
-    
-    def get_recent_reviews(self, obj):
-        from bookings.models import Booking
-        recent_bookings = Booking.objects.filter(
-            service=obj,
-            status='COMPLETED',
-            client_rating__isnull=False
-        ).order_by('-updated_at')[:5]
+        summary = get_rating_summary(obj)
+        return summary.average if summary else 0.0
         
+    def get_recent_reviews(self, obj):
+        summary = get_rating_summary(obj)
+        if not summary:
+            return []
         return [
             {
-                'rating': booking.client_rating,
-                'comment': booking.client_comment,
-                'client_name': booking.client.get_full_name(),
-                'date': booking.updated_at
+                'rating': review['rating'],
+                'comment': review['comment'],
+                'client_name': review['client_name'],
+                'date': review['date']
             }
-            for booking in recent_bookings
+            for review in summary.recent_reviews
         ]
 
 
@@ -226,12 +266,41 @@ class ServiceSearchSerializer(serializers.Serializer):
     location = serializers.IntegerField(required=False)
     min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
     max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
-    min_rating = serializers.FloatField(required=False)
+    min_rating = serializers.FloatField(required=False, min_value=0, max_value=5)
+    min_reviews = serializers.IntegerField(required=False, min_value=0)
     date = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
     time = serializers.TimeField(required=False)
     sort_by = serializers.ChoiceField(
-        choices=['price_asc', 'price_desc', 'rating_desc', 'newest', 'distance'],
-        default='newest'
+        choices=['relevance', 'price_asc', 'price_desc', 'rating_desc', 'reviews_desc', 'newest', 'distance'],
+        default='relevance'
     )
     page = serializers.IntegerField(default=1, min_value=1)
     page_size = serializers.IntegerField(default=20, min_value=1, max_value=100)
+    # Cursor pagination (opt-in; send an empty cursor for the first page)
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    include_count = serializers.BooleanField(default=False)
+    # Proximity (radius in km around the point; required for distance sort)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, min_value=0.1, max_value=MAX_RADIUS_KM)
+    
+    def validate(self, attrs):
+        if ('date_to' in attrs or 'time' in attrs) and 'date' not in attrs:
+            raise serializers.ValidationError("date_to and time filter within a date range and require date")
+        if 'date_to' in attrs and attrs['date_to'] < attrs['date']:
+            raise serializers.ValidationError("date_to must not be before date")
+        if ('latitude' in attrs) != ('longitude' in attrs):
+            raise serializers.ValidationError("latitude and longitude must be given together")
+        if attrs.get('sort_by') == 'distance' and 'latitude' not in attrs:
+            raise serializers.ValidationError("Sorting by distance requires latitude and longitude")
+        return attrs
+
+
+class NearbyServicesQuerySerializer(serializers.Serializer):
+    """Serializer for nearby service lookups"""
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, min_value=0.1, max_value=MAX_RADIUS_KM)
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=100)
+    category = serializers.IntegerField(required=False)
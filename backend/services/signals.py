@@ -0,0 +1,74 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ebglobal.cache import invalidate_tags
+from .models import Service, ServiceCategory, AvailabilitySlot
+from . import search
+from .availability import refresh_availability_days
+from .categories import invalidate_category_service_counts, invalidate_category_tree
+
+
+@receiver(post_save, sender=Service)
+def update_service_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the full-text search index in sync with service edits"""
+    if raw:
+        return
+    search.index_service(instance, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Service)
+def remove_service_from_search_index(sender, instance, **kwargs):
+    search.remove_service(instance.pk)
+
+
+@receiver(post_save, sender=Service)
+def refresh_category_counts_on_service_save(sender, instance, created, raw=False, **kwargs):
+    """Category counts only depend on each service's status and category"""
+    if raw:
+        return
+    if created or instance.field_changed('status') or instance.field_changed('category_id'):
+        invalidate_category_service_counts()
+
+
+@receiver(post_delete, sender=Service)
+def refresh_category_counts(sender, **kwargs):
+    invalidate_category_service_counts()
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def refresh_category_hierarchy(sender, **kwargs):
+    invalidate_category_tree()
+    invalidate_category_service_counts()
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_cached_service_responses(sender, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_tags('services')
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def invalidate_cached_category_responses(sender, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_tags('categories')
+
+
+@receiver(post_save, sender=AvailabilitySlot)
+def refresh_availability_index_on_slot_save(sender, instance, raw=False, **kwargs):
+    """Keep the per-day slot bitmap in sync, including the old day of a moved slot"""
+    if raw:
+        return
+    start_times = {instance.start_time}
+    loaded_start_time = instance.loaded_value('start_time')
+    if loaded_start_time is not None:
+        start_times.add(loaded_start_time)
+    refresh_availability_days(instance.service_id, start_times)
+
+
+@receiver(post_delete, sender=AvailabilitySlot)
+def refresh_availability_index_on_slot_delete(sender, instance, **kwargs):
+    refresh_availability_days(instance.service_id, {instance.start_time})
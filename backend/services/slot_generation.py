@@ -0,0 +1,215 @@
+"""
+Bulk availability slot generation from partner business hours
+
+``PartnerProfile.business_hours`` maps weekdays to opening intervals, e.g.::
+
+    {
+        "monday": [["09:00", "12:00"], ["14:00", "18:00"]],
+        "tuesday": {"open": "09:00", "close": "18:00"},
+        "sunday": {"closed": true},
+        "exceptions": {"2025-12-25": [], "2025-12-24": [["09:00", "13:00"]]}
+    }
+
+Weekdays may also be given as English or Portuguese names or as ``"0"``-``"6"``
+(Monday first), and an interval may be written as ``"09:00-18:00"``. Times are
+read in the partner's ``PartnerProfile.time_zone`` (the platform time zone when
+blank). Each interval is cut into back-to-back 90-minute slots for every active
+service of the partner. Candidates that overlap an existing slot of the service
+(generated or added by hand) are skipped, and the rest are inserted a chunk of
+services at a time with ``bulk_create(ignore_conflicts=True)``, so a concurrent
+run cannot create duplicates past the ``(service, start_time)`` constraint.
+"""
+
+import bisect
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import SLOT_MINUTES, partner_zone, refresh_for_slots
+
+SLOT_LENGTH = datetime.timedelta(minutes=SLOT_MINUTES)
+DEFAULT_HORIZON_DAYS = 60
+
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6,
+}
+
+
+def _parse_time(value):
+    if isinstance(value, datetime.time):
+        return value
+    hour, _, minute = str(value).strip().partition(':')
+    return datetime.time(int(hour), int(minute or 0))
+
+
+def _parse_intervals(value):
+    """Normalize one day's entry to ``[(open, close)]``; empty means closed"""
+    if not value:
+        return []
+    if isinstance(value, dict):
+        if value.get('closed'):
+            return []
+        if 'intervals' in value:
+            return _parse_intervals(value['intervals'])
+        opens, closes = value.get('open', value.get('start')), value.get('close', value.get('end'))
+        return _parse_intervals([[opens, closes]]) if opens and closes else []
+    if isinstance(value, str):
+        value = [value]
+    intervals = []
+    for interval in value:
+        if isinstance(interval, str):
+            interval = interval.split('-')
+        opens, closes = (_parse_time(part) for part in interval)
+        if opens < closes:
+            intervals.append((opens, closes))
+    return intervals
+
+
+def _weekday_key(key):
+    key = str(key).strip().lower().replace('ç', 'c').replace('á', 'a').split('-')[0]
+    if key.isdigit():
+        return int(key) % 7
+    return WEEKDAYS.get(key)
+
+
+class BusinessHours:
+    """Weekly opening intervals with per-date exceptions, in the partner's time zone"""
+
+    def __init__(self, config, time_zone=''):
+        self.weekly = defaultdict(list)
+        self.exceptions = {}
+        self.tz = partner_zone(time_zone)
+        if not isinstance(config, dict):
+            return
+        for key, value in config.items():
+            if key == 'exceptions':
+                for day, intervals in (value or {}).items():
+                    try:
+                        self.exceptions[datetime.date.fromisoformat(day)] = _parse_intervals(intervals)
+                    except (TypeError, ValueError):
+                        continue
+                continue
+            weekday = _weekday_key(key)
+            if weekday is None:
+                continue
+            try:
+                self.weekly[weekday] = _parse_intervals(value)
+            except (TypeError, ValueError):
+                continue
+
+    def intervals(self, day):
+        if day in self.exceptions:
+            return self.exceptions[day]
+        return self.weekly.get(day.weekday(), [])
+
+    def slot_starts(self, date_from, date_to):
+        """Yield aware slot start times between ``date_from`` and ``date_to`` (inclusive)"""
+        day = date_from
+        while day <= date_to:
+            for opens, closes in self.intervals(day):
+                start = timezone.make_aware(datetime.datetime.combine(day, opens), self.tz)
+                close = timezone.make_aware(datetime.datetime.combine(day, closes), self.tz)
+                while start + SLOT_LENGTH <= close:
+                    yield start
+                    start += SLOT_LENGTH
+            day += datetime.timedelta(days=1)
+
+
+def generate_slots(partner_ids=None, days=DEFAULT_HORIZON_DAYS, start_date=None, batch_size=1000):
+    """
+    Create missing slots for the active services of ``partner_ids`` (all partners
+    when None) over ``days`` days from ``start_date`` (today by default).
+    Returns the number of slots inserted (a concurrent run may have inserted
+    some of them first).
+    """
+    from accounts.models import PartnerProfile
+
+    now = timezone.now()
+    date_from = start_date or timezone.localdate()
+    date_to = date_from + datetime.timedelta(days=days - 1)
+
+    profiles = PartnerProfile.objects.filter(user__is_active=True).order_by('user_id')
+    if partner_ids is not None:
+        profiles = profiles.filter(user_id__in=partner_ids)
+    profiles = profiles.values_list('user_id', 'business_hours', 'time_zone')
+
+    created = 0
+    batch = []
+    for profile in profiles.iterator(chunk_size=batch_size):
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            created += _generate_for_partners(batch, date_from, date_to, now, batch_size)
+            batch = []
+    if batch:
+        created += _generate_for_partners(batch, date_from, date_to, now, batch_size)
+    return created
+
+
+def _generate_for_partners(profiles, date_from, date_to, now, batch_size):
+    from .models import Service
+
+    starts_by_partner = {}
+    for user_id, config, time_zone in profiles:
+        starts = [start for start in BusinessHours(config, time_zone).slot_starts(date_from, date_to) if start >= now]
+        if starts:
+            starts_by_partner[user_id] = starts
+    if not starts_by_partner:
+        return 0
+
+    services = Service.objects.filter(
+        partner_id__in=starts_by_partner.keys(), status=Service.ServiceStatus.ACTIVE
+    ).order_by('pk').values_list('id', 'partner_id')
+
+    created = 0
+    chunk, size = [], 0
+    for service_id, partner_id in services:
+        chunk.append((service_id, partner_id))
+        size += len(starts_by_partner[partner_id])
+        if size >= batch_size:
+            created += _generate_for_services(chunk, starts_by_partner, batch_size)
+            chunk, size = [], 0
+    if chunk:
+        created += _generate_for_services(chunk, starts_by_partner, batch_size)
+    return created
+
+
+def _generate_for_services(services, starts_by_partner, batch_size):
+    """Insert the slots of ``services`` (``[(service_id, partner_id)]``) that overlap no existing slot"""
+    from .models import AvailabilitySlot
+
+    first = min(starts_by_partner[partner_id][0] for _, partner_id in services)
+    last = max(starts_by_partner[partner_id][-1] for _, partner_id in services)
+    taken = defaultdict(list)
+    existing = AvailabilitySlot.objects.filter(
+        service_id__in=[service_id for service_id, _ in services],
+        start_time__lt=last + SLOT_LENGTH,
+        end_time__gt=first,
+    ).order_by('start_time').values_list('service_id', 'start_time', 'end_time')
+    for service_id, start_time, end_time in existing:
+        taken[service_id].append((start_time, end_time))
+
+    slots = []
+    for service_id, partner_id in services:
+        busy_starts, busy_until = [], []
+        for start_time, end_time in taken[service_id]:
+            busy_starts.append(start_time)
+            busy_until.append(max(end_time, busy_until[-1]) if busy_until else end_time)
+        for start in starts_by_partner[partner_id]:
+            # Overlap: some slot starting before this one ends is still running at its start
+            position = bisect.bisect_left(busy_starts, start + SLOT_LENGTH)
+            if position and busy_until[position - 1] > start:
+                continue
+            slots.append(AvailabilitySlot(
+                service_id=service_id, partner_id=partner_id, start_time=start, end_time=start + SLOT_LENGTH
+            ))
+    if not slots:
+        return 0
+
+    with transaction.atomic():
+        AvailabilitySlot.objects.bulk_create(slots, batch_size=batch_size, ignore_conflicts=True)
+        # bulk_create skips the slot signals, so refresh the availability index here
+        refresh_for_slots(slots)
+    return len(slots)
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from . import ranking
+from .slot_generation import DEFAULT_HORIZON_DAYS, generate_slots
+
+
+@shared_task
+def generate_availability_slots(partner_ids=None, days=DEFAULT_HORIZON_DAYS):
+    """Roll the availability horizon forward; schedule daily with Celery beat"""
+    return generate_slots(partner_ids=partner_ids, days=days)
+
+
+@shared_task
+def rank_services():
+    """Recompute the popularity rankings; schedule hourly with Celery beat"""
+    return ranking.rank_services()
@@ -1,3 +1,559 @@
+import datetime
+import re
+import zoneinfo
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Location, PartnerProfile, User
+from bookings.models import Booking
+from .categories import (
+    CATEGORY_COUNTS_CACHE_KEY, get_breadcrumb, get_category_service_counts, get_category_tree, get_descendant_ids
+)
+from .models import AvailabilitySlot, Service, ServiceCategory, ServiceRanking, ServiceRatingSummary
+from .ranking import rank_services
+from .ratings import rating_prior_mean, refresh_rating_ranks
+from .search import fallback_index
+from .serializers import ServiceCategorySerializer
+from .slot_generation import generate_slots
+
+
+def make_service(partner, category, name, description='', **fields):
+    fields.setdefault('status', 'ACTIVE')
+    return Service.objects.create(
+        partner=partner, category=category, name=name, description=description or name,
+        base_price=fields.pop('base_price', 100), **fields
+    )
+
+
+class CategoryTreeTests(TestCase):
+    """The per-process category snapshot follows hierarchy edits"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = ServiceCategory.objects.create(name='Home')
+        cls.cleaning = ServiceCategory.objects.create(name='Cleaning', parent=cls.home)
+        cls.windows = ServiceCategory.objects.create(name='Windows', parent=cls.cleaning)
+
+    def setUp(self):
+        # Snapshots built by other tests describe rolled-back rows
+        cache.clear()
+
+    def test_descendants_and_breadcrumb(self):
+        self.assertCountEqual(
+            get_descendant_ids(self.home.pk), [self.home.pk, self.cleaning.pk, self.windows.pk]
+        )
+        self.assertEqual([node['name'] for node in get_breadcrumb(self.windows.pk)], ['Home', 'Cleaning', 'Windows'])
+
+    def test_snapshot_reloads_after_a_move(self):
+        tree = get_category_tree()
+        self.assertIs(get_category_tree(), tree)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            garden = ServiceCategory.objects.create(name='Garden')
+            self.windows.parent = garden
+            self.windows.save()
+
+        self.assertIsNot(get_category_tree(), tree)
+        self.assertEqual(get_descendant_ids(self.cleaning.pk), [self.cleaning.pk])
+        self.assertEqual([node['name'] for node in get_breadcrumb(self.windows.pk)], ['Garden', 'Windows'])
+
+    def test_serializer_rejects_nesting_under_a_subcategory(self):
+        serializer = ServiceCategorySerializer(self.home, data={'parent': self.windows.pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('parent', serializer.errors)
+
+
+
+class CategoryServiceCountTests(TestCase):
+    """Active service counts per category, rolled up to the parents and cached"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.home = ServiceCategory.objects.create(name='Home')
+        cls.cleaning = ServiceCategory.objects.create(name='Cleaning', parent=cls.home)
+        make_service(cls.partner, cls.home, 'Repairs')
+        make_service(cls.partner, cls.cleaning, 'Cleaning')
+        make_service(cls.partner, cls.cleaning, 'Draft', status='PENDING_APPROVAL')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_include_subcategories(self):
+        counts = get_category_service_counts()
+        self.assertEqual((counts[self.home.pk], counts[self.cleaning.pk]), (2, 1))
+        with self.assertNumQueries(0):
+            get_category_service_counts()
+
+    def test_status_change_drops_the_cache_on_commit(self):
+        get_category_service_counts()
+        draft = Service.objects.get(name='Draft')
+        with self.captureOnCommitCallbacks() as callbacks:
+            draft.status = 'ACTIVE'
+            draft.save()
+            # Still the committed view until the write commits
+            self.assertEqual(get_category_service_counts()[self.cleaning.pk], 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_category_service_counts()[self.cleaning.pk], 2)
+
+        # Edits that cannot change a count keep the cache
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.name = 'Deep cleaning'
+            draft.save()
+        self.assertIsNotNone(cache.get(CATEGORY_COUNTS_CACHE_KEY))
+
+class ServiceSearchTests(TestCase):
+    """Full-text search over the in-process fallback index (SQLite)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.cleaning = ServiceCategory.objects.create(name='Cleaning')
+        cls.garden = ServiceCategory.objects.create(name='Garden')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        return self.client.post('/api/v1/services/search/', params, content_type='application/json').json()
+
+    def test_filters_apply_before_ranking(self):
+        # Many better-ranked matches in another category must not crowd out the filtered one
+        for number in range(30):
+            make_service(self.partner, self.garden, f'Limpeza limpeza jardim {number}')
+        wanted = make_service(self.partner, self.cleaning, 'Casa', description='Limpeza geral')
+
+        body = self.search(query='limpeza', category=self.cleaning.pk)
+        self.assertEqual([row['id'] for row in body['results']], [wanted.pk])
+        self.assertEqual(body['count'], 1)
+
+    def test_results_are_ranked_and_paged(self):
+        weak = make_service(self.partner, self.cleaning, 'Casa', description='Limpeza de vidros')
+        strong = make_service(self.partner, self.cleaning, 'Limpeza profunda', description='Limpeza completa')
+
+        first = self.search(query='limpeza', page_size=1, cursor='')
+        second = self.search(query='limpeza', page_size=1, cursor=first['next_cursor'])
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], [strong.pk, weak.pk])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_edits_reach_the_index(self):
+        service = make_service(self.partner, self.cleaning, 'Pintura')
+        self.assertEqual(self.search(query='canalizador')['results'], [])
+
+        index = fallback_index.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service.name = 'Canalizador'
+            service.save()
+        self.assertEqual([row['id'] for row in self.search(query='canalizador')['results']], [service.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service.delete()
+        self.assertEqual(self.search(query='canalizador')['results'], [])
+        # Patched in place from the journal, not rebuilt
+        self.assertIs(fallback_index.get(), index)
+        self.assertNotIn(service.pk, index.terms)
+
+    def test_relevance_pages_load_only_their_rows(self):
+        for number in range(30):
+            make_service(self.partner, self.cleaning, f'Limpeza {number}')
+
+        with CaptureQueriesContext(connection) as queries:
+            body = self.search(query='limpeza', page_size=2, cursor='')
+        self.assertEqual(len(body['results']), 2)
+        in_lists = [match.split(',') for query in queries for match in re.findall(r' IN \(([^)]*)\)', query['sql'])]
+        self.assertTrue(in_lists)
+        self.assertLessEqual(max(len(values) for values in in_lists), 3)
+
+
+class AvailabilityIndexTests(TestCase):
+    """Search by date/time through the per-day free-slot bitmap"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.category = ServiceCategory.objects.create(name='Cleaning')
+        cls.service = make_service(cls.partner, cls.category, 'Limpeza')
+        cls.day = timezone.localdate() + datetime.timedelta(days=3)
+
+    def add_slot(self, hour, minute=0):
+        start = timezone.make_aware(datetime.datetime.combine(self.day, datetime.time(hour, minute)))
+        with self.captureOnCommitCallbacks(execute=True):
+            return AvailabilitySlot.objects.create(
+                service=self.service, partner=self.partner, start_time=start, end_time=start + datetime.timedelta(minutes=90)
+            )
+
+    def search(self, **params):
+        return self.client.post('/api/v1/services/search/', params, content_type='application/json')
+
+    def found(self, **params):
+        return [row['id'] for row in self.search(**params).json()['results']]
+
+    def test_booking_one_of_two_slots_keeps_the_bucket_free(self):
+        # 09:00 and 09:30 share the 09:00-10:30 bucket
+        first = self.add_slot(9)
+        self.add_slot(9, 30)
+        params = {'date': self.day.isoformat(), 'time': '09:45'}
+        self.assertEqual(self.found(**params), [self.service.pk])
+
+        first.is_available = False
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.found(**params), [self.service.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AvailabilitySlot.objects.filter(service=self.service).delete()
+        self.assertEqual(self.found(**params), [])
+
+    def test_moved_slot_refreshes_its_old_day(self):
+        slot = self.add_slot(14)
+        slot.start_time += datetime.timedelta(days=1)
+        slot.end_time += datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            slot.save()
+
+        self.assertEqual(self.found(date=self.day.isoformat()), [])
+        self.assertEqual(
+            self.found(date=self.day.isoformat(), date_to=(self.day + datetime.timedelta(days=1)).isoformat()),
+            [self.service.pk],
+        )
+
+    def test_days_and_slots_follow_the_partner_time_zone(self):
+        # 08:00 Monday in Tokyo is still Sunday 23:00 in UTC
+        PartnerProfile.objects.create(
+            user=self.partner, business_name='Limpa', business_description='Limpezas',
+            primary_location=Location.objects.create(name='Tokyo', location_type='PROVINCE'),
+            time_zone='Asia/Tokyo',
+        )
+        start = datetime.datetime.combine(self.day, datetime.time(8), tzinfo=zoneinfo.ZoneInfo('Asia/Tokyo'))
+        with self.captureOnCommitCallbacks(execute=True):
+            AvailabilitySlot.objects.create(
+                service=self.service, partner=self.partner, start_time=start, end_time=start + datetime.timedelta(minutes=90)
+            )
+
+        self.assertEqual(self.found(date=self.day.isoformat(), time='08:00'), [self.service.pk])
+        self.assertEqual(self.found(date=(self.day - datetime.timedelta(days=1)).isoformat()), [])
+        availability = self.client.get(f'/api/v1/services/list/{self.service.pk}/availability/', {'date': self.day.isoformat()})
+        self.assertEqual(len(availability.json()), 1)
+
+    def test_time_and_date_to_require_date(self):
+        self.add_slot(9)
+        self.assertEqual(self.search(time='09:00').status_code, 400)
+        self.assertEqual(self.search(date_to=self.day.isoformat()).status_code, 400)
+        self.assertEqual(
+            self.search(date=self.day.isoformat(), date_to=(self.day - datetime.timedelta(days=1)).isoformat()).status_code,
+            400,
+        )
+
+
+class SlotGenerationTests(TestCase):
+    """Slots generated from business hours in the partner's time zone"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        PartnerProfile.objects.create(
+            user=cls.partner, business_name='Limpa', business_description='Limpezas',
+            primary_location=Location.objects.create(name='Luanda', location_type='PROVINCE'),
+            business_hours={'monday': [['09:00', '13:30']]}, time_zone='Africa/Luanda',
+        )
+        cls.service = make_service(cls.partner, ServiceCategory.objects.create(name='Cleaning'), 'Limpeza')
+        today = timezone.localdate()
+        cls.monday = today + datetime.timedelta(days=7 - today.weekday())
+
+    def at(self, hour, minute=0):
+        return datetime.datetime.combine(self.monday, datetime.time(hour, minute), tzinfo=datetime.timezone.utc)
+
+    def starts(self):
+        return list(AvailabilitySlot.objects.filter(service=self.service).values_list('start_time', flat=True))
+
+    def test_hours_are_local_to_the_partner(self):
+        self.assertEqual(generate_slots(start_date=self.monday, days=1), 3)
+        # Luanda is UTC+1
+        self.assertEqual(self.starts(), [self.at(8), self.at(9, 30), self.at(11)])
+        self.assertEqual(generate_slots(start_date=self.monday, days=1), 0)
+
+    def test_manual_slots_block_overlapping_ones(self):
+        AvailabilitySlot.objects.create(
+            service=self.service, partner=self.partner, start_time=self.at(8, 30), end_time=self.at(10)
+        )
+        self.assertEqual(generate_slots(start_date=self.monday, days=1), 1)
+        self.assertEqual(self.starts(), [self.at(8, 30), self.at(11)])
+
+
+class DistanceSortTests(TestCase):
+    """Search results sorted by distance from a point"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.category = ServiceCategory.objects.create(name='Cleaning')
+        other = ServiceCategory.objects.create(name='Garden')
+        luanda = Location.objects.create(name='Luanda', location_type='CITY', latitude='-8.8383', longitude='13.2344')
+        viana = Location.objects.create(name='Viana', location_type='CITY', latitude='-8.9035', longitude='13.3740')
+        cls.far = make_service(cls.partner, cls.category, 'Far', primary_location=viana)
+        cls.near = make_service(cls.partner, cls.category, 'Near', primary_location=luanda)
+        make_service(cls.partner, other, 'Filtered out', primary_location=luanda)
+
+    def search(self, **params):
+        params.update(latitude=-8.8390, longitude=13.2340, sort_by='distance', category=self.category.pk)
+        return self.client.post('/api/v1/services/search/', params, content_type='application/json').json()
+
+    def test_nearest_first_within_filters(self):
+        body = self.search()
+        self.assertEqual([row['id'] for row in body['results']], [self.near.pk, self.far.pk])
+        self.assertEqual(body['count'], 2)
+        self.assertLess(body['results'][0]['distance_km'], body['results'][1]['distance_km'])
+
+    def test_cursor_pages(self):
+        first = self.search(page_size=1, cursor='', include_count=True)
+        second = self.search(page_size=1, cursor=first['next_cursor'])
+        self.assertEqual(first['count'], 2)
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], [self.near.pk, self.far.pk])
+        self.assertIsNone(second['next_cursor'])
+
+
+class PopularServicesTests(TestCase):
+    """Precomputed popularity rankings and the popular services endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.cleaning = ServiceCategory.objects.create(name='Cleaning')
+        cls.garden = ServiceCategory.objects.create(name='Garden')
+        cls.angola = Location.objects.create(name='Angola', location_type='COUNTRY')
+        cls.luanda = Location.objects.create(name='Luanda', location_type='CITY', parent=cls.angola)
+        cls.huambo = Location.objects.create(name='Huambo', location_type='CITY', parent=cls.angola)
+        cls.in_luanda = make_service(cls.partner, cls.cleaning, 'Luanda cleaning', primary_location=cls.luanda)
+        cls.in_huambo = make_service(cls.partner, cls.cleaning, 'Huambo cleaning', primary_location=cls.huambo)
+
+    def setUp(self):
+        cache.clear()
+
+    def popular(self, **params):
+        return self.client.get('/api/v1/services/popular/', params)
+
+    def test_rerun_updates_scopes_in_place(self):
+        rank_services()
+        self.assertTrue(ServiceRanking.objects.filter(scope='CATEGORY', scope_id=self.cleaning.pk).exists())
+
+        self.in_luanda.category = self.garden
+        self.in_luanda.save()
+        self.in_huambo.category = self.garden
+        self.in_huambo.save()
+        rank_services()
+
+        self.assertFalse(ServiceRanking.objects.filter(scope='CATEGORY', scope_id=self.cleaning.pk).exists())
+        self.assertEqual(ServiceRanking.objects.filter(scope='CATEGORY', scope_id=self.garden.pk).count(), 2)
+        self.assertEqual(ServiceRanking.objects.filter(scope='GLOBAL').count(), 2)
+
+    def test_category_and_location_are_intersected(self):
+        rank_services()
+        response = self.popular(category=self.cleaning.pk, location=self.luanda.pk)
+        self.assertEqual([row['id'] for row in response.json()], [self.in_luanda.pk])
+
+        response = self.popular(category=self.cleaning.pk, location=self.angola.pk)
+        self.assertCountEqual([row['id'] for row in response.json()], [self.in_luanda.pk, self.in_huambo.pk])
+
+    def test_category_and_location_fill_past_the_ranking_depth(self):
+        make_service(self.partner, self.garden, 'Jardim', primary_location=self.luanda)
+        rank_services(depth=1)
+        response = self.popular(category=self.cleaning.pk, location=self.angola.pk, limit=2)
+        self.assertEqual([row['id'] for row in response.json()], [self.in_huambo.pk, self.in_luanda.pk])
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.popular(category='cleaning').status_code, 400)
+        self.assertEqual(self.popular(location='1;2').status_code, 400)
+        self.assertEqual(self.popular(limit=0).status_code, 400)
+
+    def test_category_services_include_the_locations_below(self):
+        url = f'/api/v1/services/categories/{self.cleaning.pk}/services/'
+        response = self.client.get(url, {'location': self.angola.pk})
+        self.assertCountEqual([row['id'] for row in response.json()['results']], [self.in_luanda.pk, self.in_huambo.pk])
+
+        response = self.client.get(url, {'location': self.luanda.pk})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.in_luanda.pk])
+        self.assertEqual(self.client.get(url, {'location': 'luanda'}).status_code, 400)
+
+
+class RatingFixtures:
+    """A service and a client rating its completed bookings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = User.objects.create_user(
+            email='partner@example.com', password='x', first_name='Par', last_name='Tner', role='PARTNER'
+        )
+        cls.client_user = User.objects.create_user(
+            email='client@example.com', password='x', first_name='Cli', last_name='Ent', role='CLIENT'
+        )
+        cls.location = Location.objects.create(name='Luanda', location_type='CITY')
+        cls.service = make_service(cls.partner, ServiceCategory.objects.create(name='Cleaning'), 'Cleaning')
+
+    def rate(self, stars):
+        start = timezone.now() - datetime.timedelta(days=2)
+        booking = Booking.objects.create(
+            client=self.client_user, partner=self.partner, service=self.service,
+            service_location=self.location, scheduled_start=start, scheduled_end=start + datetime.timedelta(hours=1),
+            base_price=50, total_amount=50, status='COMPLETED', client_rating=stars
+        )
+        return booking
+
+    def assertRating(self, average, count):
+        self.service.refresh_from_db()
+        summary = ServiceRatingSummary.objects.get(service=self.service)
+        self.assertEqual((summary.average, summary.rating_count), (average, count))
+        self.assertEqual(float(self.service.average_rating or 0), average)
+        self.assertEqual(self.service.review_count, count)
+
+
+class RatingSummaryTests(RatingFixtures, TestCase):
+    """Denormalized rating aggregates stay equal to the rated bookings"""
+
+    def test_one_rounding_rule(self):
+        for stars in (4, 5, 5):
+            self.rate(stars)
+        self.assertRating(4.7, 3)
+
+    def test_ratings_that_stop_counting_are_removed(self):
+        first, second, third = self.rate(2), self.rate(5), self.rate(5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertRating(5.0, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = 'DISPUTED'
+            second.save()
+        self.assertRating(5.0, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third.client_rating = None
+            third.save()
+        self.service.refresh_from_db()
+        self.assertIsNone(self.service.average_rating)
+        self.assertFalse(ServiceRatingSummary.objects.filter(service=self.service).exists())
+
+    def test_ratings_that_count_again_are_added_back(self):
+        booking = self.rate(4)
+        for status in ('DISPUTED', 'COMPLETED'):
+            with self.captureOnCommitCallbacks(execute=True):
+                booking.status = status
+                booking.save()
+        self.assertRating(4.0, 1)
+
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api.post(f'/api/v1/bookings/list/{booking.pk}/rate_service/', {'rating': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRating(2.0, 1)
+
+    def test_ratings_edited_through_a_booking_update_are_folded_in(self):
+        booking, _ = self.rate(5), self.rate(5)
+
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api.patch(f'/api/v1/bookings/list/{booking.pk}/', {'client_rating': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRating(3.5, 2)
+
+    def test_backfill_command_matches_incremental_updates(self):
+        for stars in (3, 4):
+            self.rate(stars)
+        ServiceRatingSummary.objects.update(rating_sum=0, rating_count=0)
+
+        call_command('backfill_service_ratings', service=[self.service.pk], stdout=StringIO())
+        self.assertRating(3.5, 2)
+
+
+class RatingCacheTests(RatingFixtures, TestCase):
+    """Cached service responses follow rating writes"""
+
+    def setUp(self):
+        cache.clear()
+
+    def category_services(self):
+        response = self.client.get(f'/api/v1/services/categories/{self.service.category_id}/services/')
+        return {row['id']: row['rating'] for row in response.json()['results']}
+
+    def test_rating_a_booking_retires_cached_responses(self):
+        start = timezone.now() - datetime.timedelta(days=2)
+        booking = Booking.objects.create(
+            client=self.client_user, partner=self.partner, service=self.service,
+            scheduled_start=start, scheduled_end=start + datetime.timedelta(hours=1),
+            base_price=50, total_amount=50, status='COMPLETED'
+        )
+        self.assertEqual(self.category_services()[self.service.pk], 0.0)
+
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api.post(f'/api/v1/bookings/list/{booking.pk}/rate_service/', {'rating': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.category_services()[self.service.pk], 4.0)
+
+
+class RatingSearchTests(RatingFixtures, TestCase):
+    """Rating filter and Bayesian sort in service search"""
+
+    def setUp(self):
+        cache.clear()
+        self.other = make_service(self.partner, self.service.category, 'Other cleaning')
+
+    def rate_service(self, service, *stars):
+        self.service, original = service, self.service
+        try:
+            for value in stars:
+                self.rate(value)
+        finally:
+            self.service = original
+
+    def search(self, **params):
+        response = self.client.post('/api/v1/services/search/', params, content_type='application/json')
+        return [row['id'] for row in response.json()['results']]
+
+    def test_min_rating_matches_the_displayed_average(self):
+        self.rate_service(self.service, 4, 5, 5)  # 4.67 shown as 4.7
+        self.assertEqual(self.search(min_rating=4.7), [self.service.pk])
+
+    def test_sort_shrinks_towards_the_platform_mean(self):
+        low = make_service(self.partner, self.service.category, 'Low cleaning')
+        self.rate_service(low, *[3] * 10)
+        self.rate_service(self.other, 5)
+        self.rate_service(self.service, *[5, 5, 5, 5, 4] * 4)
+        refresh_rating_ranks()
+
+        # A single 5-star review does not outrank a long record of 4.8s
+        self.assertEqual(rating_prior_mean(), Decimal('4.226'))
+        self.assertEqual(self.search(sort_by='rating_desc'), [self.service.pk, self.other.pk, low.pk])
+
+    def test_review_count_filter_and_sort(self):
+        low = make_service(self.partner, self.service.category, 'Low cleaning')
+        self.rate_service(low, 3, 3, 3)
+        self.rate_service(self.other, 5)
 
-# Create your tests here.
+        self.assertEqual(self.search(min_reviews=2), [low.pk])
+        self.assertEqual(self.search(sort_by='reviews_desc'), [low.pk, self.other.pk, self.service.pk])
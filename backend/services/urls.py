@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ServiceCategoryViewSet, ServiceViewSet, ServiceAttributeViewSet,
-    ServiceSearchView, FeaturedServicesView, PopularServicesView
+    ServiceSearchView, FeaturedServicesView, PopularServicesView, NearbyServicesView
 )
 
 # Create router for ViewSets
@@ -16,6 +16,7 @@ urlpatterns = [
     path('search/', ServiceSearchView.as_view(), name='service_search'),
     path('featured/', FeaturedServicesView.as_view(), name='featured_services'),
     path('popular/', PopularServicesView.as_view(), name='popular_services'),
+    path('nearby/', NearbyServicesView.as_view(), name='nearby_services'),
     
     # Include router URLs
     path('', include(router.urls)),
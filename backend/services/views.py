@@ -2,15 +2,28 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Avg, Count
+from django.db.models import Avg, Count
 from django.utils import timezone
 from django.core.paginator import Paginator
-from .models import ServiceCategory, Service, ServiceAttribute, ServiceAttributeValue, AvailabilitySlot
+from accounts.location_tree import get_descendant_ids as get_location_descendant_ids
+from ebglobal.cache import cached_response
+from ebglobal.pagination import (
+    KeysetPaginator, ScoredPaginator, cursor_page_response, page_size_param, wants_cursor
+)
+from .models import (
+    ServiceCategory, Service, ServiceAttribute, ServiceAttributeValue, ServiceRanking
+)
 from .serializers import (
     ServiceCategorySerializer, ServiceListSerializer, ServiceDetailSerializer,
     ServiceCreateSerializer, ServiceUpdateSerializer, ServiceSearchSerializer,
-    ServiceAttributeSerializer, AvailabilitySlotSerializer
+    ServiceAttributeSerializer, AvailabilitySlotSerializer, NearbyServiceSerializer,
+    NearbyServicesQuerySerializer
 )
+from .search import search_services
+from .categories import get_category_service_counts, subtree_filter
+from .availability import available_service_ids, availability_summary, day_bounds, service_zones
+from .ranking import RANKING_DEPTH, top_services, unranked_services
+from .nearby import DEFAULT_RADIUS_KM, nearest_services, services_within
 
 
 class ServiceCategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -19,19 +32,40 @@ class ServiceCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ServiceCategorySerializer
     permission_classes = [permissions.AllowAny]
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # One cached lookup for the whole page instead of a COUNT per category
+        context['service_counts'] = get_category_service_counts()
+        return context
+    
+    @cached_response('categories:list', tags=('categories', 'services'), params=('page', 'search', 'ordering'))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cached_response('categories:detail', tags=('categories', 'services'))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
+    @cached_response(
+        'categories:services', tags=('categories', 'services', 'locations'),
+        params=('location', 'min_price', 'max_price', 'page', 'page_size', 'cursor', 'include_count')
+    )
     def services(self, request, pk=None):
         """Get services for a specific category"""
         category = self.get_object()
         services = Service.objects.filter(
-            category=category,
+            subtree_filter(category.pk),
             status='ACTIVE'
-        ).select_related('partner', 'category', 'primary_location')
+        ).select_related('partner', 'category', 'primary_location', 'rating_summary')
         
         # Apply filters
         location = request.query_params.get('location')
         if location:
-            services = services.filter(location_id=location)
+            if not location.isdigit():
+                return Response({'error': 'location must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+            # A country or province also matches services in the cities below it
+            services = services.filter(primary_location_id__in=get_location_descendant_ids(int(location)))
         
         min_price = request.query_params.get('min_price')
         if min_price:
@@ -41,9 +75,18 @@ class ServiceCategoryViewSet(viewsets.ReadOnlyModelViewSet):
         if max_price:
             services = services.filter(base_price__lte=max_price)
         
+        page_size = page_size_param(request.query_params)
+        
+        # Opt-in cursor pagination: every page costs the same, no COUNT(*)
+        if wants_cursor(request.query_params):
+            paginator = KeysetPaginator(services, '-created_at', page_size)
+            return Response(cursor_page_response(
+                ServiceListSerializer, paginator, request.query_params.get('cursor'),
+                include_count=request.query_params.get('include_count') == 'true'
+            ))
+        
         # Pagination
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('page_size', 20))
+        page = request.query_params.get('page', 1)
         paginator = Paginator(services, page_size)
         page_obj = paginator.get_page(page)
         
@@ -62,8 +105,8 @@ class ServiceViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = Service.objects.filter(status='ACTIVE').select_related(
-            'partner', 'category', 'location'
-        ).prefetch_related('attributes', 'availability_slots')
+            'partner', 'category', 'primary_location', 'rating_summary'
+        ).prefetch_related('attribute_values__attribute', 'availability_slots')
         
         # Filter by partner if user is a partner
         if self.request.user.is_authenticated and self.request.user.role == 'PARTNER':
@@ -94,11 +137,7 @@ class ServiceViewSet(viewsets.ModelViewSet):
         if date:
             try:
                 from datetime import datetime
-                target_date = datetime.strptime(date, '%Y-%m-%d').date()
-                slots = service.availability_slots.filter(
-                    start_time__date=target_date,
-                    is_available=True
-                ).order_by('start_time')
+                date_from = date_to = datetime.strptime(date, '%Y-%m-%d').date()
             except ValueError:
                 return Response(
                     {'error': 'Invalid date format. Use YYYY-MM-DD'},
@@ -107,19 +146,77 @@ class ServiceViewSet(viewsets.ModelViewSet):
         else:
             # Get slots for the next 30 days
             from datetime import timedelta
-            end_date = timezone.now().date() + timedelta(days=30)
-            slots = service.availability_slots.filter(
-                start_time__date__gte=timezone.now().date(),
-                start_time__date__lte=end_date,
-                is_available=True
-            ).order_by('start_time')
+            date_from = timezone.now().date()
+            date_to = date_from + timedelta(days=30)
+        
+        # Days with free slots come from the availability index
+        days = availability_summary(service.pk, date_from, date_to)
+        if request.query_params.get('summary') == 'true':
+            return Response(days)
+        if not days:
+            return Response([])
+        
+        # Range scan on the (service, start_time) index, limited to days known to be free
+        tz = service_zones(Service.objects.filter(pk=service.pk))[service.pk]
+        start, end = day_bounds(days[0]['date'], days[-1]['date'], tz)
+        slots = service.availability_slots.filter(
+            start_time__gte=start,
+            start_time__lt=end,
+            is_available=True,
+            is_blocked=False
+        ).order_by('start_time')
         
         serializer = AvailabilitySlotSerializer(slots, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def hold_slot(self, request, pk=None):
+        """Hold a slot for the current user while they check out"""
+        from bookings.reservations import SlotUnavailable, hold_slot
+        
+        service = self.get_object()
+        slot_id = request.data.get('slot_id')
+        
+        if not slot_id:
+            return Response(
+                {'error': 'slot_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not service.availability_slots.filter(id=slot_id).exists():
+            return Response(
+                {'error': 'Slot not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            held_until = hold_slot(slot_id, request.user)
+        except SlotUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        
+        return Response({'slot_id': int(slot_id), 'held_until': held_until})
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def release_slot(self, request, pk=None):
+        """Release the current user's hold on a slot"""
+        from bookings.reservations import release_hold
+        
+        service = self.get_object()
+        slot_id = request.data.get('slot_id')
+        
+        if not slot_id:
+            return Response(
+                {'error': 'slot_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        released = release_hold(slot_id, request.user) if service.availability_slots.filter(id=slot_id).exists() else 0
+        return Response({'released': bool(released)})
+    
     @action(detail=True, methods=['post'])
     def book_slot(self, request, pk=None):
         """Book a specific time slot (placeholder for booking system)"""
+        from bookings.reservations import SlotUnavailable, claim_slot
+        
         service = self.get_object()
         slot_id = request.data.get('slot_id')
         
@@ -129,34 +226,26 @@ class ServiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            slot = AvailabilitySlot.objects.get(
-                id=slot_id,
-                service=service,
-                is_available=True
-            )
-            
-            # Check if slot is in the future
-            if slot.start_time <= timezone.now():
-                return Response(
-                    {'error': 'Cannot book past time slots'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Mark slot as unavailable
-            slot.is_available = False
-            slot.save()
-            
-            return Response({
-                'message': 'Slot booked successfully',
-                'slot': AvailabilitySlotSerializer(slot).data
-            })
-            
-        except AvailabilitySlot.DoesNotExist:
+        slot = service.availability_slots.select_related('service__partner').filter(id=slot_id).first()
+        if slot is None:
             return Response(
                 {'error': 'Slot not found or not available'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        # Conditional update: only one concurrent request can flip the slot
+        try:
+            claim_slot(slot, request.user)
+        except SlotUnavailable:
+            return Response(
+                {'error': 'Slot not found or not available'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({
+            'message': 'Slot booked successfully',
+            'slot': AvailabilitySlotSerializer(slot).data
+        })
 
 
 class ServiceSearchView(APIView):
@@ -172,24 +261,24 @@ class ServiceSearchView(APIView):
         
         # Build queryset
         queryset = Service.objects.filter(status='ACTIVE').select_related(
-            'partner', 'category', 'location'
+            'partner', 'category', 'primary_location', 'rating_summary'
         )
         
         # Apply filters
-        if data.get('query'):
-            query = data['query']
-            queryset = queryset.filter(
-                Q(title_pt__icontains=query) |
-                Q(title_en__icontains=query) |
-                Q(description_pt__icontains=query) |
-                Q(description_en__icontains=query)
-            )
+        query = data.get('query', '').strip()
+        sort_by = data.get('sort_by', 'relevance')
+        relevance = None
+        if query:
+            # Full-text match: annotated with search_rank on PostgreSQL, scored in Python elsewhere;
+            # a relevance sort ranks the scores first and only checks each page's ids against the filters
+            queryset, relevance = search_services(queryset, query, narrow=sort_by != 'relevance')
         
         if data.get('category'):
-            queryset = queryset.filter(category_id=data['category'])
+            queryset = queryset.filter(subtree_filter(data['category']))
         
         if data.get('location'):
-            queryset = queryset.filter(location_id=data['location'])
+            # A country or province also matches services in the cities below it
+            queryset = queryset.filter(primary_location_id__in=get_location_descendant_ids(data['location']))
         
         if data.get('min_price'):
             queryset = queryset.filter(base_price__gte=data['min_price'])
@@ -198,37 +287,77 @@ class ServiceSearchView(APIView):
             queryset = queryset.filter(base_price__lte=data['max_price'])
         
         if data.get('min_rating'):
-            # Filter by minimum rating (this would require a subquery in production)
-            pass
+            # Range scan on the denormalized (status, average_rating) index
+            queryset = queryset.filter(average_rating__gte=data['min_rating'])
+        
+        if data.get('min_reviews'):
+            # Range scan on the denormalized (status, review_count) index
+            queryset = queryset.filter(review_count__gte=data['min_reviews'])
         
         if data.get('date'):
-            # Filter by availability on specific date
-            queryset = queryset.filter(
-                availability_slots__start_time__date=data['date'],
-                availability_slots__is_available=True
-            ).distinct()
+            # Availability from the per-day slot bitmaps, no join on the slot table
+            queryset = queryset.filter(pk__in=available_service_ids(
+                data['date'], data.get('date_to'), data.get('time')
+            ))
+        
+        page_size = data.get('page_size', 20)
+        
+        distances = None
+        if 'latitude' in data:
+            # Services located within the radius, found through the geohash index
+            distances = services_within(
+                data['latitude'], data['longitude'], data.get('radius_km', DEFAULT_RADIUS_KM), queryset
+            )
+            if relevance is not None and sort_by == 'relevance':
+                distances = {pk: distance for pk, distance in distances.items() if pk in relevance}
+            if sort_by != 'distance':
+                queryset = queryset.filter(pk__in=list(distances))
         
         # Apply sorting
-        sort_by = data.get('sort_by', 'newest')
-        if sort_by == 'price_asc':
-            queryset = queryset.order_by('base_price')
+        scored = None
+        if sort_by == 'distance':
+            # Distances only cover services passing the filters above; sorted in Python, page rows loaded by pk
+            scored = ScoredPaginator(queryset, distances, 'distance_km', page_size=page_size, filtered=True)
+        elif sort_by == 'relevance' and relevance is not None:
+            # Fallback index: ranked in Python after every filter, only the page's rows are loaded
+            scored = ScoredPaginator(queryset, relevance, 'search_rank', descending=True, page_size=page_size)
+        elif sort_by == 'relevance' and query:
+            ordering = '-search_rank'
+        elif sort_by == 'price_asc':
+            ordering = 'base_price'
         elif sort_by == 'price_desc':
-            queryset = queryset.order_by('-base_price')
+            ordering = '-base_price'
         elif sort_by == 'rating_desc':
-            # This would require a more complex query in production
-            queryset = queryset.order_by('-created_at')
+            # Bayesian-smoothed rating, maintained on each rating write
+            ordering = '-rating_rank'
+        elif sort_by == 'reviews_desc':
+            ordering = '-review_count'
         elif sort_by == 'newest':
-            queryset = queryset.order_by('-created_at')
+            ordering = '-created_at'
         else:
-            queryset = queryset.order_by('-created_at')
+            ordering = '-created_at'
+        
+        serializer_class = NearbyServiceSerializer if distances is not None else ServiceListSerializer
+        context = {'distances': distances} if distances is not None else {}
+        
+        # Opt-in cursor pagination: every page costs the same, no COUNT(*)
+        if wants_cursor(data):
+            paginator = scored or KeysetPaginator(queryset, ordering, page_size)
+            return Response(cursor_page_response(
+                serializer_class, paginator, data['cursor'],
+                include_count=data.get('include_count', False),
+                context=context, filters_applied=data
+            ))
         
         # Pagination
         page = data.get('page', 1)
-        page_size = data.get('page_size', 20)
-        paginator = Paginator(queryset, page_size)
-        page_obj = paginator.get_page(page)
+        if scored is not None:
+            page_obj = scored.page(page)
+        else:
+            page_obj = Paginator(queryset.order_by(ordering, '-pk'), page_size).get_page(page)
+        paginator = page_obj.paginator
         
-        serializer = ServiceListSerializer(page_obj, many=True)
+        serializer = serializer_class(page_obj.object_list, many=True, context=context)
         return Response({
             'results': serializer.data,
             'count': paginator.count,
@@ -238,6 +367,37 @@ class ServiceSearchView(APIView):
         })
 
 
+class NearbyServicesView(APIView):
+    """Services nearest to a point ("near me"), optionally within a radius"""
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        serializer = NearbyServicesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        
+        queryset = Service.objects.filter(status='ACTIVE')
+        if data.get('category'):
+            queryset = queryset.filter(subtree_filter(data['category']))
+        
+        if 'radius_km' in data:
+            distances = services_within(data['latitude'], data['longitude'], data['radius_km'], queryset)
+            nearest = sorted(distances.items(), key=lambda item: (item[1], item[0]))[:data['limit']]
+        else:
+            nearest = nearest_services(data['latitude'], data['longitude'], data['limit'], queryset)
+        
+        distances = dict(nearest)
+        services = Service.objects.filter(pk__in=list(distances)).select_related(
+            'partner', 'category', 'primary_location', 'rating_summary'
+        ).in_bulk()
+        serializer = NearbyServiceSerializer(
+            [services[service_id] for service_id, _ in nearest if service_id in services],
+            many=True, context={'distances': distances}
+        )
+        return Response(serializer.data)
+
+
 class ServiceAttributeViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for service attributes"""
     queryset = ServiceAttribute.objects.all()
@@ -256,11 +416,19 @@ class FeaturedServicesView(APIView):
     """Get featured services for homepage"""
     permission_classes = [permissions.AllowAny]
     
+    @cached_response('services:featured', tags=('services', 'categories', 'locations', 'rankings'), params=('location',))
     def get(self, request):
-        # Get services with highest ratings and recent bookings
-        services = Service.objects.filter(
-            is_active=True
-        ).select_related('partner', 'category', 'location')[:12]
+        # Top of the precomputed popularity ranking (overall or for a location)
+        location_id = request.query_params.get('location')
+        if location_id:
+            if not location_id.isdigit():
+                return Response({'error': 'location must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+            services = top_services(ServiceRanking.Scope.LOCATION, int(location_id), limit=12)
+        else:
+            services = top_services(ServiceRanking.Scope.GLOBAL, limit=12)
+        
+        if services is None:
+            services = unranked_services()[:12]
         
         serializer = ServiceListSerializer(services, many=True)
         return Response(serializer.data)
@@ -270,17 +438,35 @@ class PopularServicesView(APIView):
     """Get popular services by category"""
     permission_classes = [permissions.AllowAny]
     
+    @cached_response(
+        'services:popular', tags=('services', 'categories', 'locations', 'rankings'),
+        params=('category', 'location', 'limit')
+    )
     def get(self, request):
-        category_id = request.query_params.get('category')
-        limit = int(request.query_params.get('limit', 8))
-        
-        queryset = Service.objects.filter(status='ACTIVE')
+        try:
+            category_id = int(request.query_params['category']) if request.query_params.get('category') else None
+            location_id = int(request.query_params['location']) if request.query_params.get('location') else None
+            limit = min(int(request.query_params.get('limit', 8)), RANKING_DEPTH)
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            return Response(
+                {'error': 'category and location must be ids and limit a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         if category_id:
-            queryset = queryset.filter(category_id=category_id)
+            # Category ranking, narrowed to the location (and the places below it) when both are given
+            services = top_services(ServiceRanking.Scope.CATEGORY, category_id, limit=limit, location_id=location_id)
+        elif location_id:
+            services = top_services(ServiceRanking.Scope.LOCATION, location_id, limit=limit)
+        else:
+            services = top_services(ServiceRanking.Scope.GLOBAL, limit=limit)
         
-        # Order by number of bookings (this would require a more complex query in production)
-        services = queryset.select_related('partner', 'category', 'location')[:limit]
+        if services is None:
+            # Not ranked yet: fall back to lifetime completed bookings
+            location_ids = get_location_descendant_ids(location_id) if location_id else None
+            services = unranked_services(category_id, location_ids)[:limit]
         
         serializer = ServiceListSerializer(services, many=True)
         return Response(serializer.data)
\ No newline at end of file